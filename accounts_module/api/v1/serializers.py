@@ -6,6 +6,7 @@ from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 from accounts_module.models import User, UserMediaFiles
 from auth_sms_module.models import VerificationCode
+from utils_module.serializers import SparseFieldsetsMixin
 
 
 # User = get_user_model()
@@ -253,7 +254,7 @@ class CustomAuthTokenSerializer(serializers.Serializer):
 
 # -----------------------------------------------------------------
 # File manager
-class UserMediaFilesSerializer(serializers.ModelSerializer):
+class UserMediaFilesSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     file_url = serializers.SerializerMethodField()
     file = serializers.FileField(write_only=True)  # Add this field for file upload input
     is_active = serializers.BooleanField(default=True)  # Add default=True here
@@ -21,6 +21,7 @@ from rest_framework_simplejwt.views import TokenObtainPairView
 from django.core.exceptions import ValidationError
 
 from accounts_module.api.v1.paginations import DefaultPagination
+from utils_module.mixins import MediaLibraryListMixin
 from auth_sms_module.models import VerificationCode
 from .permissions import IsOwnerOrAdminForUserMediaFiles
 from .serializers import RegistrationSerializer, RegistrationCheckSerializer, \
@@ -412,7 +413,7 @@ class CustomDiscardAuthToken(APIView):
 
 # -----------------------------------------------------------------
 # File manager
-class UserAvatarUploadViewSet(viewsets.ModelViewSet):
+class UserAvatarUploadViewSet(MediaLibraryListMixin, viewsets.ModelViewSet):
     """
     Endpoint for uploading an avatar.
 
@@ -518,25 +519,9 @@ class UserAvatarUploadViewSet(viewsets.ModelViewSet):
 
     def list(self, request, *args, **kwargs):
         """
-        Override list() to return avatar records grouped by media_type in the envelope.
-        In this example we’re splitting the query into global files and user-specific ones.
+        Override list() to return avatar records grouped into global and user files in the envelope.
         """
-        queryset = self.get_queryset()
-
-        global_files_qs = queryset.filter(is_global=True)
-        local_files_qs = queryset.exclude(is_global=True)
-
-        global_serialized = self.get_serializer(global_files_qs, many=True).data
-        user_serialized = self.get_serializer(local_files_qs, many=True).data
-
-        grouped_global_files = self._group_by_media_type(global_serialized)
-        grouped_local_files = self._group_by_media_type(user_serialized)
-
-        response_data = {
-            "global_files": grouped_global_files,
-            "local_files": grouped_local_files,
-        }
-        response = Response(response_data, status=status.HTTP_200_OK)
+        response = Response(self.get_media_library_data(), status=status.HTTP_200_OK)
         response.message = "آواتار‌ها با موفقیت فراخوانی شدند."
         return response
 
@@ -569,19 +554,6 @@ class UserAvatarUploadViewSet(viewsets.ModelViewSet):
                     "user": "کاربری برای درخواست احراز هویت شده یافت نشد."
                 })
 
-    def _group_by_media_type(self, serialized_files):
-        """
-        Group the serialized file objects by their media_type.
-        Returns a dictionary with media_type as keys and lists of file data as values.
-        """
-        grouped = {}
-        for file in serialized_files:
-            media_type = file.get("media_type")
-            if media_type not in grouped:
-                grouped[media_type] = []
-            grouped[media_type].append(file)
-        return grouped
-
 # -----------------------------------------------------------------
 # User full name and type
 class UserFullNameAndTypeAPIView(APIView):
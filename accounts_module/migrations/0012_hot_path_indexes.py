@@ -0,0 +1,21 @@
+# Generated by Django 4.2.20 on 2026-10-19 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts_module', '0011_alter_user_avatar'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usermediafiles',
+            index=models.Index(fields=['user', 'media_type', 'is_global'], name='user_media_user_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usermediafiles',
+            index=models.Index(fields=['is_global', 'media_type'], name='user_media_global_idx'),
+        ),
+    ]
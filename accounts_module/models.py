@@ -107,6 +107,10 @@ class UserMediaFiles(models.Model):
     class Meta:
         verbose_name = 'فایل مربوط به کاربر'
         verbose_name_plural = 'فایلهای مربوط به کاربران'
+        indexes = [
+            models.Index(fields=['user', 'media_type', 'is_global'], name='user_media_user_type_idx'),
+            models.Index(fields=['is_global', 'media_type'], name='user_media_global_idx'),
+        ]
 
 
 # ---------------------------------------------------------------
@@ -2,6 +2,7 @@ from persiantools.jdatetime import JalaliDate
 from rest_framework import serializers
 
 from accounts_module.models import User
+from utils_module.serializers import SparseFieldsetsMixin
 from article_module.models import Article, ArticleCategory, ArticleTag, ArticleKeyWords, ArticleMediaFiles
 
 
@@ -46,7 +47,7 @@ class AuthorSerializer(serializers.ModelSerializer):
         fields = ['id', 'first_name', 'last_name']
 
 
-class ArticleMediaFilesSerializer(serializers.ModelSerializer):
+class ArticleMediaFilesSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     file_url = serializers.SerializerMethodField(read_only=True)
     file = serializers.FileField(write_only=True)
 
@@ -82,6 +83,10 @@ class WritableNestedField(serializers.PrimaryKeyRelatedField):
         self.serializer_class = kwargs.pop("serializer_class")
         super().__init__(**kwargs)
 
+    def use_pk_only_optimization(self):
+        # hand over the (select_related) instance itself instead of a pk-only stub
+        return False
+
     def to_representation(self, value):
         # If the returned object is a partial (PK-only) object,
         # reload the complete model instance from the queryset.
@@ -90,7 +95,7 @@ class WritableNestedField(serializers.PrimaryKeyRelatedField):
         return self.serializer_class(value, context=self.context).data
 
 
-class ArticleSerializer(serializers.ModelSerializer):
+class ArticleSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     absolute_url = serializers.SerializerMethodField(method_name='get_abs_url')
     author = AuthorSerializer(read_only=True)
     created_date = serializers.SerializerMethodField(method_name='get_created_date')
@@ -124,6 +129,15 @@ class ArticleSerializer(serializers.ModelSerializer):
             'created_month',
             'created_day'
         ]
+        select_related_fields = {
+            'image': ['image'],
+            'author': ['author'],
+        }
+        prefetch_related_fields = {
+            'key_words': ['key_words'],
+            'selected_categories': ['selected_categories'],
+            'tags': ['tags'],
+        }
 
     def get_abs_url(self, obj):
         request = self.context.get('request')
@@ -149,11 +163,13 @@ class ArticleSerializer(serializers.ModelSerializer):
             rep.pop('absolute_url', None)
         else:
             rep.pop('text', None)
-        # Return only titles for many-to-many related fields.
-        rep['key_words'] = [kw['title'] for kw in ArticleKeyWordsSerializer(instance.key_words.all(), many=True).data]
-        rep['selected_categories'] = [cat['title'] for cat in
-                                      ArticleCategorySerializer(instance.selected_categories.all(), many=True).data]
-        rep['tags'] = [tag['title'] for tag in ArticleTagSerializer(instance.tags.all(), many=True).data]
+        # Return only titles for many-to-many related fields (unless dropped via ?fields= / ?omit=).
+        if 'key_words' in rep:
+            rep['key_words'] = [kw.title for kw in instance.key_words.all()]
+        if 'selected_categories' in rep:
+            rep['selected_categories'] = [cat.title for cat in instance.selected_categories.all()]
+        if 'tags' in rep:
+            rep['tags'] = [tag.title for tag in instance.tags.all()]
         return rep
 
     def create(self, validated_data):
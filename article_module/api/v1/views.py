@@ -147,6 +147,10 @@ class ArticleModelViewSet(viewsets.ModelViewSet):
     ordering_fields = ['created_date']
     pagination_class = DefaultPagination
 
+    def get_queryset(self):
+        # fetch only the relations of the rendered fields (?fields= / ?omit=)
+        return self.get_serializer_class().optimize_queryset(super().get_queryset(), self.request)
+
 
 class ArticleCategoryModelViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticatedOrReadOnly]
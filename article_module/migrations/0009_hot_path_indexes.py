@@ -0,0 +1,17 @@
+# Generated by Django 4.2.20 on 2026-10-19 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('article_module', '0008_articlemediafiles_optimized'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='articlemediafiles',
+            index=models.Index(fields=['user', 'media_type'], name='article_media_user_type_idx'),
+        ),
+    ]
@@ -43,6 +43,9 @@ class ArticleMediaFiles(models.Model):
     class Meta:
         verbose_name = 'فایل مربوط به مقاله'
         verbose_name_plural = 'فایلهای مربوط به مقالات'
+        indexes = [
+            models.Index(fields=['user', 'media_type'], name='article_media_user_type_idx'),
+        ]
 
 
 # ------------------------------------------------------------------------
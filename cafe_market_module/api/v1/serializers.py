@@ -2,6 +2,7 @@ from rest_framework import serializers
 
 from cafe_market_module.models import CafeMarketBanner
 from shop_module.models import Shop
+from utils_module.serializers import SparseFieldsetsMixin
 
 
 # class ProductSerializer(serializers.ModelSerializer):
@@ -16,7 +17,7 @@ from shop_module.models import Shop
 #
 
 
-class CafeSerializer(serializers.ModelSerializer):
+class CafeSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     distance = serializers.FloatField(read_only=True)
     has_special = serializers.SerializerMethodField()
     has_bundle = serializers.SerializerMethodField()
@@ -30,16 +31,30 @@ class CafeSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'latitude', 'longitude', 'district', 'shop_type', 'is_verified', 'pickup',
                   'free_delivery',
                   'distance', 'has_special', 'has_bundle', 'banner_url']
-
+        select_related_fields = {
+            'has_special': ['product_counters'],
+            'has_bundle': ['product_counters'],
+            'latitude': ['profile'],
+            'longitude': ['profile'],
+            'district': ['profile'],
+        }
+        prefetch_related_fields = {
+            'banner_url': ['banner'],
+        }
+
+    # both read the shop's denormalized counters (product_module.counters)
     def get_has_special(self, obj):
-        return obj.products.filter(is_special=True).exists()
+        counters = getattr(obj, 'product_counters', None)
+        return bool(counters and counters.special_products_count > 0)
 
     def get_has_bundle(self, obj):
-        return obj.bundles.filter(is_active=True).exists()
+        counters = getattr(obj, 'product_counters', None)
+        return bool(counters and counters.active_bundles_count > 0)
 
     def get_banner_url(self, obj):
         request = self.context.get('request')
-        banner_instance = obj.banner.first()  # Get the first banner instance from the ManyToManyField
+        # first banner by pk, taken from the prefetched banners
+        banner_instance = min(obj.banner.all(), key=lambda banner: banner.pk, default=None)
         if banner_instance and banner_instance.file and request:
             return request.build_absolute_uri(banner_instance.file.url)
         return None
@@ -9,6 +9,8 @@ from rest_framework.generics import ListCreateAPIView, DestroyAPIView
 from rest_framework.response import Response
 
 from shop_module.models import Shop
+from shop_module.search import search_shop_ids
+from utils_module.mixins import ConditionalGetMixin
 from .pagination import DefaultPagination
 from .permissions import IsAdminOrSuperuserOrReadOnly
 from .serializers import CafeSerializer, CafeBannerSerializer
@@ -165,15 +167,15 @@ from ...models import CafeMarketBanner
 class CafeMarketIndexViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     serializer_class = CafeSerializer
     pagination_class = DefaultPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['pickup', 'free_delivery', 'products__is_special', 'bundles__is_active']
-    search_fields = ['name']
     ordering_fields = ['distance']
 
     latitude_param = openapi.Parameter('lat', openapi.IN_QUERY, description="Latitude", type=openapi.TYPE_NUMBER)
     longitude_param = openapi.Parameter('long', openapi.IN_QUERY, description="Longitude", type=openapi.TYPE_NUMBER)
+    search_param = openapi.Parameter('search', openapi.IN_QUERY, description="نام کافه", type=openapi.TYPE_STRING)
 
-    @swagger_auto_schema(manual_parameters=[latitude_param, longitude_param])
+    @swagger_auto_schema(manual_parameters=[latitude_param, longitude_param, search_param])
     def list(self, request, *args, **kwargs):
         queryset = self.filter_queryset(self.get_queryset())
 
@@ -193,12 +195,19 @@ class CafeMarketIndexViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
         latitude = float(request.query_params.get('lat', 0))
         longitude = float(request.query_params.get('long', 0))
         
-        # Use prefetch_related for products and bundles to reduce query overhead
-        queryset = Shop.objects.prefetch_related('products', 'bundles').filter(
+        # only the relations of the rendered fields are fetched (?fields= / ?omit=)
+        queryset = self.serializer_class.optimize_queryset(Shop.objects.all(), request).filter(
             # is_verified=True,
-            products__is_active=True,
+            # has an active product, read from the counters row instead of joining (and de-duplicating) products
+            product_counters__active_products_count__gt=0,
             shop_type__in=['cafe', 'both']
-        ).distinct()
+        )
+
+        # name search narrows the shops to a few candidate ids (shop_module.search)
+        # before the distance is computed
+        term = request.query_params.get('search', '').strip()
+        if term:
+            queryset = queryset.filter(pk__in=search_shop_ids(term))
 
         queryset = queryset.annotate(
             distance=ExpressionWrapper(
@@ -222,11 +231,19 @@ class CafeMarketIndexViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
         return queryset
 
 
-class CafeBannerList(ListCreateAPIView):
+class CafeBannerList(ConditionalGetMixin, ListCreateAPIView):
     """getting a list of Cafe Banners and creating an article"""
     permission_classes = [IsAdminOrSuperuserOrReadOnly]
     serializer_class = CafeBannerSerializer
     queryset = CafeMarketBanner.objects.filter(is_active=True)
+    conditional_models = [CafeMarketBanner]
+
+    def list(self, request, *args, **kwargs):
+        not_modified = self.not_modified_response(request)
+        if not_modified:
+            return not_modified
+
+        return super().list(request, *args, **kwargs)
 
 
 class CafeBannerDetail(DestroyAPIView):
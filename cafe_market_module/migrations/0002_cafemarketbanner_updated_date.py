@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-19 14:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cafe_market_module', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cafemarketbanner',
+            name='updated_date',
+            field=models.DateTimeField(auto_now=True, verbose_name='تاریخ بروز رسانی'),
+        ),
+    ]
@@ -4,9 +4,19 @@ from rest_framework_simplejwt.tokens import AccessToken
 from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
 from django.http import JsonResponse
 from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+import gzip
+import hashlib
 import logging
 from django.conf import settings
 
+from utils_module.cache import LRUCache
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
 logger = logging.getLogger(__name__)
 
 class JWTBlacklistMiddleware:
@@ -61,4 +71,94 @@ class NoIndexMiddleware:
         # Check if we're not in production before setting the header
         if getattr(settings, 'DJANGO_ENV', 'development') != 'production':
             response['X-Robots-Tag'] = 'noindex, nofollow'
-        return response
\ No newline at end of file
+        return response
+
+
+# -----------------------------------------------------------------
+# Response compression middleware
+def _accepted_encodings(header, supported=('br', 'gzip')):
+    """
+    Parses Accept-Encoding into the set of supported codings the client takes:
+    listed with a non zero q value, or not listed and covered by a non zero "*".
+    """
+    qualities = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0
+        if coding.strip():
+            qualities[coding.strip().lower()] = quality
+    wildcard = qualities.get('*', 0)
+    return {coding for coding in supported if qualities.get(coding, wildcard) > 0}
+
+
+class CompressionMiddleware:
+    """
+    Negotiated Brotli/gzip compression for API responses above COMPRESSION_MIN_SIZE.
+    Compressed bodies are kept in a small LRU keyed by the digest of the plain body,
+    so responses served again byte for byte from our caches are never recompressed.
+    Only the API media types are compressed: HTML pages (admin, browsable API) carry
+    CSRF tokens and are left uncompressed, out of reach of BREACH.
+    """
+    compressible_types = ('application/json', 'application/msgpack')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = settings.COMPRESSION_MIN_SIZE
+        self.max_cached_size = settings.COMPRESSION_CACHE_MAX_BODY
+        self.compressed_cache = LRUCache(maxsize=settings.COMPRESSION_CACHE_SIZE)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < self.min_size:
+            return response
+        if not response.get('Content-Type', '').startswith(self.compressible_types):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        accepted = _accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is not None and 'br' in accepted:
+            encoding = 'br'
+        elif 'gzip' in accepted:
+            encoding = 'gzip'
+        else:
+            return response
+
+        compressed = self.compress(response.content, encoding)
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        # the representation changed, a strong ETag must become weak (same as GZipMiddleware)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
+
+    def compress(self, content, encoding):
+        key = None
+        if len(content) <= self.max_cached_size:
+            key = (encoding, hashlib.sha1(content).digest())
+            compressed = self.compressed_cache.get(key)
+            if compressed is not None:
+                return compressed
+
+        if encoding == 'br':
+            compressed = brotli.compress(content, quality=settings.COMPRESSION_BROTLI_QUALITY)
+        else:
+            compressed = gzip.compress(content, compresslevel=settings.COMPRESSION_GZIP_LEVEL, mtime=0)
+
+        if key is not None:
+            self.compressed_cache.set(key, compressed)
+        return compressed
@@ -93,6 +93,8 @@ if DEBUG:
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",  # اضافه کردن در ابتدای لیست
+    # compresses the final response body, keep it above everything that reads the content
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     # Insert our custom middleware for non-production environments.
     # This middleware will add X-Robots-Tag header to responses.
@@ -162,6 +164,20 @@ else:
         },
     }
 
+# 'default' lives in each worker's memory; 'shared' is seen by every worker, for counts that
+# must hold across them (throttles). A database table by default, created by `createcachetable`
+# (liara_pre_start.sh), e.g. SHARED_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache
+# with a redis:// SHARED_CACHE_LOCATION once a Redis is available.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': config("SHARED_CACHE_BACKEND", default='django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': config("SHARED_CACHE_LOCATION", default='shared_cache'),
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -202,6 +218,49 @@ AUTH_USER_MODEL = 'accounts_module.User'
 # sms module
 FARAZ_SMS_API_KEY = config("FARAZ_SMS_API_KEY", default="dlBeLtlTn")
 
+# neshan map services
+NESHAN_REVERSE_API_KEY = config("NESHAN_REVERSE_API_KEY", default="service.ae1bf0d288834331a00f2b92d2378621")
+NESHAN_SEARCH_API_KEY = config("NESHAN_SEARCH_API_KEY", default="service.375767c29a45472eb62ca4dbaa108882")
+NESHAN_TIMEOUT = config("NESHAN_TIMEOUT", cast=float, default=5)
+
+# location search cache, 2 decimals ~ 1 km search origin
+NESHAN_SEARCH_LOCATION_PRECISION = config("NESHAN_SEARCH_LOCATION_PRECISION", cast=int, default=2)
+NESHAN_SEARCH_CACHE_TTL = config("NESHAN_SEARCH_CACHE_TTL", cast=int, default=60 * 60 * 24)
+NESHAN_SEARCH_MIN_PREFIX = 2
+NESHAN_SEARCH_RESULT_LIMIT = 30  # neshan never returns more items than this
+
+# reverse geocoding cache (4 decimals ~ 11 meters)
+GEOCODING_CACHE_PRECISION = config("GEOCODING_CACHE_PRECISION", cast=int, default=4)
+GEOCODING_CACHE_MAX_AGE_DAYS = config("GEOCODING_CACHE_MAX_AGE_DAYS", cast=int, default=180)
+GEOCODING_MEMORY_CACHE_SIZE = config("GEOCODING_MEMORY_CACHE_SIZE", cast=int, default=2048)
+# GeoJSON of provinces and cities (utils_module.offline_geocoder), answers province/city lookups
+# before Neshan; empty disables it
+OFFLINE_GEOCODER_DATASET = config("OFFLINE_GEOCODER_DATASET",
+                                  default=str(BASE_DIR / 'utils_module' / 'data' / 'iran_places.geojson'))
+# resolve province/city only from that dataset, never call Neshan
+GEOCODING_OFFLINE_ONLY = config("GEOCODING_OFFLINE_ONLY", cast=bool, default=False)
+
+# api response compression (core.middleware.CompressionMiddleware)
+COMPRESSION_MIN_SIZE = config("COMPRESSION_MIN_SIZE", cast=int, default=1024)
+COMPRESSION_BROTLI_QUALITY = config("COMPRESSION_BROTLI_QUALITY", cast=int, default=5)
+COMPRESSION_GZIP_LEVEL = config("COMPRESSION_GZIP_LEVEL", cast=int, default=6)
+COMPRESSION_CACHE_SIZE = config("COMPRESSION_CACHE_SIZE", cast=int, default=256)
+COMPRESSION_CACHE_MAX_BODY = config("COMPRESSION_CACHE_MAX_BODY", cast=int, default=512 * 1024)
+
+# lifetime of the cached main SiteSetting in-process and in the cache
+# (other workers pick up changes within twice this time)
+SITE_SETTING_LOCAL_CACHE_TTL = config("SITE_SETTING_LOCAL_CACHE_TTL", cast=int, default=60)
+
+# in-process pool for jobs that run after the response (utils_module.background)
+BACKGROUND_WORKERS = config("BACKGROUND_WORKERS", cast=int, default=2)
+
+# typeahead indexes (utils_module.prefix_index): how often a worker looks for changes made by other workers
+SUGGEST_SYNC_INTERVAL = config("SUGGEST_SYNC_INTERVAL", cast=int, default=5)
+SUGGEST_MAX_LIMIT = 20
+
+# cached shop panel / profile payloads (shop_module.panel_cache), invalidated on change
+SHOP_PANEL_CACHE_TTL = config("SHOP_PANEL_CACHE_TTL", cast=int, default=60 * 60)
+
 # rest framework settings
 if DEBUG:
     DEFAULT_AUTHENTICATION_CLASSES = [
@@ -221,11 +280,25 @@ else:
 REST_FRAMEWORK = {
     "DEFAULT_RENDERER_CLASSES": [
         "utils_module.renderers.CustomJSONRenderer",  # update 'your_app' to your proper app name
+        "utils_module.renderers.CustomMessagePackRenderer",
         "rest_framework.renderers.BrowsableAPIRenderer",
     ],
+    "DEFAULT_PARSER_CLASSES": [
+        "rest_framework.parsers.JSONParser",
+        "utils_module.parsers.MessagePackParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
     'DEFAULT_SCHEMA_CLASS': 'rest_framework.schemas.openapi.AutoSchema',
     'DEFAULT_AUTHENTICATION_CLASSES': DEFAULT_AUTHENTICATION_CLASSES,
     'EXCEPTION_HANDLER': 'utils_module.utils.custom_exception_handler',  # <-- Add here
+    # proxies in front of the app (Liara's edge and liara_nginx.conf), the client address
+    # is taken from X-Forwarded-For this many entries from the end, never from the client's part
+    'NUM_PROXIES': config("NUM_PROXIES", cast=int, default=2),
+    'DEFAULT_THROTTLE_RATES': {
+        'menu_view': config("MENU_VIEW_THROTTLE_RATE", default='60/minute'),
+        'orders': config("ORDERS_THROTTLE_RATE", default='20/minute'),
+    },
 }
 
 # SIMPLE_JWT = {
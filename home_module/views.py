@@ -13,7 +13,7 @@ from site_module.models import SiteSetting
 def home_index(request):
     last_articles = Article.objects.all().order_by('-created_date')
     last_articles = last_articles[:3]
-    setting: SiteSetting = SiteSetting.objects.filter(is_main_setting=True).first()
+    setting: SiteSetting = SiteSetting.get_main_setting()
     context = {
         'site_setting': setting,
         'last_articles': last_articles
@@ -22,7 +22,7 @@ def home_index(request):
 
 
 def site_header_component(request):
-    setting: SiteSetting = SiteSetting.objects.filter(is_main_setting=True).first()
+    setting: SiteSetting = SiteSetting.get_main_setting()
 
     context = {
         'site_setting': setting,
@@ -34,7 +34,7 @@ def site_header_component(request):
 
 
 def site_footer_component(request):
-    setting: SiteSetting = SiteSetting.objects.filter(is_main_setting=True).first()
+    setting: SiteSetting = SiteSetting.get_main_setting()
     # footer_link_boxes = FooterLinkBox.objects.all()
     # for item in footer_link_boxes:
     #     item.footerlink_set
@@ -1,24 +1,125 @@
+from django.db import transaction
 from rest_framework import serializers
 
 from order_module.models import OrderDetail, Order
+from product_module.models import Product, ProductFeature
+from shop_module.models import Shop
+from shop_module.search import CAFE_TYPES
+from utils_module.serializers import attach_prefetched
+
+
+class OrderDetailSerializer(serializers.ModelSerializer):
+    total_price = serializers.SerializerMethodField()
+
+    class Meta:
+        model = OrderDetail
+        fields = ['id', 'order', 'product', 'qty', 'final_price', 'feature_snapshot', 'created_date', 'updated_date',
+                  'total_price']
+
+    def get_total_price(self, obj):
+        return obj.get_total_price()
 
 
 class OrderSerializer(serializers.ModelSerializer):
+    order_details = OrderDetailSerializer(many=True, read_only=True)
+    total_price = serializers.SerializerMethodField()
+
     class Meta:
         model = Order
         fields = [
             'id', 'shop', 'order_type', 'user', 'customer_name', 'table_number',
-            'is_confirmed', 'is_paid', 'created_date', 'updated_date', 'payment_date'
+            'is_confirmed', 'is_paid', 'created_date', 'updated_date', 'payment_date',
+            'order_details', 'total_price'
         ]
         read_only_fields = ['id', 'created_date', 'updated_date']
 
+    def get_total_price(self, obj):
+        return sum(detail.get_total_price() for detail in obj.order_details.all())
 
-class OrderDetailSerializer(serializers.ModelSerializer):
-    total_price = serializers.SerializerMethodField()
+
+# ----------------------------------------------------------------------------
+# Order submission
+class OrderItemSerializer(serializers.Serializer):
+    product = serializers.UUIDField()
+    qty = serializers.IntegerField(min_value=1, max_value=100)
+    features = serializers.ListField(child=serializers.IntegerField(), required=False, default=list, max_length=20)
+
+
+class OrderCreateSerializer(serializers.ModelSerializer):
+    """
+    A customer's order with its lines, taken by cafes with a complete profile only.
+    Every line is checked and priced from one query on the products and one on
+    the chosen product features; the order and all of its details are then
+    written with two INSERTs in one transaction.
+    The unit price (product final price plus the features' final prices) and the
+    features are copied onto the detail, later price changes leave it alone.
+    """
+    shop = serializers.UUIDField()
+    items = OrderItemSerializer(many=True, write_only=True, allow_empty=False, max_length=50)
 
     class Meta:
-        model = OrderDetail
-        fields = ['id', 'order', 'product', 'qty', 'final_price', 'created_date', 'updated_date', 'total_price']
+        model = Order
+        fields = ['shop', 'order_type', 'customer_name', 'table_number', 'items']
 
-    def get_total_price(self, obj):
-        return obj.get_total_price()
+    def validate_shop(self, value):
+        if not Shop.objects.filter(pk=value, shop_type__in=CAFE_TYPES, profile__is_complete=True).exists():
+            raise serializers.ValidationError("این فروشگاه امکان ثبت سفارش ندارد.")
+        return value
+
+    def validate(self, attrs):
+        items = attrs['items']
+        product_ids = {item['product'] for item in items}
+        products = {
+            product.pk: product for product in Product.objects.filter(
+                pk__in=product_ids, shop_id=attrs['shop'], is_active=True, is_deleted=False,
+            ).only('id', 'name', 'final_price')
+        }
+        missing = product_ids - set(products)
+        if missing:
+            raise serializers.ValidationError({
+                'items': f"محصولات {', '.join(sorted(map(str, missing)))} در این فروشگاه موجود نیستند."
+            })
+
+        feature_ids = {pk for item in items for pk in item['features']}
+        features = {}
+        if feature_ids:
+            features = {
+                feature.pk: feature for feature in ProductFeature.objects.filter(
+                    pk__in=feature_ids, product_id__in=product_ids,
+                ).select_related('feature').only('id', 'product_id', 'feature_value', 'final_price', 'feature__title')
+            }
+
+        lines = []
+        for item in items:
+            chosen = []
+            for pk in dict.fromkeys(item['features']):
+                feature = features.get(pk)
+                if feature is None or feature.product_id != item['product']:
+                    raise serializers.ValidationError({'items': f"ویژگی {pk} برای این محصول تعریف نشده است."})
+                chosen.append(feature)
+            product = products[item['product']]
+            lines.append(OrderDetail(
+                product_id=product.pk, qty=item['qty'],
+                final_price=product.final_price + sum(feature.final_price for feature in chosen),
+                feature_snapshot=[
+                    {'id': f.pk, 'feature': f.feature.title, 'value': f.feature_value, 'price': f.final_price}
+                    for f in chosen
+                ],
+            ))
+        attrs['items'] = lines
+        return attrs
+
+    @transaction.atomic
+    def create(self, validated_data):
+        details = validated_data.pop('items')
+        validated_data['shop_id'] = validated_data.pop('shop')
+        order = Order.objects.create(**validated_data)
+        for detail in details:
+            detail.order = order
+        # bulk_create skips OrderDetail.save, the prices are already set
+        OrderDetail.objects.bulk_create(details)
+        attach_prefetched(order, 'order_details', details)
+        return order
+
+    def to_representation(self, instance):
+        return OrderSerializer(instance, context=self.context).data
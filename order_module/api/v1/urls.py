@@ -1,10 +1,12 @@
 from rest_framework.routers import DefaultRouter
 
+from . import views
+
 app = 'api-v1'
 
 router = DefaultRouter()
 
-# router.register(r'orders', views.OrderViewSet, basename='order')
+router.register(r'orders', views.OrderViewSet, basename='order')
 # router.register(r'order-details', views.OrderDetailViewSet, basename='order_detail')
 
 urlpatterns = [
@@ -1,14 +1,36 @@
-from django.utils import timezone
-
-
-from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.response import Response
 
-
-from order_module.api.v1.serializers import OrderSerializer, OrderDetailSerializer
-from order_module.models import Order, OrderDetail
-from shop_module.models import Shop
+from order_module.api.v1.serializers import OrderCreateSerializer, OrderSerializer
+from order_module.models import Order
+from utils_module.throttling import SharedScopedRateThrottle
 
 
+# ----------------------------------------------------------------------------
+# Order submission (table QR menu, guests included)
+class OrderViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
+    """
+    POST: submits an order with its lines, see OrderCreateSerializer.
+    Nothing shared is locked or counted here (the dashboard stats are rolled up
+    later), so a busy cafe's orders do not wait on each other. Open to guests,
+    so the orders of a client address are throttled ('orders' rate, counted
+    across the workers).
+    """
+    queryset = Order.objects.all()
+    serializer_class = OrderCreateSerializer
+    permission_classes = [permissions.AllowAny]
+    throttle_classes = [SharedScopedRateThrottle]
+    throttle_scope = 'orders'
 
+    @swagger_auto_schema(request_body=OrderCreateSerializer, responses={201: OrderSerializer()})
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = request.user if request.user.is_authenticated else None
+        serializer.save(user=user)
+        return Response({
+            "success": True,
+            "data": serializer.data,
+            "message": "سفارش با موفقیت ثبت شد."
+        }, status=status.HTTP_201_CREATED)
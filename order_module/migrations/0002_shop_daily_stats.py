@@ -0,0 +1,58 @@
+# Generated by Django 4.2.20 on 2026-10-19 15:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop_module', '0013_hot_path_indexes'),
+        ('order_module', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShopDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='تاریخ')),
+                ('orders_count', models.PositiveIntegerField(default=0, verbose_name='تعداد سفارش ها')),
+                ('paid_orders_count', models.PositiveIntegerField(default=0, verbose_name='تعداد سفارش های پرداخت شده')),
+                ('revenue', models.BigIntegerField(default=0, verbose_name='درآمد (سفارش های پرداخت شده)')),
+                ('items_sold', models.PositiveIntegerField(default=0, verbose_name='تعداد اقلام فروخته شده')),
+                ('top_products', models.JSONField(blank=True, default=list, verbose_name='پرفروش ترین محصولات روز')),
+                ('menu_views', models.PositiveIntegerField(default=0, verbose_name='تعداد بازدید منو')),
+                ('computed_date', models.DateTimeField(blank=True, null=True, verbose_name='تاریخ آخرین محاسبه')),
+            ],
+            options={
+                'verbose_name': 'آمار روزانه فروشگاه',
+                'verbose_name_plural': 'آمار روزانه فروشگاه ها',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['shop', 'created_date'], name='order_shop_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['updated_date'], name='order_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='orderdetail',
+            index=models.Index(fields=['updated_date'], name='order_detail_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='shopdailystats',
+            name='shop',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='shop_module.shop', verbose_name='کافه/فروشگاه'),
+        ),
+        migrations.AddIndex(
+            model_name='shopdailystats',
+            index=models.Index(fields=['computed_date'], name='shop_daily_stats_computed_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='shopdailystats',
+            constraint=models.UniqueConstraint(fields=('shop', 'date'), name='unique_shop_daily_stats'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-19 15:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('order_module', '0002_shop_daily_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderdetail',
+            name='feature_snapshot',
+            field=models.JSONField(blank=True, default=list, verbose_name='ویژگی های انتخاب شده'),
+        ),
+    ]
@@ -33,11 +33,19 @@ class Order(models.Model):
     payment_date = models.DateTimeField(null=True, blank=True, verbose_name='تاریخ پرداخت')
 
     def __str__(self):
-        return self.user.get_full_name()
+        # guest orders (table QR) have no user
+        if self.user_id:
+            return self.user.get_full_name()
+        return self.customer_name or str(self.id)
 
     class Meta:
         verbose_name = 'سبد سفارش'
         verbose_name_plural = 'سبدهای سفارش'
+        indexes = [
+            # the daily rollup: a shop's orders of a day, and the orders changed since the last run
+            models.Index(fields=['shop', 'created_date'], name='order_shop_created_idx'),
+            models.Index(fields=['updated_date'], name='order_updated_idx'),
+        ]
 
 
 class OrderDetail(models.Model):
@@ -48,16 +56,18 @@ class OrderDetail(models.Model):
                                 on_delete=models.PROTECT, verbose_name='محصول')
     qty = models.PositiveIntegerField(default=1, verbose_name='تعداد')
     final_price = models.IntegerField(null=True, blank=True, verbose_name='قیمت نهایی تکی محصول')
+    # the chosen product features as priced when ordered: [{"id", "feature", "value", "price"}]
+    feature_snapshot = models.JSONField(default=list, blank=True, verbose_name='ویژگی های انتخاب شده')
     created_date = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')
     updated_date = models.DateTimeField(auto_now=True, verbose_name='تاریخ بروز رسانی')
 
     def save(self, *args, **kwargs):
         if self.final_price is None:
-            self.final_price = self.product.price
+            self.final_price = self.product.final_price
         super().save(*args, **kwargs)
 
     def get_total_price(self):
-        return self.qty * self.product.price
+        return self.qty * (self.final_price or 0)
 
     def __str__(self):
         return str(self.order)
@@ -65,3 +75,36 @@ class OrderDetail(models.Model):
     class Meta:
         verbose_name = 'جزئیات سفارش'
         verbose_name_plural = 'لیست جزئیات سفارش'
+        indexes = [
+            models.Index(fields=['updated_date'], name='order_detail_updated_idx'),
+        ]
+
+
+# ------------------------------------------------------------------------------------------
+# Pre-aggregated daily figures of a shop, read by the shop dashboard.
+# The order columns are written by order_module.stats.rollup_shop_stats (the
+# rollup_shop_stats command), menu_views is counted live by record_menu_view.
+class ShopDailyStats(models.Model):
+    shop = models.ForeignKey(Shop, related_name='daily_stats', on_delete=models.CASCADE,
+                             verbose_name='کافه/فروشگاه')
+    date = models.DateField(verbose_name='تاریخ')
+    orders_count = models.PositiveIntegerField(default=0, verbose_name='تعداد سفارش ها')
+    paid_orders_count = models.PositiveIntegerField(default=0, verbose_name='تعداد سفارش های پرداخت شده')
+    revenue = models.BigIntegerField(default=0, verbose_name='درآمد (سفارش های پرداخت شده)')
+    items_sold = models.PositiveIntegerField(default=0, verbose_name='تعداد اقلام فروخته شده')
+    top_products = models.JSONField(default=list, blank=True, verbose_name='پرفروش ترین محصولات روز')
+    menu_views = models.PositiveIntegerField(default=0, verbose_name='تعداد بازدید منو')
+    computed_date = models.DateTimeField(null=True, blank=True, verbose_name='تاریخ آخرین محاسبه')
+
+    def __str__(self):
+        return f"{self.shop_id} {self.date}"
+
+    class Meta:
+        verbose_name = 'آمار روزانه فروشگاه'
+        verbose_name_plural = 'آمار روزانه فروشگاه ها'
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'date'], name='unique_shop_daily_stats'),
+        ]
+        indexes = [
+            models.Index(fields=['computed_date'], name='shop_daily_stats_computed_idx'),
+        ]
@@ -0,0 +1,201 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import BigIntegerField, Count, ExpressionWrapper, F, Max, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+# ----------------------------------------------------------------------------
+# Daily statistics of the shops (ShopDailyStats), the rows behind the shop
+# dashboard. The order figures are aggregated by rollup_shop_stats for the
+# (shop, day) pairs whose orders changed since the previous run, so the GROUP BYs
+# only ever see the orders of those days; the dashboard sums at most 90 rows.
+# Orders belong to the day they were created on (TIME_ZONE); revenue counts the
+# paid orders only.
+
+TOP_PRODUCTS_PER_DAY = 10
+DASHBOARD_TOP_PRODUCTS = 5
+DASHBOARD_PERIODS = (7, 30, 90)
+# orders committed by transactions that were still open when the previous run started
+ROLLUP_OVERLAP = timedelta(minutes=10)
+
+ROLLUP_FIELDS = ('orders_count', 'paid_orders_count', 'revenue', 'items_sold', 'top_products', 'computed_date')
+SUMMED_FIELDS = ('orders_count', 'paid_orders_count', 'revenue', 'items_sold', 'menu_views')
+
+
+def record_menu_view(shop_id, day=None):
+    """
+    Counts one view of the shop's menu on today's row with an F() increment.
+    """
+    from order_module.models import ShopDailyStats
+
+    day = day or timezone.localdate()
+    rows = ShopDailyStats.objects.filter(shop_id=shop_id, date=day)
+    if rows.update(menu_views=F('menu_views') + 1):
+        return
+    ShopDailyStats.objects.bulk_create([ShopDailyStats(shop_id=shop_id, date=day)], ignore_conflicts=True)
+    rows.update(menu_views=F('menu_views') + 1)
+
+
+# ----------------------------------------------------------------------------
+# Rollup
+
+def _changed_days(since):
+    """
+    (shop_id, day) pairs of the orders created, updated or with order details
+    updated since `since` (every order when None).
+    """
+    from order_module.models import Order
+
+    queries = [Order.objects.all()] if since is None else [
+        Order.objects.filter(updated_date__gte=since),
+        Order.objects.filter(order_details__updated_date__gte=since),
+    ]
+    pairs = set()
+    for orders in queries:
+        pairs.update(orders.annotate(day=TruncDate('created_date')).values_list('shop_id', 'day').distinct().order_by())
+    return pairs
+
+
+def _days_in_window(days):
+    """
+    Every (shop_id, day) pair of the last `days` days with orders or a stats row,
+    the latter to clear the figures of deleted orders.
+    """
+    from order_module.models import Order, ShopDailyStats
+
+    first = timezone.localdate() - timedelta(days=days - 1)
+    pairs = set(
+        Order.objects.filter(created_date__date__gte=first).annotate(day=TruncDate('created_date'))
+        .values_list('shop_id', 'day').distinct().order_by()
+    )
+    pairs.update(ShopDailyStats.objects.filter(date__gte=first).values_list('shop_id', 'date'))
+    return pairs
+
+
+def _pairs_filter(pairs, shop_field, date_lookup):
+    """
+    Q of the given (shop_id, day) pairs: each shop with the range of its own days,
+    so an old day of one shop does not widen the range of the others.
+    """
+    shop_days = {}
+    for shop_id, day in pairs:
+        shop_days.setdefault(shop_id, []).append(day)
+    condition = Q()
+    for shop_id, days in shop_days.items():
+        condition |= Q(**{shop_field: shop_id, f'{date_lookup}__range': (min(days), max(days))})
+    return condition
+
+
+def _aggregate_days(pairs):
+    """
+    {(shop_id, day): {rollup field: value}} from the orders of the given pairs.
+    """
+    from order_module.models import Order, OrderDetail
+
+    orders = Order.objects.filter(_pairs_filter(pairs, 'shop_id', 'created_date__date'))
+    details = OrderDetail.objects.filter(order__in=orders)
+    line_total = ExpressionWrapper(F('qty') * F('final_price'), output_field=BigIntegerField())
+    paid = Q(order__is_paid=True)
+
+    result = {pair: {'orders_count': 0, 'paid_orders_count': 0, 'revenue': 0, 'items_sold': 0, 'top_products': []}
+              for pair in pairs}
+    for row in orders.annotate(day=TruncDate('created_date')).values('shop_id', 'day').annotate(
+            orders_count=Count('pk'), paid_orders_count=Count('pk', filter=Q(is_paid=True))).order_by():
+        pair = (row.pop('shop_id'), row.pop('day'))
+        if pair in result:
+            result[pair].update(row)
+
+    detail_days = details.annotate(day=TruncDate('order__created_date'))
+    for row in detail_days.values('order__shop_id', 'day').annotate(
+            sold=Sum('qty'), sold_revenue=Sum(line_total, filter=paid)).order_by():
+        pair = (row['order__shop_id'], row['day'])
+        if pair in result:
+            result[pair].update(items_sold=row['sold'] or 0, revenue=row['sold_revenue'] or 0)
+
+    for row in detail_days.values('order__shop_id', 'day', 'product_id', 'product__name').annotate(
+            sold=Sum('qty'), sold_revenue=Sum(line_total, filter=paid)).order_by('-sold', 'product__name'):
+        top = result.get((row['order__shop_id'], row['day']))
+        if top is not None and len(top['top_products']) < TOP_PRODUCTS_PER_DAY:
+            top['top_products'].append({
+                'id': str(row['product_id']), 'name': row['product__name'],
+                'qty': row['sold'], 'revenue': row['sold_revenue'] or 0,
+            })
+    return result
+
+
+def rollup_shop_stats(days=None):
+    """
+    Writes the order figures of the (shop, day) rows whose orders changed since the
+    previous run (the latest computed_date), or of every day of the last `days` days.
+    menu_views is left alone. Returns the number of written rows.
+    """
+    from order_module.models import ShopDailyStats
+
+    started = timezone.now()
+    if days:
+        pairs = _days_in_window(days)
+    else:
+        last_run = ShopDailyStats.objects.aggregate(last=Max('computed_date'))['last']
+        pairs = _changed_days(last_run - ROLLUP_OVERLAP if last_run else None)
+    if not pairs:
+        return 0
+
+    figures = _aggregate_days(pairs)
+    rows = ShopDailyStats.objects.filter(_pairs_filter(pairs, 'shop_id', 'date'))
+    with transaction.atomic():
+        existing = set(rows.values_list('shop_id', 'date'))
+        ShopDailyStats.objects.bulk_create(
+            [ShopDailyStats(shop_id=shop_id, date=day) for shop_id, day in pairs - existing], ignore_conflicts=True)
+        changed = []
+        for row in rows.select_for_update():
+            values = figures.get((row.shop_id, row.date))
+            if values is None:
+                continue
+            for field, value in values.items():
+                setattr(row, field, value)
+            row.computed_date = started
+            changed.append(row)
+        ShopDailyStats.objects.bulk_update(changed, ROLLUP_FIELDS, batch_size=500)
+    return len(changed)
+
+
+# ----------------------------------------------------------------------------
+# Dashboard
+
+def dashboard_data(shop, today=None):
+    """
+    Totals of the last 7, 30 and 90 days, their best selling products (merged from
+    each day's top products, so an approximation for long periods) and the daily series.
+    """
+    from order_module.models import ShopDailyStats
+
+    today = today or timezone.localdate()
+    longest = max(DASHBOARD_PERIODS)
+    rows = list(ShopDailyStats.objects.filter(
+        shop=shop, date__gt=today - timedelta(days=longest), date__lte=today).order_by('date'))
+
+    periods = {}
+    for period in DASHBOARD_PERIODS:
+        first = today - timedelta(days=period - 1)
+        period_rows = [row for row in rows if row.date >= first]
+        totals = {field: sum(getattr(row, field) for row in period_rows) for field in SUMMED_FIELDS}
+        totals['average_order_value'] = (
+            totals['revenue'] // totals['paid_orders_count'] if totals['paid_orders_count'] else 0)
+
+        products = {}
+        for row in period_rows:
+            for item in row.top_products:
+                product = products.setdefault(item['id'], {'id': item['id'], 'name': item['name'], 'qty': 0, 'revenue': 0})
+                product['qty'] += item['qty']
+                product['revenue'] += item['revenue']
+        totals['top_products'] = sorted(products.values(), key=lambda p: (-p['qty'], p['name']))[:DASHBOARD_TOP_PRODUCTS]
+        periods[str(period)] = totals
+
+    return {
+        'periods': periods,
+        'daily': [
+            {'date': row.date, **{field: getattr(row, field) for field in SUMMED_FIELDS}} for row in rows
+        ],
+        'computed_date': max((row.computed_date for row in rows if row.computed_date), default=None),
+    }
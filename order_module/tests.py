@@ -1,3 +1,177 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework.throttling import ScopedRateThrottle
+
+from accounts_module.models import User
+from product_module.models import Product, Feature, ProductFeature
+from shop_module.models import Shop, ShopProfile
+from .models import Order, OrderDetail, ShopDailyStats
+from .stats import _pairs_filter, rollup_shop_stats
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
 
 # Create your tests here.
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, GEOCODING_OFFLINE_ONLY=True)
+class ShopDailyStatsTestCase(TestCase):
+    url = '/shops/api/v1/shop-dashboard/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(mobile='09120000020', user_type='seller')
+        ShopProfile.objects.filter(owner=self.user).update(is_complete=True)
+        self.shop = self.user.shopprofile.shop
+        self.latte = Product.objects.create(name='لاته', shop=self.shop, product_type=Product.CAFE, price=50000)
+        self.cake = Product.objects.create(name='کیک', shop=self.shop, product_type=Product.CAFE, price=30000)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_order(self, items, is_paid=False, days_ago=0):
+        order = Order.objects.create(shop=self.shop, is_paid=is_paid)
+        for product, qty in items:
+            OrderDetail.objects.create(order=order, product=product, qty=qty)
+        if days_ago:
+            Order.objects.filter(pk=order.pk).update(created_date=timezone.now() - timedelta(days=days_ago))
+        return order
+
+    def test_rollup_and_dashboard_periods(self):
+        self.create_order([(self.latte, 2), (self.cake, 1)], is_paid=True)
+        self.create_order([(self.cake, 3)])
+        self.create_order([(self.latte, 1)], is_paid=True, days_ago=40)
+        self.assertEqual(rollup_shop_stats(), 2)
+
+        today = ShopDailyStats.objects.get(shop=self.shop, date=timezone.localdate())
+        self.assertEqual((today.orders_count, today.paid_orders_count, today.items_sold, today.revenue),
+                         (2, 1, 6, 130000))
+        self.assertEqual([p['name'] for p in today.top_products], ['کیک', 'لاته'])
+
+        # an hour later with no order changed since: nothing to aggregate
+        ShopDailyStats.objects.update(computed_date=timezone.now() + timedelta(hours=1))
+        self.assertEqual(rollup_shop_stats(), 0)
+
+        self.client.post(f'/shops/api/v1/shop/{self.shop.pk}/menu-view/')
+        self.client.post(f'/shops/api/v1/shop/{self.shop.pk}/menu-view/')  # the same client, not counted again
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in ctx.captured_queries if 'order_module_order' in q['sql']])
+        periods = response.json()['data']['periods']
+        self.assertEqual((periods['7']['orders_count'], periods['7']['revenue'], periods['7']['menu_views']),
+                         (2, 130000, 1))
+        self.assertEqual((periods['90']['orders_count'], periods['90']['revenue']), (3, 180000))
+        self.assertEqual(periods['90']['top_products'][0]['name'], 'کیک')
+
+    def test_each_shop_is_aggregated_over_its_own_days(self):
+        other = User.objects.create(mobile='09120000029', user_type='seller').shopprofile.shop
+        old = self.create_order([(self.latte, 1)], days_ago=40)
+        Order.objects.create(shop=other)
+        skipped = Order.objects.create(shop=other)
+        Order.objects.filter(pk=skipped.pk).update(created_date=timezone.now() - timedelta(days=20))
+
+        today = timezone.localdate()
+        pairs = {(self.shop.pk, today - timedelta(days=40)), (other.pk, today)}
+        orders = Order.objects.filter(_pairs_filter(pairs, 'shop_id', 'created_date__date'))
+        self.assertEqual(set(orders.values_list('shop_id', flat=True)), {self.shop.pk, other.pk})
+        self.assertIn(old, orders)
+        self.assertNotIn(skipped, orders)
+
+    def test_menu_views_use_the_address_added_by_the_proxies(self):
+        url = f'/shops/api/v1/shop/{self.shop.pk}/menu-view/'
+        client = APIClient()
+        # NUM_PROXIES = 2: the client controls everything before the last two entries
+        for spoofed in ('1.1.1.1', '2.2.2.2'):
+            client.post(url, HTTP_X_FORWARDED_FOR=f'{spoofed}, 10.0.0.5, 10.1.1.1')
+        client.post(url, HTTP_X_FORWARDED_FOR='10.0.0.6, 10.1.1.1')
+        # another worker, nothing in its own memory, still knows the client
+        cache.clear()
+        client.post(url, HTTP_X_FORWARDED_FOR='10.0.0.5, 10.1.1.1')
+        self.assertEqual(ShopDailyStats.objects.get(shop=self.shop).menu_views, 2)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, GEOCODING_OFFLINE_ONLY=True)
+class OrderSubmissionTestCase(TestCase):
+    url = '/orders/api/v1/orders/'
+
+    def setUp(self):
+        cache.clear()
+        self.shop = User.objects.create(mobile='09120000022', user_type='seller').shopprofile.shop
+        other_shop = User.objects.create(mobile='09120000023', user_type='seller').shopprofile.shop
+        Shop.objects.filter(pk__in=[self.shop.pk, other_shop.pk]).update(shop_type='cafe')
+        ShopProfile.objects.update(is_complete=True)
+        self.latte = Product.objects.create(name='لاته', shop=self.shop, product_type=Product.CAFE, price=50000,
+                                            discount=10, is_active=True)
+        self.cake = Product.objects.create(name='کیک', shop=self.shop, product_type=Product.CAFE, price=30000,
+                                           is_active=True)
+        self.foreign = Product.objects.create(name='موکا', shop=other_shop, product_type=Product.CAFE, price=1000,
+                                              is_active=True)
+        syrup = Feature.objects.create(title='سیروپ', feature_type=Feature.CAFE, is_additive=True)
+        self.syrup = ProductFeature.objects.create(product=self.latte, feature=syrup, feature_value='کارامل',
+                                                   price=5000)
+
+    def order(self, items):
+        return {'shop': str(self.shop.pk), 'table_number': 4, 'items': items}
+
+    def test_order_is_priced_and_written_in_a_few_statements(self):
+        items = [{'product': str(self.latte.pk), 'qty': 2, 'features': [self.syrup.pk]},
+                 {'product': str(self.cake.pk), 'qty': 1}]
+        with CaptureQueriesContext(connection) as ctx:
+            response = APIClient().post(self.url, self.order(items), format='json')
+        self.assertEqual(response.status_code, 201)
+        # the throttle's history in the shared cache table is not part of the order
+        statements = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith(('SELECT', 'INSERT', 'UPDATE'))
+                      and 'silk_' not in q['sql'] and 'shared_cache' not in q['sql']]
+        self.assertEqual(len(statements), 5)
+
+        data = response.json()['data']
+        self.assertEqual(data['total_price'], 2 * (45000 + 5000) + 30000)
+        self.assertEqual(data['order_details'][0]['feature_snapshot'][0]['value'], 'کارامل')
+
+        # later price changes leave the order alone
+        self.latte.price = 90000
+        self.latte.save()
+        detail = OrderDetail.objects.get(order_id=data['id'], product=self.latte)
+        self.assertEqual(detail.get_total_price(), 100000)
+        self.assertEqual(str(detail.order), str(detail.order.id))
+
+    def test_foreign_products_and_features_are_rejected(self):
+        client = APIClient()
+        response = client.post(self.url, self.order([{'product': str(self.foreign.pk), 'qty': 1}]), format='json')
+        self.assertEqual(response.status_code, 400)
+        response = client.post(self.url, self.order([{'product': str(self.cake.pk), 'qty': 1,
+                                                      'features': [self.syrup.pk]}]), format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_only_complete_cafes_take_orders(self):
+        items = [{'product': str(self.cake.pk), 'qty': 1}]
+        Shop.objects.filter(pk=self.shop.pk).update(shop_type='shop')
+        self.assertEqual(APIClient().post(self.url, self.order(items), format='json').status_code, 400)
+        Shop.objects.filter(pk=self.shop.pk).update(shop_type='both')
+        ShopProfile.objects.filter(shop=self.shop).update(is_complete=False)
+        self.assertEqual(APIClient().post(self.url, self.order(items), format='json').status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_guests_are_throttled(self):
+        client = APIClient()
+        items = [{'product': str(self.cake.pk), 'qty': 1}]
+        with mock.patch.dict(ScopedRateThrottle.THROTTLE_RATES, {'orders': '2/minute'}):
+            codes = [client.post(self.url, self.order(items), format='json').status_code for _ in range(2)]
+            # the next request reaches another worker, nothing in its own memory
+            cache.clear()
+            codes.append(client.post(self.url, self.order(items), format='json').status_code)
+        self.assertEqual(codes, [201, 201, 429])
@@ -0,0 +1,28 @@
+from rest_framework.filters import BaseFilterBackend
+from rest_framework.settings import api_settings
+
+from product_module.search import search_products
+
+
+class ProductSearchFilter(BaseFilterBackend):
+    """
+    ?search= over the product search index (name, en_name, short_description and
+    description), Persian/Arabic spelling variants match each other.
+    Results are ranked by relevance unless ?ordering= is given.
+    """
+    search_param = api_settings.SEARCH_PARAM
+
+    def filter_queryset(self, request, queryset, view):
+        term = request.query_params.get(self.search_param, '')
+        if not term.strip():
+            return queryset
+        return search_products(queryset, term)
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': 'عبارت جستجو',
+            'schema': {'type': 'string'},
+        }]
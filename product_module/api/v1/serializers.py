@@ -1,8 +1,13 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Prefetch
 from rest_framework import serializers
 
 from product_module.models import ProductBrand, ShopProductCategory, CafeProductCategory, Product, \
     ProductFeature, Feature, ProductBundleItem, ProductBundle, ProductMediaFiles
 from shop_module.models import Shop
+from utils_module.serializers import SparseFieldsetsMixin, sync_nested
 
 
 # ----------------------------------------------------------------------------
@@ -86,8 +91,8 @@ class CafeProductsCategorySerializer(serializers.ModelSerializer):
     # Override the parent_category to return Persian values
     parent_category = serializers.SerializerMethodField()
 
-    # Field to hold the count of products associated with each category.
-    products_count = serializers.IntegerField(read_only=True)
+    # Alive products of the category, from the denormalized counters (product_module.counters).
+    products_count = serializers.IntegerField(source='product_counters.products_count', read_only=True, default=0)
 
     class Meta:
         model = CafeProductCategory
@@ -175,9 +180,15 @@ class NestedFeatureSerializer(serializers.ModelSerializer):
 # ----------------------------------------------------------------
 # Write serializer for product feature associations.
 class ProductFeatureSerializer(serializers.ModelSerializer):
+    # writable id: sent back on update to edit an existing row instead of replacing it
+    id = serializers.IntegerField(required=False)
+    # resolved in bulk by ProductSerializer.validate_features_data
+    feature = serializers.IntegerField()
+
     class Meta:
         model = ProductFeature
         fields = ['id', 'feature', 'feature_value', 'price' , 'final_price']
+        read_only_fields = ['final_price']
 
 
 # ----------------------------------------------------------------
@@ -200,6 +211,10 @@ class BrandSerializer(serializers.ModelSerializer):
 # Now, define a custom field that will behave like a PrimaryKeyRelatedField on input,
 # but will output a nested representation using BrandSerializer on GET.
 class BrandNestedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    def use_pk_only_optimization(self):
+        # hand over the (select_related) brand itself instead of a pk-only stub
+        return False
+
     def to_representation(self, value):
         # If the instance does not have the required attribute (e.g. 'title'),
         # then re-fetch the complete Brand instance from the database.
@@ -226,7 +241,7 @@ class BrandNestedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
 
 # ----------------------------------------------------------------
 # Product serializer integrating both read (product_features) and write (features_data) representations.
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     images = WritableNestedFieldProduct(
         source='image',  # maps serializer field 'images' to model field 'image'
         many=True,
@@ -259,6 +274,16 @@ class ProductSerializer(serializers.ModelSerializer):
             'is_wholesale', 'images', 'product_features', 'features_data', 'category', 'shop'
         ]
         read_only_fields = ['id', 'created_date', 'updated_date', 'shop']
+        # relations each rendered field needs, see SparseFieldsetsMixin.optimize_queryset
+        select_related_fields = {
+            'brand': ['brand'],
+            'category_name': ['cafe_category', 'shop_category'],
+            'category': ['cafe_category', 'shop_category'],
+        }
+        prefetch_related_fields = {
+            'images': ['image'],
+            'product_features': [Prefetch('product_features', queryset=ProductFeature.objects.select_related('feature'))],
+        }
         extra_kwargs = {
             'short_description': {'required': False, 'allow_blank': True, 'allow_null': True},
             'description': {'required': False, 'allow_blank': True, 'allow_null': True},
@@ -300,6 +325,34 @@ class ProductSerializer(serializers.ModelSerializer):
             return obj.cafe_category.title if obj.cafe_category else "-"
         return "-"
 
+    def validate_features_data(self, value):
+        # every referenced Feature in one query
+        features = Feature.objects.in_bulk({item['feature'] for item in value})
+        missing = sorted({item['feature'] for item in value} - features.keys())
+        if missing:
+            raise serializers.ValidationError({
+                "feature": f"Feature with id {missing[0]} does not exist."
+            })
+        for item in value:
+            item['feature'] = features[item['feature']]
+        return value
+
+    @staticmethod
+    def build_product_features(product, features_data):
+        return [
+            ProductFeature(
+                pk=item.get('id'),
+                product=product,
+                feature=item['feature'],
+                feature_value=item.get('feature_value'),
+                price=item.get('price', 0),
+                final_price=ProductFeature.compute_final_price(item.get('price', 0), product.discount,
+                                                               item['feature'].is_additive),
+            )
+            for item in features_data
+        ]
+
+    @transaction.atomic
     def create(self, validated_data):
         images = validated_data.pop('image', [])
         features_data = validated_data.pop('features_data', [])
@@ -308,26 +361,14 @@ class ProductSerializer(serializers.ModelSerializer):
         if images:
             product.image.set(images)
 
-        for feature_data in features_data:
-            feature_val = feature_data.get('feature')
-            if not isinstance(feature_val, Feature):
-                try:
-                    feature_instance = Feature.objects.get(pk=feature_val)
-                except Feature.DoesNotExist:
-                    raise serializers.ValidationError({
-                        "feature": f"Feature with id {feature_val} does not exist."
-                    })
-            else:
-                feature_instance = feature_val
-
-            ProductFeature.objects.create(
-                product=product,
-                feature=feature_instance,
-                feature_value=feature_data.get('feature_value'),
-                price=feature_data.get('price', 0)
-            )
+        if features_data:
+            features = self.build_product_features(product, features_data)
+            for feature in features:
+                feature.pk = None
+            ProductFeature.objects.bulk_create(features)
         return product
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         images = validated_data.pop('image', None)
         features_data = validated_data.pop('features_data', None)
@@ -336,41 +377,16 @@ class ProductSerializer(serializers.ModelSerializer):
         if images is not None:
             instance.image.set(images)
 
-        if images is not None:
-            instance.image.set(images)
-
-            # Check if features_data is provided
         if features_data is not None:
-            # If it's an empty list, delete all associated product features.
-            if not features_data:
-                instance.product_features.all().delete()
-            else:
-                # You might want to update, add, or remove only specific features.
-                # For simplicity, one approach is to clear all features first, and then add the provided ones.
-                # Alternatively, implement logic to diff the current features vs. provided data.
-
-                # Option 1: Clear all and recreate
-                instance.product_features.all().delete()
-                for feature_data in features_data:
-                    feature_val = feature_data.get('feature')
-                    if not isinstance(feature_val, Feature):
-                        try:
-                            feature_instance = Feature.objects.get(pk=feature_val)
-                        except Feature.DoesNotExist:
-                            raise serializers.ValidationError({
-                                "feature": f"Feature with id {feature_val} does not exist."
-                            })
-                    else:
-                        feature_instance = feature_val
-                    ProductFeature.objects.create(
-                        product=instance,
-                        feature=feature_instance,
-                        feature_value=feature_data.get('feature_value'),
-                        price=feature_data.get('price', 0)
-                    )
-                # Option 2: More refined update logic (update existing, add new, delete missing)
-                # would require you to compare the IDs of the current features with the IDs
-                # provided in 'features_data' and then do the respective operations.
+            # diff against the stored features: entries with an id (or the same feature and value)
+            # are updated in place, the rest are created, the missing ones deleted
+            sync_nested(
+                ProductFeature,
+                existing=list(instance.product_features.all()),
+                incoming=self.build_product_features(instance, features_data),
+                fields=['feature_id', 'feature_value', 'price', 'final_price'],
+                natural_key=lambda pf: (pf.feature_id, pf.feature_value),
+            )
         return instance
 
         # # Here we're updating product features without removing existing ones entirely.
@@ -523,7 +539,8 @@ class ProductSerializer(serializers.ModelSerializer):
 # Bundle
 class ProductBundleItemWriteSerializer(serializers.ModelSerializer):
     # Accepts a product primary key and quantity for write operations.
-    product = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
+    # resolved in bulk by ProductBundleSerializer.validate_bundle_items_data
+    product = serializers.UUIDField()
 
     class Meta:
         model = ProductBundleItem
@@ -582,22 +599,41 @@ class ProductBundleSerializer(serializers.ModelSerializer):
         # Return the image URL generated by the ProductBundle's method.
         return obj.get_image_url()
 
+    def validate_bundle_items_data(self, value):
+        # every referenced product in one query
+        ids = {item['product'] for item in value}
+        products = Product.objects.in_bulk(ids)
+        missing = sorted(str(pk) for pk in ids - products.keys())
+        if missing:
+            raise serializers.ValidationError({"product": f'Invalid pk "{missing[0]}" - object does not exist.'})
+        for item in value:
+            item['product'] = products[item['product']]
+        return value
+
+    @transaction.atomic
     def create(self, validated_data):
         # Pop out bundle items data
         items_data = validated_data.pop('bundle_items_data', [])
         bundle = ProductBundle.objects.create(**validated_data)
-        for item_data in items_data:
-            ProductBundleItem.objects.create(bundle=bundle, **item_data)
+        ProductBundleItem.objects.bulk_create([ProductBundleItem(bundle=bundle, **item) for item in items_data])
         return bundle
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        items_data = validated_data.pop('bundle_items_data', [])
+        items_data = validated_data.pop('bundle_items_data', None)
         # Update bundle fields first.
         instance = super().update(instance, validated_data)
-        # Remove current items and re-create them.
-        instance.bundle_items.all().delete()
-        for item_data in items_data:
-            ProductBundleItem.objects.create(bundle=instance, **item_data)
+        if items_data is None:
+            # partial update without items leaves them alone
+            return instance
+        # Keep the items of unchanged products, update quantities, add and remove the rest.
+        sync_nested(
+            ProductBundleItem,
+            existing=list(instance.bundle_items.all()),
+            incoming=[ProductBundleItem(bundle=instance, **item) for item in items_data],
+            fields=['product_id', 'quantity'],
+            natural_key=lambda item: item.product_id,
+        )
         return instance
 
 # ----------------------------------------------------------------
@@ -628,9 +664,46 @@ class ProductPricingUpdateSerializer(serializers.ModelSerializer):
         model = Product
         fields = ['price', 'discount', 'ordering_number']
 
+
+# -----------------------------------------------------------------
+# Bulk repricing of a shop's catalog
+class ProductBulkPricingSerializer(serializers.Serializer):
+    # which products, all of the shop when no filter is given
+    shop = serializers.UUIDField(required=False, help_text='فقط برای ادمین')
+    product_ids = serializers.ListField(child=serializers.UUIDField(), required=False)
+    cafe_category = serializers.IntegerField(required=False)
+    shop_category = serializers.IntegerField(required=False)
+    brand = serializers.IntegerField(required=False)
+    is_special = serializers.BooleanField(required=False, allow_null=True, default=None)
+    # what to change
+    discount = serializers.IntegerField(required=False, min_value=0, max_value=100)
+    price_change_percent = serializers.DecimalField(required=False, max_digits=6, decimal_places=2,
+                                                    min_value=Decimal(-100), max_value=Decimal(1000))
+    price_change_amount = serializers.IntegerField(required=False)
+    round_to = serializers.IntegerField(required=False, default=1, min_value=1,
+                                        help_text='گرد کردن قیمت های جدید، مثلاً 1000')
+
+    def validate(self, attrs):
+        if 'price_change_percent' in attrs and 'price_change_amount' in attrs:
+            raise serializers.ValidationError("فقط یکی از تغییر درصدی یا تغییر مبلغی قیمت را ارسال کنید.")
+        if not {'discount', 'price_change_percent', 'price_change_amount'} & attrs.keys():
+            raise serializers.ValidationError("تخفیف یا تغییر قیمت ارسال نشده است.")
+        return attrs
+
+    def filter_products(self, queryset):
+        data = self.validated_data
+        lookups = {
+            'pk__in': data.get('product_ids'),
+            'cafe_category_id': data.get('cafe_category'),
+            'shop_category_id': data.get('shop_category'),
+            'brand_id': data.get('brand'),
+            'is_special': data.get('is_special'),
+        }
+        return queryset.filter(**{key: value for key, value in lookups.items() if value is not None})
+
 # -----------------------------------------------------------------
 # File manager
-class ProductMediaFilesSerializer(serializers.ModelSerializer):
+class ProductMediaFilesSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     file_url = serializers.SerializerMethodField()
     file = serializers.FileField(write_only=True)
     # is_global = serializers.BooleanField(required=False)  # Allow client input but override in perform_create.
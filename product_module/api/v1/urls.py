@@ -26,6 +26,7 @@ urlpatterns = [
 
     # Price, Discount and ordering number change
     path('products/<uuid:pk>/update-pricing/', views.UpdateProductPricingView.as_view(), name='update_product_pricing'),
+    path('products/bulk-pricing/', views.BulkProductPricingView.as_view(), name='bulk_product_pricing'),
 
     # Product media type choices
     path('product-media-files-choices/', views.ProductMediaChoicesView.as_view(), name='product_media_files_choices'),
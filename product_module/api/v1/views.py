@@ -1,5 +1,6 @@
 from django.core.exceptions import ValidationError
-from django.db.models import Q, Count
+from django.db.models import Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg import openapi
@@ -17,13 +18,17 @@ from rest_framework.viewsets import ModelViewSet
 from rest_framework import filters
 
 from product_module.api.v1.permissions import IsAdminOrSuperuserOrReadOnly, IsShopOwnerOrAdmin
+from product_module.importers import ProductImporter, ImportFileError, iter_rows, export_rows
+from product_module.pricing import bulk_reprice
 from product_module.api.v1.serializers import ProductBrandSerializer, ShopProductsCategorySerializer, \
     CafeProductsCategorySerializer, \
     EmptyRestoreSerializer, ProductSerializer, FeatureSerializer, ProductBundleSerializer, ProductMediaFilesSerializer, \
-    ProductToggleActiveSerializer, ProductPricingUpdateSerializer
+    ProductToggleActiveSerializer, ProductPricingUpdateSerializer, ProductBulkPricingSerializer
 from product_module.models import ProductBrand, ShopProductCategory, CafeProductCategory, Product, Feature, \
     ProductBundle, ProductMediaFiles
 from shop_module.models import Shop
+from utils_module.mixins import ConditionalGetMixin, OrderableMixin, MediaLibraryListMixin, \
+    MEDIA_LIBRARY_PARAMETERS
 
 
 # ------------------------------------------------------------
@@ -203,10 +208,17 @@ class ShopProductCategoryChoicesView(APIView):
 
 # -------------------------------------------------------------------------
 # Cafe products categories
-class CafeProductCategoryViewSet(viewsets.ModelViewSet):
+class CafeProductCategoryViewSet(OrderableMixin, viewsets.ModelViewSet):
     serializer_class = CafeProductsCategorySerializer
     permission_classes = [IsShopOwnerOrAdmin]
 
+    def get_ordering_scope(self, instance=None):
+        # the categories of one menu
+        queryset = CafeProductCategory.objects.filter(is_deleted=False)
+        if instance is not None:
+            return queryset.filter(shop_id=instance.shop_id)
+        return queryset.filter(pk__in=self.get_queryset().values('pk'))
+
     def get_queryset(self):
         """
         Return a queryset filtered by the user's associated shop,
@@ -235,10 +247,8 @@ class CafeProductCategoryViewSet(viewsets.ModelViewSet):
         else:
             qs = qs.filter(is_deleted=False)
 
-        # Annotate with the count of related products and order the queryset
-        qs = qs.annotate(
-            products_count=Count('products', filter=Q(products__is_deleted=False))
-        ).order_by('-created_date')
+        # products_count comes from the category's counters row
+        qs = qs.select_related('product_counters').order_by('-created_date')
         return qs
 
         # """
@@ -397,9 +407,15 @@ class CafeProductCategoryViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_200_OK)
 
 # cafe product category choices
-class CafeCategoryChoicesView(APIView):
+class CafeCategoryChoicesView(ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticated]
+    conditional_version = CafeProductCategory.CAFE_MENU_CATEGORY_TYPE_CHOICES
+
     def get(self, request, format=None):
+        not_modified = self.not_modified_response(request)
+        if not_modified:
+            return not_modified
+
         parent_category_choices = [
             {"value": value, "label": label}
             for value, label in CafeProductCategory.CAFE_MENU_CATEGORY_TYPE_CHOICES
@@ -411,14 +427,17 @@ class CafeCategoryChoicesView(APIView):
 # ------------------------------------------------------------------------
 # Product
 # Product viewset with role‑based filtering, soft deletion, and recovery.
-class ProductViewSet(ModelViewSet):
+class ProductViewSet(OrderableMixin, ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
     permission_classes = [IsShopOwnerOrAdmin]
     filter_backends = [filters.OrderingFilter]
     # No ordering fields allowed from the request
-    ordering_fields = ['created_date', 'price', 'name']  # allow clients to order by these fields
+    ordering_fields = ['created_date', 'price', 'name', 'ordering_number']  # allow clients to order by these fields
     ordering = ['-created_date']  # default ordering
+    # Maximum number of queries per read endpoint, whatever the number of products.
+    # Enforced by product_module.tests, raise it only together with the prefetch plan.
+    query_budget = {'list': 5, 'retrieve': 5, 'deleted': 5}
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -431,9 +450,31 @@ class ProductViewSet(ModelViewSet):
 
         user = self.request.user
         if user.is_superuser:
-            return Product.all_objects.all()
+            queryset = Product.all_objects.all()
         else:
-            return Product.objects.filter(shop__profile__owner=user)
+            queryset = Product.objects.filter(shop__profile__owner=user)
+        return self.apply_prefetch_plan(queryset)
+
+    def get_ordering_scope(self, instance=None):
+        if instance is not None:
+            # a shop's products share one sequence, moves stay inside the product's shop
+            return self.get_queryset().filter(shop_id=instance.shop_id)
+        return self.get_queryset()
+
+    def apply_prefetch_plan(self, queryset):
+        """
+        Read endpoints load every relation ProductSerializer renders up front
+        (see ProductSerializer.Meta.select_related_fields / prefetch_related_fields),
+        so serializing a page costs a fixed number of queries.
+        Writes are left alone, a prefetched cache would go stale after the update.
+        """
+        if self.action not in self.query_budget:
+            return queryset
+        queryset = ProductSerializer.optimize_queryset(queryset, self.request)
+        if self.action == 'retrieve':
+            # IsShopOwnerOrAdmin.has_object_permission walks obj.shop.profile.owner
+            queryset = queryset.select_related('shop__profile')
+        return queryset
 
     def list(self, request, *args, **kwargs):
         # Apply all backend filters including ordering
@@ -506,6 +547,7 @@ class ProductViewSet(ModelViewSet):
             queryset = Product.all_objects.filter(is_deleted=True)
         else:
             queryset = Product.all_objects.filter(shop__profile__owner=user, is_deleted=True)
+        queryset = self.apply_prefetch_plan(queryset)
         page = self.paginate_queryset(queryset)
         serializer = self.get_serializer(page if page is not None else queryset, many=True)
         response_data = {
@@ -530,14 +572,59 @@ class ProductViewSet(ModelViewSet):
             "message": "محصول با موفقیت بازیابی شد."
         }, status=status.HTTP_200_OK)
 
-    def perform_create(self, serializer):
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('file', openapi.IN_FORM, type=openapi.TYPE_FILE, required=True,
+                              description='CSV (utf-8) or XLSX file with the export columns'),
+        ]
+    )
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser, FormParser])
+    def import_products(self, request):
+        """
+        Bulk catalog import, see product_module.importers.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({
+                "success": False,
+                "data": {},
+                "errors": "فایل محصولات ارسال نشده است."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        shop = self.get_owner_shop(request.data.get('shop'))
+        try:
+            report = ProductImporter(shop).run(iter_rows(upload.file, upload.name))
+        except ImportFileError as e:
+            return Response({
+                "success": False,
+                "data": {},
+                "errors": str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            "success": True,
+            "data": report,
+            "message": f"{report['created']} محصول با موفقیت ایجاد شد."
+        }, status=status.HTTP_201_CREATED if report['created'] else status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export_products(self, request):
+        """
+        Streams the shop's products as CSV, in the import format.
+        """
+        shop = self.get_owner_shop(request.query_params.get('shop'))
+        response = StreamingHttpResponse(export_rows(Product.objects.filter(shop=shop)),
+                                         content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="products-{shop.pk}.csv"'
+        return response
+
+    def get_owner_shop(self, shop_id=None):
         user = self.request.user
         if user.is_superuser:
-            shop_id = self.request.data.get('shop')
-            shop = get_object_or_404(Shop, id=shop_id)
-        else:
-            shop = get_object_or_404(Shop, profile__owner=user)
-        serializer.save(shop=shop)
+            return get_object_or_404(Shop, id=shop_id)
+        return get_object_or_404(Shop, profile__owner=user)
+
+    def perform_create(self, serializer):
+        serializer.save(shop=self.get_owner_shop(self.request.data.get('shop')))
 
     def perform_update(self, serializer):
         # Anytime a user updates the product, is_verified is reset to False.
@@ -545,9 +632,15 @@ class ProductViewSet(ModelViewSet):
 
 
 # product choices
-class ProductChoicesView(APIView):
+class ProductChoicesView(ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticated]
+    conditional_version = Product.PRODUCT_TYPE_CHOICES
+
     def get(self, request, format=None):
+        not_modified = self.not_modified_response(request)
+        if not_modified:
+            return not_modified
+
         product_type_choices = [
             {"value": key, "label": label}
             for key, label in Product.PRODUCT_TYPE_CHOICES
@@ -784,9 +877,48 @@ class UpdateProductPricingView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class BulkProductPricingView(APIView):
+    """
+    Reprices many products of the shop at once, e.g. after an inflation adjustment.
+
+    **Example Request Body:**
+    {
+        "cafe_category": 3,
+        "price_change_percent": 15,
+        "round_to": 1000
+    }
+    Feature and bundle prices are updated along with the products.
+    """
+    permission_classes = [IsShopOwnerOrAdmin]
+
+    @swagger_auto_schema(request_body=ProductBulkPricingSerializer)
+    def post(self, request, format=None):
+        serializer = ProductBulkPricingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+
+        if request.user.is_superuser:
+            shop = get_object_or_404(Shop, id=data.get('shop'))
+        else:
+            shop = get_object_or_404(Shop, profile__owner=request.user)
+
+        result = bulk_reprice(
+            serializer.filter_products(Product.objects.filter(shop=shop)),
+            discount=data.get('discount'),
+            percent=data.get('price_change_percent'),
+            amount=data.get('price_change_amount'),
+            round_to=data['round_to'],
+        )
+        return Response({
+            "success": True,
+            "data": result,
+            "message": f"قیمت {result['products']} محصول با موفقیت به‌روز رسانی شد."
+        }, status=status.HTTP_200_OK)
+
+
 # -----------------------------------------------------------------
 # File manager
-class ProductMediaFilesViewSet(viewsets.ModelViewSet):
+class ProductMediaFilesViewSet(MediaLibraryListMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows shop media files to be viewed, uploaded, edited and deleted.
     For list, create, retrieve, and update:
@@ -837,19 +969,6 @@ class ProductMediaFilesViewSet(viewsets.ModelViewSet):
             permission_classes = [IsShopOwnerOrAdmin]
         return [permission() for permission in permission_classes]
 
-    def _group_by_media_type(self, serialized_files):
-        """
-        Helper function that groups file objects by media_type.
-        Returns a dictionary with the media_type as keys and lists of file data as values.
-        """
-        grouped = {}
-        for file in serialized_files:
-            media_type = file.get("media_type")
-            if media_type not in grouped:
-                grouped[media_type] = []
-            grouped[media_type].append(file)
-        return grouped
-
     @swagger_auto_schema(
         manual_parameters=[
             openapi.Parameter(
@@ -876,33 +995,14 @@ class ProductMediaFilesViewSet(viewsets.ModelViewSet):
                 description='Filter files by global flag (true/false)',
                 type=openapi.TYPE_BOOLEAN
             ),
-        ]
+        ] + MEDIA_LIBRARY_PARAMETERS
     )
     def list(self, request, *args, **kwargs):
         """
-        List files grouped into global and shop files.
-        No pagination is applied; all matching records are loaded.
+        List files grouped into global and shop files, see MediaLibraryListMixin
+        for the optional per group pagination.
         """
-        # Apply filtering / search.
-        queryset = self.filter_queryset(self.get_queryset())
-
-        # Split the resulting queryset into two groups.
-        global_files_qs = queryset.filter(is_global=True)
-        local_files_qs = queryset.exclude(is_global=True)
-
-        # Serialize both groups.
-        global_serialized = self.get_serializer(global_files_qs, many=True).data
-        shop_serialized = self.get_serializer(local_files_qs, many=True).data
-
-        # Group them by media_type.
-        grouped_global_files = self._group_by_media_type(global_serialized)
-        grouped_local_files = self._group_by_media_type(shop_serialized)
-
-        response_data = {
-            "global_files": grouped_global_files,
-            "local_files": grouped_local_files
-        }
-        response = Response(response_data, status=status.HTTP_200_OK)
+        response = Response(self.get_media_library_data(), status=status.HTTP_200_OK)
         response.message = "فایلها با موفقیت فراخوانی شدند."
         return response
 
@@ -998,9 +1098,15 @@ class ProductMediaFilesViewSet(viewsets.ModelViewSet):
             serializer.save(shop=shop, is_global=False)
 
 # Product media type choices
-class ProductMediaChoicesView(APIView):
+class ProductMediaChoicesView(ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticated]
+    conditional_version = (ProductMediaFiles.MEDIA_TYPE_CHOICES, ProductMediaFiles.MEDIA_CATEGORY_CHOICES)
+
     def get(self, request, format=None):
+        not_modified = self.not_modified_response(request)
+        if not_modified:
+            return not_modified
+
         media_type_choices = [
             {"value": key, "label": label}
             for key, label in ProductMediaFiles.MEDIA_TYPE_CHOICES
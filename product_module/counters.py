@@ -0,0 +1,191 @@
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+# ----------------------------------------------------------------------------
+# Denormalized product counters per shop (ShopProductCounters) and per cafe menu
+# category (CafeCategoryProductCounters). They count alive (not soft deleted)
+# products and are moved with F() increments in the transaction of the save that
+# changed them, from the difference between the row's state before (read with a
+# row lock, so concurrent saves of one product apply their deltas one after the
+# other) and after.
+# Writes that skip Product.save must call count_new_products / apply_counter_changes;
+# the reconcile_product_counters command repairs any drift.
+
+# counter column -> condition on an alive product
+PRODUCT_COUNTERS = {
+    'products_count': Q(),
+    'active_products_count': Q(is_active=True),
+    'special_products_count': Q(is_special=True),
+    'verified_products_count': Q(is_verified=True),
+}
+COUNTED_FIELDS = ('shop_id', 'cafe_category_id', 'is_deleted', 'is_active', 'is_special', 'is_verified')
+BUNDLE_COUNTED_FIELDS = ('shop_id', 'is_active')
+
+
+def changes_counters(update_fields):
+    """
+    False for a save(update_fields=...) that leaves every counted field alone.
+    """
+    if update_fields is None:
+        return True
+    return any(name in COUNTED_FIELDS or f'{name}_id' in COUNTED_FIELDS for name in update_fields)
+
+
+def counted_state(instance, fields=COUNTED_FIELDS):
+    """
+    The values of the counted fields, None when one of them was deferred.
+    """
+    if set(fields) & instance.get_deferred_fields():
+        return None
+    return tuple(getattr(instance, field) for field in fields)
+
+
+def stored_state(instance, fields=COUNTED_FIELDS):
+    """
+    State of the row before a save, read with SELECT ... FOR UPDATE; must run in the
+    save's transaction. None for a new row.
+    """
+    if instance._state.adding:
+        return None
+    return type(instance)._base_manager.select_for_update().filter(pk=instance.pk).values_list(*fields).first()
+
+
+def _product_counts(state):
+    changes = {}
+    if state is None:
+        return changes
+    shop_id, category_id, is_deleted, is_active, is_special, is_verified = state
+    if is_deleted:
+        return changes
+    values = {
+        'products_count': 1, 'active_products_count': int(is_active),
+        'special_products_count': int(is_special), 'verified_products_count': int(is_verified),
+    }
+    changes[('shop', shop_id)] = values
+    if category_id is not None:
+        changes[('category', category_id)] = dict(values)
+    return changes
+
+
+def product_counter_changes(old_state, new_state):
+    """
+    {(kind, pk): {counter: delta}} moving a product from old_state to new_state.
+    """
+    changes = _product_counts(new_state)
+    for key, values in _product_counts(old_state).items():
+        target = changes.setdefault(key, {})
+        for counter, value in values.items():
+            target[counter] = target.get(counter, 0) - value
+    return changes
+
+
+def bundle_counter_changes(old_state, new_state):
+    changes = {}
+    for state, sign in ((new_state, 1), (old_state, -1)):
+        if state is not None and state[1]:
+            counters = changes.setdefault(('shop', state[0]), {})
+            counters['active_bundles_count'] = counters.get('active_bundles_count', 0) + sign
+    return changes
+
+
+def apply_counter_changes(changes, create_missing=True):
+    """
+    Adds the deltas with one UPDATE per counter row. A missing row is created first
+    (a new shop or category), unless the change comes from a delete.
+    """
+    from product_module.models import ShopProductCounters, CafeCategoryProductCounters
+    from shop_module import panel_cache
+
+    models = {'shop': (ShopProductCounters, 'shop_id'), 'category': (CafeCategoryProductCounters, 'category_id')}
+    for (kind, pk), values in changes.items():
+        values = {counter: delta for counter, delta in values.items() if delta}
+        if pk is None or not values:
+            continue
+        model, key = models[kind]
+        if kind == 'shop':
+            # the shop panel shows the counts
+            panel_cache.invalidate_shop(pk)
+        update = {counter: F(counter) + delta for counter, delta in values.items()}
+        if model.objects.filter(**{key: pk}).update(**update) or not create_missing:
+            continue
+        model.objects.bulk_create([model(**{key: pk})], ignore_conflicts=True)
+        model.objects.filter(**{key: pk}).update(**update)
+
+
+def count_new_products(products):
+    """
+    Counts products written by bulk_create, grouped into one change per shop / category.
+    """
+    changes = {}
+    for product in products:
+        for key, values in product_counter_changes(None, counted_state(product)).items():
+            target = changes.setdefault(key, {})
+            for counter, value in values.items():
+                target[counter] = target.get(counter, 0) + value
+    apply_counter_changes(changes)
+
+
+# ----------------------------------------------------------------------------
+# Reconciliation
+
+def _aggregate(queryset, group_by, counters):
+    return {
+        row.pop(group_by): row
+        for row in queryset.values(group_by).annotate(**counters).order_by()
+    }
+
+
+def reconcile_counters(shop_ids=None):
+    """
+    Recounts every counter row from the products and bundles and writes the rows
+    that drifted. Returns the number of repaired (or created) rows.
+    """
+    from product_module.models import Product, ProductBundle, CafeProductCategory, ShopProductCounters, \
+        CafeCategoryProductCounters
+    from shop_module import panel_cache
+    from shop_module.models import Shop
+
+    aggregates = {counter: Count('pk', filter=condition) for counter, condition in PRODUCT_COUNTERS.items()}
+    zero = dict.fromkeys(PRODUCT_COUNTERS, 0)
+    shops = Shop.objects.all()
+    products = Product.objects.all()
+    categories = CafeProductCategory.objects.all()
+    bundles = ProductBundle.objects.filter(is_active=True)
+    if shop_ids is not None:
+        shops, products = shops.filter(pk__in=shop_ids), products.filter(shop_id__in=shop_ids)
+        categories, bundles = categories.filter(shop_id__in=shop_ids), bundles.filter(shop_id__in=shop_ids)
+
+    shop_counts = _aggregate(products, 'shop_id', aggregates)
+    bundle_counts = dict(bundles.values_list('shop_id').annotate(count=Count('pk')).order_by())
+    category_counts = _aggregate(products.filter(cafe_category__isnull=False), 'cafe_category_id', aggregates)
+
+    expected = [
+        (ShopProductCounters, 'shop_id', {
+            pk: {**zero, **shop_counts.get(pk, {}), 'active_bundles_count': bundle_counts.get(pk, 0)}
+            for pk in shops.values_list('pk', flat=True)
+        }),
+        (CafeCategoryProductCounters, 'category_id', {
+            pk: {**zero, **category_counts.get(pk, {})} for pk in categories.values_list('pk', flat=True)
+        }),
+    ]
+    repaired = 0
+    for model, key, rows in expected:
+        fields = list(next(iter(rows.values()), zero))
+        current = {getattr(row, key): row for row in model.objects.filter(**{f'{key}__in': rows})}
+        missing, drifted = [], []
+        for pk, values in rows.items():
+            row = current.get(pk)
+            if row is None:
+                missing.append(model(**{key: pk}, **values))
+            elif any(getattr(row, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(row, field, value)
+                drifted.append(row)
+        with transaction.atomic():
+            model.objects.bulk_create(missing, ignore_conflicts=True)
+            model.objects.bulk_update(drifted, fields, batch_size=500)
+            if model is ShopProductCounters and (missing or drifted):
+                # the shop panel shows the counts
+                panel_cache.invalidate_shops(row.shop_id for row in missing + drifted)
+        repaired += len(missing) + len(drifted)
+    return repaired
@@ -0,0 +1,251 @@
+import csv
+import io
+import uuid
+
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils.text import slugify
+
+from product_module.counters import count_new_products
+from product_module.models import Product, ProductBrand, CafeProductCategory, ShopProductCategory, Feature, \
+    ProductFeature, ProductSearchToken, generate_random_string
+from product_module.search import build_search_tokens, product_name_index
+from utils_module.normalizers import normalize_text
+
+try:
+    import openpyxl
+except ImportError:  # pragma: no cover - xlsx files are refused without it
+    openpyxl = None
+
+# ----------------------------------------------------------------------------
+# Bulk catalog import / export. One file row is one product; features are
+# written as "feature title:value:price" entries separated by "|".
+# Export and import share the columns, so an exported file can be edited and
+# imported into another shop.
+
+COLUMNS = [
+    'name', 'en_name', 'product_type', 'category', 'brand', 'price', 'discount', 'ordering_number',
+    'short_description', 'description', 'is_special', 'is_active', 'is_wholesale', 'features',
+]
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 100
+
+_TRUE_VALUES = {'1', 'true', 'yes', 'بله'}
+
+
+class ImportFileError(Exception):
+    pass
+
+
+# ----------------------------------------------------------------------------
+# Reading
+
+def iter_rows(file, filename):
+    """
+    Yields (row number, {column: text}) from a .csv or .xlsx upload without loading it whole.
+    """
+    if filename.lower().endswith('.xlsx'):
+        yield from _iter_xlsx_rows(file)
+    else:
+        yield from _iter_csv_rows(file)
+
+
+def _iter_csv_rows(file):
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    if not reader.fieldnames or 'name' not in reader.fieldnames:
+        raise ImportFileError("ستون name در فایل وجود ندارد.")
+    for number, row in enumerate(reader, start=2):
+        yield number, {key: (value or '').strip() for key, value in row.items() if key}
+
+
+def _iter_xlsx_rows(file):
+    if openpyxl is None:
+        raise ImportFileError("بارگذاری فایل اکسل روی سرور فعال نیست، از فایل CSV استفاده کنید.")
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else '' for cell in next(rows, ())]
+        if 'name' not in header:
+            raise ImportFileError("ستون name در فایل وجود ندارد.")
+        for number, values in enumerate(rows, start=2):
+            yield number, {key: str(value).strip() if value is not None else ''
+                           for key, value in zip(header, values) if key}
+    finally:
+        workbook.close()
+
+
+# ----------------------------------------------------------------------------
+# Importing
+
+class ProductImporter:
+    """
+    Validates rows in batches against lookup maps built once per import
+    (categories, brands, features) and writes every batch with bulk_create.
+    Invalid rows are skipped and reported, valid ones are imported.
+    """
+
+    def __init__(self, shop):
+        self.shop = shop
+        self.created = 0
+        self.errors = []
+        self.error_count = 0
+
+        cafe_categories = CafeProductCategory.objects.filter(shop=shop, is_deleted=False).only('id', 'title')
+        self.categories = {
+            Product.CAFE: {normalize_text(c.title): c.pk for c in cafe_categories},
+            Product.SHOP: {normalize_text(c.title): c.pk for c in ShopProductCategory.objects.only('id', 'title')},
+        }
+        self.brands = {normalize_text(b.title): b.pk for b in ProductBrand.objects.only('id', 'title')}
+        self.features = {(f.feature_type, normalize_text(f.title)): f for f in Feature.objects.all()}
+
+    def run(self, rows):
+        batch = []
+        for number, row in rows:
+            batch.append((number, row))
+            if len(batch) >= BATCH_SIZE:
+                self._import_batch(batch)
+                batch = []
+        if batch:
+            self._import_batch(batch)
+        return {'created': self.created, 'error_count': self.error_count, 'errors': self.errors}
+
+    def _report(self, number, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': number, 'errors': errors})
+
+    def _import_batch(self, batch):
+        products, features = [], []
+        for number, row in batch:
+            errors = {}
+            product = self._build_product(row, errors)
+            product_features = self._build_features(row, product, errors)
+            if errors:
+                self._report(number, errors)
+                continue
+            products.append(product)
+            features += product_features
+
+        if not products:
+            return
+        tokens = [ProductSearchToken(product_id=p.pk, token=token, weight=weight)
+                  for p in products for token, weight in build_search_tokens(p).items()]
+        with transaction.atomic():
+            Product.objects.bulk_create(products)
+            ProductFeature.objects.bulk_create(features)
+            ProductSearchToken.objects.bulk_create(tokens)
+            # bulk_create skips Product.save, count the new products here
+            count_new_products(products)
+            if any(p.is_active for p in products):
+                product_name_index.changed()
+            transaction.on_commit(lambda: product_name_index.upsert_many(
+                (p.pk, p.name, ('', str(p.shop_id)), {'id': str(p.pk), 'name': p.name, 'shop': str(p.shop_id)})
+                for p in products if p.is_active
+            ))
+        self.created += len(products)
+
+    @staticmethod
+    def _int(row, column, errors, maximum=None):
+        value = row.get(column) or '0'
+        try:
+            number = int(float(normalize_text(value)))
+        except (ValueError, OverflowError):
+            errors[column] = "عدد معتبر نیست."
+            return 0
+        if number < 0 or (maximum is not None and number > maximum):
+            errors[column] = "مقدار خارج از محدوده مجاز است."
+        return number
+
+    @staticmethod
+    def _bool(row, column):
+        return normalize_text(row.get(column)) in _TRUE_VALUES
+
+    def _build_product(self, row, errors):
+        name = row.get('name', '')
+        if not name:
+            errors['name'] = "نام محصول الزامی است."
+        product_type = row.get('product_type') or (Product.CAFE if self.shop.shop_type == 'cafe' else Product.SHOP)
+        if product_type not in (Product.CAFE, Product.SHOP):
+            errors['product_type'] = "نوع محصول باید cafe یا shop باشد."
+
+        category_id = brand_id = None
+        if row.get('category'):
+            category_id = self.categories.get(product_type, {}).get(normalize_text(row['category']))
+            if category_id is None:
+                errors['category'] = "دسته بندی پیدا نشد."
+        if row.get('brand'):
+            brand_id = self.brands.get(normalize_text(row['brand']))
+            if brand_id is None:
+                errors['brand'] = "برند پیدا نشد."
+
+        price = self._int(row, 'price', errors)
+        discount = self._int(row, 'discount', errors, maximum=100)
+        # bulk_create skips Product.save and the pre_save slug receiver, do their work here
+        en_name = row.get('en_name') or generate_random_string()
+        return Product(
+            id=uuid.uuid4(), shop=self.shop, name=name[:300], en_name=en_name[:300],
+            slug=slugify(en_name)[:350], product_type=product_type,
+            cafe_category_id=category_id if product_type == Product.CAFE else None,
+            shop_category_id=category_id if product_type == Product.SHOP else None,
+            brand_id=brand_id, price=price, discount=discount,
+            final_price=price - (price * discount // 100),
+            ordering_number=self._int(row, 'ordering_number', errors),
+            short_description=row.get('short_description', '')[:360], description=row.get('description', ''),
+            is_special=self._bool(row, 'is_special'), is_active=self._bool(row, 'is_active'),
+            is_wholesale=self._bool(row, 'is_wholesale'),
+        )
+
+    def _build_features(self, row, product, errors):
+        features = []
+        for entry in filter(None, (part.strip() for part in row.get('features', '').split('|'))):
+            title, _, rest = entry.partition(':')
+            value, _, price = rest.partition(':')
+            feature = self.features.get((product.product_type, normalize_text(title)))
+            if feature is None:
+                errors['features'] = f"ویژگی «{title}» پیدا نشد."
+                continue
+            try:
+                price = int(float(normalize_text(price) or 0))
+            except (ValueError, OverflowError):
+                errors['features'] = f"قیمت ویژگی «{title}» معتبر نیست."
+                continue
+            # same rule as ProductFeature.save
+            final_price = price if feature.is_additive else price - (price * product.discount // 100)
+            features.append(ProductFeature(product=product, feature=feature, feature_value=value.strip()[:255],
+                                           price=price, final_price=final_price))
+        return features
+
+
+# ----------------------------------------------------------------------------
+# Exporting
+
+class _Echo:
+    """
+    File-like object whose write returns the value, csv.writer then yields lines.
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, chunk_size=1000):
+    """
+    Yields CSV lines of the products, fetched chunk by chunk.
+    """
+    writer = csv.writer(_Echo())
+    yield '\ufeff'  # BOM, lets Excel open the Persian text as utf-8
+    yield writer.writerow(COLUMNS)
+
+    queryset = queryset.select_related('cafe_category', 'shop_category', 'brand').prefetch_related(
+        Prefetch('product_features', queryset=ProductFeature.objects.select_related('feature'))
+    ).order_by('ordering_number', 'created_date')
+    for product in queryset.iterator(chunk_size=chunk_size):
+        category = product.cafe_category if product.product_type == Product.CAFE else product.shop_category
+        features = '|'.join(f'{pf.feature.title}:{pf.feature_value or ""}:{pf.price}'
+                            for pf in product.product_features.all())
+        yield writer.writerow([
+            product.name, product.en_name or '', product.product_type, category.title if category else '',
+            product.brand.title if product.brand else '', product.price, product.discount, product.ordering_number,
+            product.short_description or '', product.description or '', int(product.is_special),
+            int(product.is_active), int(product.is_wholesale), features,
+        ])
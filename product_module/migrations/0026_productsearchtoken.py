@@ -0,0 +1,49 @@
+# Generated by Django 4.2.20 on 2026-10-19 14:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from product_module.search import build_search_tokens
+
+
+def build_search_index(apps, schema_editor):
+    Product = apps.get_model('product_module', 'Product')
+    ProductSearchToken = apps.get_model('product_module', 'ProductSearchToken')
+
+    batch = []
+    for product in Product.objects.only('id', 'name', 'en_name', 'short_description', 'description').iterator(
+            chunk_size=500):
+        batch += [ProductSearchToken(product_id=product.pk, token=token, weight=weight)
+                  for token, weight in build_search_tokens(product).items()]
+        if len(batch) >= 5000:
+            ProductSearchToken.objects.bulk_create(batch)
+            batch = []
+    ProductSearchToken.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_module', '0025_alter_productmediafiles_media_category'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(db_index=True, max_length=64, verbose_name='واژه')),
+                ('weight', models.PositiveSmallIntegerField(default=1, verbose_name='وزن')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='product_module.product', verbose_name='محصول')),
+            ],
+            options={
+                'verbose_name': 'واژه جستجوی محصول',
+                'verbose_name_plural': 'واژه های جستجوی محصولات',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='productsearchtoken',
+            constraint=models.UniqueConstraint(fields=('product', 'token'), name='unique_product_search_token'),
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.20 on 2026-10-19 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product_module', '0026_productsearchtoken'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cafeproductcategory',
+            index=models.Index(fields=['shop', 'is_deleted', 'ordering_number'], name='cafe_category_menu_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['shop', 'is_deleted', 'is_active', 'product_type'], name='product_shop_alive_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_active', 'is_deleted', 'is_wholesale', 'product_type', 'created_date'], name='product_market_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productmediafiles',
+            index=models.Index(fields=['shop', 'media_type', 'is_global'], name='product_media_shop_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productmediafiles',
+            index=models.Index(fields=['is_global', 'media_type'], name='product_media_global_idx'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 4.2.20 on 2026-10-19 14:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, Q
+
+
+def fill_counters(apps, schema_editor):
+    Product = apps.get_model('product_module', 'Product')
+    ProductBundle = apps.get_model('product_module', 'ProductBundle')
+    ShopProductCounters = apps.get_model('product_module', 'ShopProductCounters')
+    CafeCategoryProductCounters = apps.get_model('product_module', 'CafeCategoryProductCounters')
+
+    counters = {
+        'products_count': Count('pk'),
+        'active_products_count': Count('pk', filter=Q(is_active=True)),
+        'special_products_count': Count('pk', filter=Q(is_special=True)),
+        'verified_products_count': Count('pk', filter=Q(is_verified=True)),
+    }
+    alive = Product.objects.filter(is_deleted=False)
+    bundles = dict(ProductBundle.objects.filter(is_active=True).values_list('shop_id').annotate(n=Count('pk'))
+                   .order_by())
+    shops = {row.pop('shop_id'): row for row in alive.values('shop_id').annotate(**counters).order_by()}
+    ShopProductCounters.objects.bulk_create([
+        ShopProductCounters(shop_id=shop_id, active_bundles_count=bundles.get(shop_id, 0), **shops.get(shop_id, {}))
+        for shop_id in set(shops) | set(bundles)
+    ], batch_size=500)
+    CafeCategoryProductCounters.objects.bulk_create([
+        CafeCategoryProductCounters(category_id=row.pop('cafe_category_id'), **row)
+        for row in alive.filter(cafe_category__isnull=False).values('cafe_category_id').annotate(**counters)
+        .order_by()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop_module', '0013_hot_path_indexes'),
+        ('product_module', '0027_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CafeCategoryProductCounters',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='product_counters', serialize=False, to='product_module.cafeproductcategory', verbose_name='دسته بندی محصول کافه')),
+                ('products_count', models.IntegerField(default=0, verbose_name='تعداد محصولات')),
+                ('active_products_count', models.IntegerField(default=0, verbose_name='تعداد محصولات فعال')),
+                ('special_products_count', models.IntegerField(default=0, verbose_name='تعداد محصولات اسپشیالیتی')),
+                ('verified_products_count', models.IntegerField(default=0, verbose_name='تعداد محصولات تأیید شده')),
+            ],
+            options={
+                'verbose_name': 'شمارنده محصولات دسته بندی کافه',
+                'verbose_name_plural': 'شمارنده های محصولات دسته بندی های کافه',
+            },
+        ),
+        migrations.CreateModel(
+            name='ShopProductCounters',
+            fields=[
+                ('shop', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='product_counters', serialize=False, to='shop_module.shop', verbose_name='کافه/فروشگاه')),
+                ('products_count', models.IntegerField(default=0, verbose_name='تعداد محصولات')),
+                ('active_products_count', models.IntegerField(default=0, verbose_name='تعداد محصولات فعال')),
+                ('special_products_count', models.IntegerField(default=0, verbose_name='تعداد محصولات اسپشیالیتی')),
+                ('verified_products_count', models.IntegerField(default=0, verbose_name='تعداد محصولات تأیید شده')),
+                ('active_bundles_count', models.IntegerField(default=0, verbose_name='تعداد باندل های فعال')),
+            ],
+            options={
+                'verbose_name': 'شمارنده محصولات فروشگاه',
+                'verbose_name_plural': 'شمارنده های محصولات فروشگاه ها',
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -3,8 +3,8 @@ import uuid
 from pathlib import Path
 
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from django.db.models.signals import pre_save, post_save
+from django.db import models, transaction
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.urls import reverse
 from django.utils import timezone
@@ -13,6 +13,10 @@ from django.utils.text import slugify
 from multiselectfield import MultiSelectField
 from rest_framework.exceptions import ValidationError
 
+from product_module.counters import BUNDLE_COUNTED_FIELDS, apply_counter_changes, bundle_counter_changes, \
+    changes_counters, counted_state, product_counter_changes, stored_state
+from product_module.search import SEARCH_FIELD_WEIGHTS, name_index_state, reindex_product, sync_product_name, \
+    product_name_index
 from shop_module.models import Shop
 
 
@@ -75,6 +79,11 @@ class ProductMediaFiles(models.Model):
     class Meta:
         verbose_name = 'فایل مربوط به محصول کافه/فروشگاه'
         verbose_name_plural = 'فایلهای مربوط به محصولات کافه/فروشگاه'
+        indexes = [
+            # file manager: a shop's files / the global files of a media type
+            models.Index(fields=['shop', 'media_type', 'is_global'], name='product_media_shop_type_idx'),
+            models.Index(fields=['is_global', 'media_type'], name='product_media_global_idx'),
+        ]
 
 
 # ----------------------------------------------------------------------------------
@@ -225,6 +234,10 @@ class CafeProductCategory(models.Model):
     class Meta:
         verbose_name = 'دسته بندی محصول کافه'
         verbose_name_plural = 'دسته بندی محصولات کافه'
+        indexes = [
+            # a cafe menu in display order
+            models.Index(fields=['shop', 'is_deleted', 'ordering_number'], name='cafe_category_menu_idx'),
+        ]
 
 
 # ------------------------------------------------------------------------------------------
@@ -317,6 +330,13 @@ class Product(models.Model):
     def __str__(self):
         return f"{self.name} ({self.price})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # typeahead state as loaded, see product_module.search.sync_product_name
+        instance._name_index_state = name_index_state(instance)
+        return instance
+
     def save(self, *args, **kwargs):
         # Calculate final price based on price and discount.
         # Using integer arithmetic; adjust as needed if you require floats.
@@ -324,12 +344,25 @@ class Product(models.Model):
         # Set created_date if not already set (this code is already in your save)
         if not self.created_date:
             self.created_date = timezone.now()
-        # Call the superclass's save method to continue saving.
-        super(Product, self).save(*args, **kwargs)
+        if not changes_counters(kwargs.get('update_fields')):
+            super(Product, self).save(*args, **kwargs)
+            return
+        with transaction.atomic():
+            old_state = stored_state(self)
+            # Call the superclass's save method to continue saving.
+            super(Product, self).save(*args, **kwargs)
+            apply_counter_changes(product_counter_changes(old_state, counted_state(self)))
 
     class Meta:
         verbose_name = 'محصول'
         verbose_name_plural = 'محصولات'
+        indexes = [
+            # a shop's alive products (AliveProductManager, ProductViewSet, cafe menu)
+            models.Index(fields=['shop', 'is_deleted', 'is_active', 'product_type'], name='product_shop_alive_idx'),
+            # shop market listing, newest / oldest first
+            models.Index(fields=['is_active', 'is_deleted', 'is_wholesale', 'product_type', 'created_date'],
+                         name='product_market_idx'),
+        ]
 
     def get_images_urls(self):
         # Iterate over the many-to-many relation using the field name `image`
@@ -384,16 +417,17 @@ class ProductFeature(models.Model):
     def __str__(self):
         return f"{self.product.name} - {self.feature.title}: {self.feature_value}"
 
-    def save(self, *args, **kwargs):
-        if not self.feature.is_additive:
+    @staticmethod
+    def compute_final_price(price, discount, is_additive):
+        if not is_additive:
             # Compute the discount amount based on the feature's price
-            discount_amount = (self.price * self.product.discount) // 100
-            self.final_price = self.price - discount_amount
-        else:
-            # Optional: if is_additive is True, you might want to simply add the feature's price
-            # to the product's final price. Adjust the logic according to your business rules.
-            self.final_price = self.price
+            return price - (price * discount) // 100
+        # Optional: if is_additive is True, you might want to simply add the feature's price
+        # to the product's final price. Adjust the logic according to your business rules.
+        return price
 
+    def save(self, *args, **kwargs):
+        self.final_price = self.compute_final_price(self.price, self.product.discount, self.feature.is_additive)
         super(ProductFeature, self).save(*args, **kwargs)
 
     class Meta:
@@ -414,6 +448,12 @@ class ProductBundle(models.Model):
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            old_state = stored_state(self, BUNDLE_COUNTED_FIELDS)
+            super().save(*args, **kwargs)
+            apply_counter_changes(bundle_counter_changes(old_state, counted_state(self, BUNDLE_COUNTED_FIELDS)))
+
     class Meta:
         verbose_name = 'باندل محصول'
         verbose_name_plural = 'باندل محصولات'
@@ -425,6 +465,25 @@ class ProductBundle(models.Model):
         return image_url[0] if image_url else None
 
 
+class ProductSearchToken(models.Model):
+    """
+    Inverted index for the product search, maintained by product_module.search.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='search_tokens', verbose_name='محصول')
+    token = models.CharField(max_length=64, db_index=True, verbose_name='واژه')
+    weight = models.PositiveSmallIntegerField(default=1, verbose_name='وزن')
+
+    def __str__(self):
+        return f"{self.token} ({self.weight})"
+
+    class Meta:
+        verbose_name = 'واژه جستجوی محصول'
+        verbose_name_plural = 'واژه های جستجوی محصولات'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'token'], name='unique_product_search_token'),
+        ]
+
+
 class ProductBundleItem(models.Model):
     bundle = models.ForeignKey(ProductBundle, on_delete=models.CASCADE, related_name='bundle_items',
                                verbose_name='باندل')
@@ -439,6 +498,42 @@ class ProductBundleItem(models.Model):
         verbose_name_plural = 'موارد باندل محصولات'
 
 
+# ------------------------------------------------------------------------------------------
+# Denormalized counters, maintained by product_module.counters.
+# Rows of their own: Shop and category saves would otherwise overwrite the increments.
+class ShopProductCounters(models.Model):
+    shop = models.OneToOneField(Shop, primary_key=True, on_delete=models.CASCADE, related_name='product_counters',
+                                verbose_name='کافه/فروشگاه')
+    products_count = models.IntegerField(default=0, verbose_name='تعداد محصولات')
+    active_products_count = models.IntegerField(default=0, verbose_name='تعداد محصولات فعال')
+    special_products_count = models.IntegerField(default=0, verbose_name='تعداد محصولات اسپشیالیتی')
+    verified_products_count = models.IntegerField(default=0, verbose_name='تعداد محصولات تأیید شده')
+    active_bundles_count = models.IntegerField(default=0, verbose_name='تعداد باندل های فعال')
+
+    def __str__(self):
+        return f"{self.shop_id}: {self.products_count}"
+
+    class Meta:
+        verbose_name = 'شمارنده محصولات فروشگاه'
+        verbose_name_plural = 'شمارنده های محصولات فروشگاه ها'
+
+
+class CafeCategoryProductCounters(models.Model):
+    category = models.OneToOneField(CafeProductCategory, primary_key=True, on_delete=models.CASCADE,
+                                    related_name='product_counters', verbose_name='دسته بندی محصول کافه')
+    products_count = models.IntegerField(default=0, verbose_name='تعداد محصولات')
+    active_products_count = models.IntegerField(default=0, verbose_name='تعداد محصولات فعال')
+    special_products_count = models.IntegerField(default=0, verbose_name='تعداد محصولات اسپشیالیتی')
+    verified_products_count = models.IntegerField(default=0, verbose_name='تعداد محصولات تأیید شده')
+
+    def __str__(self):
+        return f"{self.category_id}: {self.products_count}"
+
+    class Meta:
+        verbose_name = 'شمارنده محصولات دسته بندی کافه'
+        verbose_name_plural = 'شمارنده های محصولات دسته بندی های کافه'
+
+
 # @receiver(pre_save, sender=ProductParentCategory)
 # def update_slug(sender, instance, *args, **kwargs):
 #     instance.slug = slugify(instance.url_title)
@@ -467,11 +562,51 @@ def update_product_slug(sender, instance, **kwargs):
     # instance.is_active = True
 
 @receiver(post_save, sender=Product)
-def update_product_features(sender, instance, created, **kwargs):
-    features = instance.product_features.all()
-    if features.exists():
-        for feature in features:
-            feature.save()  # Recalculates final_price in ProductFeature.save()
+def update_product_features(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    # Recalculates final_price of the features whose price the discount changed, in one statement
+    changed = []
+    for feature in instance.product_features.select_related('feature'):
+        final_price = feature.compute_final_price(feature.price, instance.discount, feature.feature.is_additive)
+        if feature.final_price != final_price:
+            feature.final_price = final_price
+            changed.append(feature)
+    if changed:
+        ProductFeature.objects.bulk_update(changed, ['final_price'])
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_tokens(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not set(update_fields) & set(SEARCH_FIELD_WEIGHTS):
+        return
+    reindex_product(instance)
+
+
+@receiver(post_save, sender=Product)
+def update_product_name_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sync_product_name(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_product_name_index(sender, instance, **kwargs):
+    product_name_index.discard(instance.pk)
+    product_name_index.changed()
+
+
+@receiver(post_delete, sender=Product)
+def uncount_deleted_product(sender, instance, **kwargs):
+    # hard deletes only, Product.delete is a soft delete through save
+    apply_counter_changes(product_counter_changes(counted_state(instance), None), create_missing=False)
+
+
+@receiver(post_delete, sender=ProductBundle)
+def uncount_deleted_bundle(sender, instance, **kwargs):
+    apply_counter_changes(bundle_counter_changes(counted_state(instance, BUNDLE_COUNTED_FIELDS), None),
+                          create_missing=False)
 
 # @receiver(pre_save, sender=CafeProductCategory)
 # def update_cafe_product_category_slug(sender, instance, **kwargs):
@@ -0,0 +1,88 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Floor, Greatest, Round
+from django.utils import timezone
+
+from product_module.models import Product, ProductFeature, ProductBundle, ProductBundleItem
+
+
+# ----------------------------------------------------------------------------
+# Set based repricing: a handful of UPDATE statements for any number of products.
+# final_price follows the rule of Product.save / ProductFeature.save:
+#   final_price = price - floor(price * discount / 100), additive features keep their price.
+
+def discounted(price, discount):
+    # Floor keeps integer division semantics on MySQL, where "/" returns a decimal
+    return F(price) - Floor(F(price) * discount / Value(100))
+
+
+def changed_price(field, percent=None, amount=None, round_to=1):
+    """
+    Expression of the new value of a price column, never below zero.
+    """
+    if percent is not None:
+        factor = Value(float(100 + percent) / 100 / round_to)
+        new_price = Round(F(field) * factor) * Value(round_to)
+    else:
+        new_price = F(field) + Value(amount)
+        if round_to > 1:
+            new_price = Round(new_price / Value(float(round_to))) * Value(round_to)
+    return Greatest(new_price, Value(0), output_field=IntegerField())
+
+
+def _items_total():
+    items = ProductBundleItem.objects.filter(bundle_id=OuterRef('pk')).values('bundle_id').annotate(
+        total=Sum(F('product__price') * F('quantity'))
+    ).values('total')
+    return Coalesce(Subquery(items, output_field=IntegerField()), Value(0))
+
+
+def bulk_reprice(products, discount=None, percent=None, amount=None, round_to=1):
+    """
+    Applies a discount and/or a percentage / absolute price change to a Product queryset.
+    Feature prices follow percentage changes, every final_price is recomputed and
+    bundles holding changed products are scaled by the change of their items' total.
+    Returns the number of updated products, features and bundles.
+    """
+    price_changes = percent is not None or amount is not None
+    product_ids = list(products.values_list('pk', flat=True))
+    features = ProductFeature.objects.filter(product_id__in=product_ids)
+    result = {'products': len(product_ids), 'features': 0, 'bundles': 0}
+    if not product_ids:
+        return result
+
+    with transaction.atomic():
+        bundle_totals = {}
+        if price_changes:
+            bundle_totals = dict(
+                ProductBundle.objects.filter(bundle_items__product_id__in=product_ids).distinct()
+                .annotate(items_total=_items_total()).values_list('pk', 'items_total')
+            )
+
+        values = {'updated_date': timezone.now()}
+        if price_changes:
+            values['price'] = changed_price('price', percent, amount, round_to)
+        if discount is not None:
+            values['discount'] = Value(discount)
+        targets = Product.all_objects.filter(pk__in=product_ids)
+        targets.update(**values)
+        # a second statement: MySQL would evaluate it against the new price, other databases the old one
+        targets.update(final_price=discounted('price', F('discount')))
+
+        if percent is not None:
+            features.update(price=changed_price('price', percent, round_to=round_to))
+        product_discount = Subquery(Product.all_objects.filter(pk=OuterRef('product_id')).values('discount')[:1])
+        result['features'] = (
+            features.filter(feature__is_additive=True).update(final_price=F('price')) +
+            features.filter(feature__is_additive=False).update(final_price=discounted('price', product_discount))
+        )
+
+        changed_bundles = {pk: total for pk, total in bundle_totals.items() if total}
+        if changed_bundles:
+            new_total = _items_total()
+            result['bundles'] = ProductBundle.objects.filter(pk__in=changed_bundles).update(bundle_price=Case(
+                *[When(pk=pk, then=Round(F('bundle_price') * new_total / Value(float(total))))
+                  for pk, total in changed_bundles.items()],
+                default=F('bundle_price'), output_field=IntegerField(),
+            ))
+    return result
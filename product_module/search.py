@@ -0,0 +1,138 @@
+import re
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from utils_module.normalizers import normalize_text
+from utils_module.prefix_index import PrefixIndex
+
+# ----------------------------------------------------------------------------
+# Product full text search: every product keeps its normalized tokens in the
+# ProductSearchToken table (token -> product, weight). A search is an indexed
+# prefix lookup on that table instead of a LIKE '%term%' scan over Product.
+
+# weight of a token per field it appears in, summed when it appears in several
+SEARCH_FIELD_WEIGHTS = {
+    'name': 8,
+    'en_name': 6,
+    'short_description': 3,
+    'description': 1,
+}
+TOKEN_MAX_LENGTH = 64
+MAX_QUERY_TERMS = 8
+
+_TOKEN = re.compile(r'\w+')
+
+
+def tokenize(value):
+    """
+    Normalized word tokens of a text (see normalize_text), single letters dropped.
+    """
+    return [token[:TOKEN_MAX_LENGTH] for token in _TOKEN.findall(normalize_text(value))
+            if len(token) > 1 or token.isdigit()]
+
+
+def build_search_tokens(product):
+    """
+    Returns {token: weight} for a product (or any object with the searched fields).
+    """
+    tokens = {}
+    for field, weight in SEARCH_FIELD_WEIGHTS.items():
+        for token in set(tokenize(getattr(product, field, None))):
+            tokens[token] = tokens.get(token, 0) + weight
+    return tokens
+
+
+def reindex_product(product):
+    """
+    Brings the product's tokens up to date, touching only the rows that changed.
+    """
+    from product_module.models import ProductSearchToken
+
+    tokens = build_search_tokens(product)
+    current = {row.token: row for row in ProductSearchToken.objects.filter(product_id=product.pk)}
+
+    removed = [row.pk for token, row in current.items() if token not in tokens]
+    added = [ProductSearchToken(product_id=product.pk, token=token, weight=weight)
+             for token, weight in tokens.items() if token not in current]
+    changed = []
+    for token, row in current.items():
+        if token in tokens and row.weight != tokens[token]:
+            row.weight = tokens[token]
+            changed.append(row)
+
+    if not (removed or added or changed):
+        return
+    with transaction.atomic():
+        if removed:
+            ProductSearchToken.objects.filter(pk__in=removed).delete()
+        if added:
+            ProductSearchToken.objects.bulk_create(added, ignore_conflicts=True)
+        if changed:
+            ProductSearchToken.objects.bulk_update(changed, ['weight'])
+
+
+def search_products(queryset, term):
+    """
+    Narrows a Product queryset to the products matching every word of the term
+    (each word as a prefix of an indexed token) annotated with `search_rank`,
+    best matches first.
+    """
+    terms = list(dict.fromkeys(tokenize(term)))[:MAX_QUERY_TERMS]
+    if not terms:
+        return queryset
+
+    conditions = [Q(search_tokens__token__startswith=t) for t in terms]
+    any_term = conditions[0]
+    for condition in conditions[1:]:
+        any_term |= condition
+
+    queryset = queryset.filter(any_term).annotate(
+        search_rank=Sum('search_tokens__weight'),
+        **{f'_term_{i}': Count('search_tokens', filter=c) for i, c in enumerate(conditions)},
+    )
+    return queryset.filter(**{f'_term_{i}__gt': 0 for i in range(len(terms))}) \
+        .order_by('-search_rank', '-created_date')
+
+
+# ----------------------------------------------------------------------------
+# Typeahead: product names of the whole market ('' scope) and of every shop
+# (shop id scope), see utils_module.prefix_index.
+
+def _load_product_names():
+    from product_module.models import Product
+
+    rows = Product.objects.filter(is_active=True).values_list('id', 'name', 'shop_id')
+    for product_id, name, shop_id in rows.iterator(chunk_size=2000):
+        yield product_id, name, ('', str(shop_id)), _product_payload(product_id, name, shop_id)
+
+
+def _product_payload(product_id, name, shop_id):
+    return {'id': str(product_id), 'name': name, 'shop': str(shop_id)}
+
+
+product_name_index = PrefixIndex('product_names', _load_product_names)
+
+NAME_INDEX_FIELDS = ('name', 'is_active', 'is_deleted', 'shop_id')
+
+
+def name_index_state(product):
+    # what the typeahead holds of the product, a deferred field reads as None
+    return tuple(product.__dict__.get(field) for field in NAME_INDEX_FIELDS)
+
+
+def sync_product_name(product):
+    """
+    Updates the typeahead after a save; saves that leave the name and the
+    visibility alone (prices, counters, ...) don't touch it.
+    """
+    state = name_index_state(product)
+    if state == getattr(product, '_name_index_state', None):
+        return
+    product._name_index_state = state
+    if product.is_active and not product.is_deleted:
+        product_name_index.upsert(product.pk, product.name, ('', str(product.shop_id)),
+                                  _product_payload(product.pk, product.name, product.shop_id))
+    else:
+        product_name_index.discard(product.pk)
+    product_name_index.changed()
@@ -1,3 +1,508 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from accounts_module.models import User
+from product_module.api.v1.serializers import ProductSerializer
+from product_module.api.v1.views import ProductViewSet
+from product_module.models import Product, ProductBrand, CafeProductCategory, ProductMediaFiles, Feature, \
+    ProductFeature, ProductSearchToken, ProductBundle, ProductBundleItem, ShopProductCounters, \
+    CafeCategoryProductCounters
+from product_module.search import product_name_index, search_products
+from utils_module.models import CacheVersion
 
 # Create your tests here.
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, GEOCODING_OFFLINE_ONLY=True)
+class ProductQueryBudgetTestCase(TestCase):
+    """
+    The product read endpoints must stay within ProductViewSet.query_budget
+    and must not grow with the number of products.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(mobile='09120000001', user_type='seller')
+        self.shop = self.user.shopprofile.shop
+        self.brand = ProductBrand.objects.create(title='برند', is_active=True)
+        self.category = CafeProductCategory.objects.create(title='نوشیدنی گرم', shop=self.shop)
+        self.features = [Feature.objects.create(title=f'ویژگی {i}', feature_type=Feature.CAFE) for i in range(2)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_products(self, count, deleted=False):
+        for i in range(count):
+            product = Product.objects.create(
+                name=f'محصول {i}', shop=self.shop, product_type=Product.CAFE, cafe_category=self.category,
+                brand=self.brand, price=10000, discount=10, is_deleted=deleted,
+            )
+            image = ProductMediaFiles.objects.create(
+                shop=self.shop, media_type=ProductMediaFiles.PRODUCT,
+                file=SimpleUploadedFile(f'p{i}.jpg', b'img', content_type='image/jpeg'),
+            )
+            product.image.add(image)
+            for feature in self.features:
+                ProductFeature.objects.create(product=product, feature=feature, feature_value='x', price=1000)
+        return product
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        # silk (DEBUG) records every request in the same database
+        queries = [q for q in ctx.captured_queries if 'silk_' not in q['sql'] and 'SAVEPOINT' not in q['sql']
+                   and not q['sql'].startswith('EXPLAIN')]
+        return len(queries), response
+
+    def assert_constant_within_budget(self, url, action, deleted=False):
+        self.create_products(2, deleted=deleted)
+        few, _ = self.count_queries(url)
+        self.create_products(8, deleted=deleted)
+        many, response = self.count_queries(url)
+
+        self.assertEqual(len(response.json()['data']), 10)
+        self.assertEqual(few, many)
+        self.assertLessEqual(many, ProductViewSet.query_budget[action])
+
+    def test_list_budget(self):
+        self.assert_constant_within_budget('/products/api/v1/products/', 'list')
+
+    def test_deleted_budget(self):
+        self.assert_constant_within_budget('/products/api/v1/products/deleted/', 'deleted', deleted=True)
+
+    def test_retrieve_budget(self):
+        product = self.create_products(1)
+        queries, response = self.count_queries(f'/products/api/v1/products/{product.pk}/')
+        self.assertLessEqual(queries, ProductViewSet.query_budget['retrieve'])
+
+        data = response.json()['data']
+        self.assertEqual(data['brand'], {'id': self.brand.id, 'title': 'برند'})
+        self.assertEqual(data['category_name'], 'نوشیدنی گرم')
+        self.assertEqual(len(data['images']), 1)
+        self.assertEqual(len(data['product_features']), 2)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, GEOCODING_OFFLINE_ONLY=True)
+class ProductSearchTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create(mobile='09120000002', user_type='seller')
+        self.shop = user.shopprofile.shop
+
+    def create_product(self, **kwargs):
+        return Product.objects.create(shop=self.shop, product_type=Product.SHOP, is_active=True, **kwargs)
+
+    def search(self, term):
+        return list(search_products(Product.objects.all(), term).values_list('name', flat=True))
+
+    def test_persian_variants_match(self):
+        # Arabic yeh/kaf, ZWNJ and Persian digits in the data, Persian letters and ASCII digits in the query
+        self.create_product(name='كيك شكلاتي\u200cها ۲۵۰ گرمی')
+        self.assertEqual(len(self.search('کیک شکلاتی')), 1)
+        self.assertEqual(len(self.search('250')), 1)
+        self.assertEqual(len(self.search('شکلا')), 1)  # prefix of the last word
+        self.assertEqual(self.search('کیک وانیلی'), [])  # every word must match
+
+    def test_ranking_and_incremental_update(self):
+        self.create_product(name='چای سبز', description='دمنوش')
+        product = self.create_product(name='دمنوش بابونه')
+        self.assertEqual(self.search('دمنوش'), ['دمنوش بابونه', 'چای سبز'])
+
+        product.name = 'دمنوش گل گاوزبان'
+        product.save()
+        self.assertEqual(self.search('بابونه'), [])
+        self.assertEqual(self.search('گاوزبان'), ['دمنوش گل گاوزبان'])
+
+        # saves that leave the text alone keep the index and the typeahead version untouched
+        version = CacheVersion.current(product_name_index.version_name)
+        tokens = list(ProductSearchToken.objects.filter(product=product).values_list('pk', flat=True))
+        product.price = 1000
+        product.save(update_fields=['price'])
+        product.save()
+        Product.objects.get(pk=product.pk).save()
+        self.assertCountEqual(ProductSearchToken.objects.filter(product=product).values_list('pk', flat=True), tokens)
+        self.assertEqual(CacheVersion.current(product_name_index.version_name), version)
+        product.is_active = False
+        product.save()
+        self.assertEqual(CacheVersion.current(product_name_index.version_name), version + 1)
+
+    def test_market_endpoint(self):
+        self.create_product(name='قهوه اسپرسو')
+        self.create_product(name='چای سیاه')
+        response = self.client.get('/shop-marketplace/api/v1/products/', {'search': 'قهوه'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p['name'] for p in response.json()['data']['results']], ['قهوه اسپرسو'])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, GEOCODING_OFFLINE_ONLY=True)
+class ProductImportExportTestCase(TestCase):
+    url = '/products/api/v1/products/'
+
+    def setUp(self):
+        user = User.objects.create(mobile='09120000003', user_type='seller')
+        self.shop = user.shopprofile.shop
+        CafeProductCategory.objects.create(title='نوشیدنی گرم', shop=self.shop)
+        Feature.objects.create(title='سایز', feature_type=Feature.CAFE)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def upload(self, content):
+        file = SimpleUploadedFile('products.csv', content.encode('utf-8'), content_type='text/csv')
+        return self.client.post(self.url + 'import/', {'file': file}, format='multipart')
+
+    def test_import_then_export(self):
+        response = self.upload(
+            'name,product_type,category,price,discount,is_active,features\n'
+            'لاته,cafe,نوشيدني گرم,50000,10,1,سایز:بزرگ:10000|سایز:کوچک:0\n'
+            ',cafe,,1000,0,1,\n'
+            'موکا,cafe,دسته ناموجود,1000,0,1,\n'
+        )
+        self.assertEqual(response.status_code, 201)
+        report = response.json()['data']
+        self.assertEqual(report['created'], 1)
+        self.assertEqual([error['row'] for error in report['errors']], [3, 4])
+
+        product = Product.objects.get(shop=self.shop)
+        self.assertEqual((product.final_price, product.cafe_category.title), (45000, 'نوشیدنی گرم'))
+        self.assertTrue(product.slug)
+        self.assertEqual(sorted(product.product_features.values_list('final_price', flat=True)), [0, 9000])
+        self.assertEqual(list(search_products(Product.objects.all(), 'لات')), [product])
+
+        response = self.client.get(self.url + 'export/')
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn('سایز:بزرگ:10000', lines[1])
+
+        # the export is a valid import file
+        Product.objects.all().delete()
+        self.assertEqual(self.upload('\n'.join(lines)).json()['data']['created'], 1)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, GEOCODING_OFFLINE_ONLY=True)
+class BulkPricingTestCase(TestCase):
+    url = '/products/api/v1/products/bulk-pricing/'
+
+    def setUp(self):
+        user = User.objects.create(mobile='09120000004', user_type='seller')
+        self.shop = user.shopprofile.shop
+        self.category = CafeProductCategory.objects.create(title='نوشیدنی گرم', shop=self.shop)
+        self.latte = Product.objects.create(name='لاته', shop=self.shop, product_type=Product.CAFE,
+                                            cafe_category=self.category, price=50000, discount=10)
+        self.cake = Product.objects.create(name='کیک', shop=self.shop, product_type=Product.CAFE, price=30000)
+        size = Feature.objects.create(title='سایز', feature_type=Feature.CAFE)
+        syrup = Feature.objects.create(title='سیروپ', feature_type=Feature.CAFE, is_additive=True)
+        self.size = ProductFeature.objects.create(product=self.latte, feature=size, feature_value='بزرگ', price=10000)
+        self.syrup = ProductFeature.objects.create(product=self.latte, feature=syrup, feature_value='کارامل',
+                                                   price=5000)
+        self.bundle = ProductBundle.objects.create(shop=self.shop, title='صبحانه', bundle_price=70000)
+        ProductBundleItem.objects.create(bundle=self.bundle, product=self.latte)
+        ProductBundleItem.objects.create(bundle=self.bundle, product=self.cake)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_percentage_change_over_a_category(self):
+        response = self.client.post(self.url, {'cafe_category': self.category.pk, 'price_change_percent': 15,
+                                               'round_to': 1000}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data'], {'products': 1, 'features': 2, 'bundles': 1})
+
+        self.latte.refresh_from_db()
+        self.cake.refresh_from_db()
+        self.assertEqual((self.latte.price, self.latte.final_price), (58000, 52200))
+        self.assertEqual(self.cake.price, 30000)
+        self.size.refresh_from_db()
+        self.syrup.refresh_from_db()
+        self.assertEqual((self.size.price, self.size.final_price), (12000, 10800))
+        self.assertEqual((self.syrup.price, self.syrup.final_price), (6000, 6000))
+        # items went from 80000 to 88000
+        self.bundle.refresh_from_db()
+        self.assertEqual(self.bundle.bundle_price, 77000)
+
+    def test_discount_for_all_products(self):
+        response = self.client.post(self.url, {'discount': 20}, format='json')
+        self.assertEqual(response.json()['data']['products'], 2)
+
+        self.cake.refresh_from_db()
+        self.size.refresh_from_db()
+        self.assertEqual(self.cake.final_price, 24000)
+        self.assertEqual(self.size.final_price, 8000)
+        self.bundle.refresh_from_db()
+        self.assertEqual(self.bundle.bundle_price, 70000)
+
+    def test_validation(self):
+        response = self.client.post(self.url, {'price_change_percent': 5, 'price_change_amount': 1000},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post(self.url, {}, format='json').status_code, 400)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, GEOCODING_OFFLINE_ONLY=True)
+class NestedWritesTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create(mobile='09120000005', user_type='seller')
+        self.shop = user.shopprofile.shop
+        self.features = [Feature.objects.create(title=f'افزودنی {i}', feature_type=Feature.CAFE) for i in range(20)]
+        self.product = Product.objects.create(name='لاته', shop=self.shop, product_type=Product.CAFE,
+                                              price=50000, discount=10)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def features_payload(self, price):
+        return [{'feature': f.pk, 'feature_value': 'دارد', 'price': price} for f in self.features]
+
+    def patch(self, payload):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(f'/products/api/v1/products/{self.product.pk}/', payload, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        writes = [q for q in ctx.captured_queries if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+                  and 'silk_' not in q['sql']]
+        return writes
+
+    def test_product_features_are_diffed(self):
+        self.patch({'features_data': self.features_payload(1000)})
+        ids = set(self.product.product_features.values_list('pk', flat=True))
+        self.assertEqual(len(ids), 20)
+
+        # same features, new prices, one dropped: rows are updated in place
+        writes = self.patch({'features_data': self.features_payload(2000)[1:]})
+        self.assertLessEqual(len(writes), 4)
+        self.assertEqual(set(self.product.product_features.values_list('pk', flat=True)) - ids, set())
+        self.assertEqual(set(self.product.product_features.values_list('final_price', flat=True)), {1800})
+
+        # an unknown feature is rejected before anything is written
+        response = self.client.patch(f'/products/api/v1/products/{self.product.pk}/',
+                                     {'features_data': [{'feature': 0, 'price': 1}]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.product.product_features.count(), 19)
+
+    def test_bundle_items_are_diffed(self):
+        cake = Product.objects.create(name='کیک', shop=self.shop, product_type=Product.CAFE, price=30000)
+        bundle = ProductBundle.objects.create(shop=self.shop, title='صبحانه', bundle_price=70000)
+        item = ProductBundleItem.objects.create(bundle=bundle, product=self.product)
+        ProductBundleItem.objects.create(bundle=bundle, product=cake)
+
+        response = self.client.patch(f'/products/api/v1/bundles/{bundle.pk}/', {'bundle_items_data': [
+            {'product': str(self.product.pk), 'quantity': 2},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(list(bundle.bundle_items.values_list('pk', 'quantity')), [(item.pk, 2)])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, GEOCODING_OFFLINE_ONLY=True)
+class ReorderTestCase(TestCase):
+    url = '/products/api/v1/products/'
+
+    def setUp(self):
+        user = User.objects.create(mobile='09120000006', user_type='seller')
+        self.shop = user.shopprofile.shop
+        self.products = [Product.objects.create(name=f'محصول {i}', shop=self.shop, product_type=Product.CAFE)
+                         for i in range(4)]
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def order(self):
+        return list(Product.objects.filter(shop=self.shop).order_by('ordering_number').values_list('pk', flat=True))
+
+    def test_reorder_and_move(self):
+        ids = [p.pk for p in reversed(self.products)]
+        response = self.client.post(f'{self.url}reorder/', {'ids': [str(pk) for pk in ids]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.order(), ids)
+
+        # moving one product between two others rewrites only its own key
+        first, second, third, last = ids
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(f'{self.url}{last}/move/', {'after': str(first)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.order(), [first, last, second, third])
+        updates = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE') and 'silk_' not in q['sql']]
+        self.assertEqual(len(updates), 1)
+
+        self.client.post(f'{self.url}{first}/move/', {'before': str(third)}, format='json')
+        self.assertEqual(self.order(), [last, second, first, third])
+
+    def test_reorder_menu_categories(self):
+        categories = [CafeProductCategory.objects.create(title=f'دسته {i}', shop=self.shop) for i in range(3)]
+        ids = [str(c.pk) for c in reversed(categories)]
+        response = self.client.post('/products/api/v1/cafe-products-categories/reorder/', {'ids': ids},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        ordered = CafeProductCategory.objects.filter(shop=self.shop).order_by('ordering_number')
+        self.assertEqual([str(pk) for pk in ordered.values_list('pk', flat=True)], ids)
+
+    def test_reorder_rejects_foreign_products(self):
+        other = User.objects.create(mobile='09120000007', user_type='seller').shopprofile.shop
+        foreign = Product.objects.create(name='دیگری', shop=other, product_type=Product.CAFE)
+        response = self.client.post(f'{self.url}reorder/', {'ids': [str(self.products[0].pk), str(foreign.pk)]},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, GEOCODING_OFFLINE_ONLY=True)
+class ProductCountersTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create(mobile='09120000008', user_type='seller')
+        self.shop = user.shopprofile.shop
+        self.category = CafeProductCategory.objects.create(title='کیک', shop=self.shop)
+
+    def counters(self):
+        shop = ShopProductCounters.objects.get(shop=self.shop)
+        category = CafeCategoryProductCounters.objects.get(category=self.category)
+        return (shop.products_count, shop.active_products_count, shop.special_products_count,
+                shop.active_bundles_count, category.products_count)
+
+    def test_counters_follow_product_and_bundle_saves(self):
+        cake = Product.objects.create(name='کیک', shop=self.shop, product_type=Product.CAFE,
+                                      cafe_category=self.category, is_active=True)
+        Product.objects.create(name='لاته', shop=self.shop, product_type=Product.CAFE, is_special=True)
+        self.assertEqual(self.counters(), (2, 1, 1, 0, 1))
+
+        cake = Product.objects.get(pk=cake.pk)
+        cake.is_active = False
+        cake.save()
+        self.assertEqual(self.counters(), (2, 0, 1, 0, 1))
+
+        cake.delete()  # soft delete
+        self.assertEqual(self.counters(), (1, 0, 1, 0, 0))
+
+        bundle = ProductBundle.objects.create(shop=self.shop, title='صبحانه', bundle_price=1000, is_active=True)
+        self.assertEqual(self.counters(), (1, 0, 1, 1, 0))
+        bundle.delete()
+        self.assertEqual(self.counters(), (1, 0, 1, 0, 0))
+
+    def test_stale_copies_count_once(self):
+        cake = Product.objects.create(name='کیک', shop=self.shop, product_type=Product.CAFE,
+                                      cafe_category=self.category, is_active=True)
+        # two requests loaded the product before either saved
+        first, second = Product.objects.get(pk=cake.pk), Product.objects.get(pk=cake.pk)
+        first.is_active = second.is_active = False
+        first.save()
+        second.save()
+        self.assertEqual(self.counters(), (1, 0, 0, 0, 1))
+
+    def test_reconcile_repairs_drift(self):
+        Product.objects.create(name='کیک', shop=self.shop, product_type=Product.CAFE,
+                               cafe_category=self.category, is_active=True)
+        ShopProductCounters.objects.filter(shop=self.shop).update(products_count=7, active_products_count=0)
+        CafeCategoryProductCounters.objects.filter(category=self.category).delete()
+
+        call_command('reconcile_product_counters', stdout=io.StringIO())
+        self.assertEqual(self.counters(), (1, 1, 0, 0, 1))
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, GEOCODING_OFFLINE_ONLY=True)
+class MediaLibraryListTestCase(TestCase):
+    url = '/products/api/v1/product-media-files/'
+
+    def setUp(self):
+        user = User.objects.create(mobile='09120000009', user_type='seller')
+        shop = user.shopprofile.shop
+        for i in range(3):
+            ProductMediaFiles.objects.create(shop=shop, media_type=ProductMediaFiles.PRODUCT,
+                                             file=SimpleUploadedFile(f'l{i}.jpg', b'img', content_type='image/jpeg'))
+        for i in range(2):
+            ProductMediaFiles.objects.create(media_type=ProductMediaFiles.CAFEPRODUCTCATEGORY, is_global=True,
+                                             file=SimpleUploadedFile(f'g{i}.jpg', b'img', content_type='image/jpeg'))
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def test_groups_from_one_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        data = response.json()['data']
+        self.assertEqual(len(data['local_files'][ProductMediaFiles.PRODUCT]), 3)
+        self.assertEqual(len(data['global_files'][ProductMediaFiles.CAFEPRODUCTCATEGORY]), 2)
+        media_queries = [q for q in ctx.captured_queries if q['sql'].startswith('SELECT')
+                         and 'product_module_productmediafiles' in q['sql'] and 'silk_' not in q['sql']]
+        self.assertEqual(len(media_queries), 1)
+
+    def test_per_group_pagination(self):
+        data = self.client.get(self.url, {'group_size': 2, 'group_page': 2}).json()['data']
+        self.assertEqual(len(data['local_files'][ProductMediaFiles.PRODUCT]), 1)
+        self.assertNotIn(ProductMediaFiles.CAFEPRODUCTCATEGORY, data['global_files'])
+        self.assertEqual(data['groups']['local_files'][ProductMediaFiles.PRODUCT],
+                         {'count': 3, 'page': 2, 'has_next': False})
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, GEOCODING_OFFLINE_ONLY=True)
+class SparseFieldsetsTestCase(TestCase):
+    url = '/products/api/v1/products/'
+
+    def setUp(self):
+        user = User.objects.create(mobile='09120000028', user_type='seller')
+        self.shop = user.shopprofile.shop
+        self.brand = ProductBrand.objects.create(title='برند', is_active=True)
+        self.size = Feature.objects.create(title='سایز', feature_type=Feature.CAFE)
+        self.create_products(3)
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def create_products(self, count):
+        for i in range(count):
+            product = Product.objects.create(name=f'محصول {i}', shop=self.shop, product_type=Product.CAFE,
+                                             brand=self.brand, price=10000)
+            ProductFeature.objects.create(product=product, feature=self.size, feature_value='بزرگ', price=1000)
+
+    def items(self, query):
+        response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()['data']
+        return data['data'] if isinstance(data, dict) else data
+
+    def queries(self, query):
+        with CaptureQueriesContext(connection) as ctx:
+            self.items(query)
+        return [q['sql'] for q in ctx.captured_queries
+                if q['sql'].startswith('SELECT') and 'silk_' not in q['sql']]
+
+    def optimized(self, query):
+        request = Request(RequestFactory().get('/' + query))
+        return ProductSerializer.optimize_queryset(Product.objects.all(), request)
+
+    def test_fields_and_omit(self):
+        everything = set(self.items('')[0])
+        self.assertNotIn('features_data', everything)
+        # unknown names are ignored
+        self.assertEqual(set(self.items('?fields=id,name,unknown')[0]), {'id', 'name'})
+        self.assertEqual(set(self.items('?omit=unknown')[0]), everything)
+        # omit wins over fields
+        self.assertEqual(set(self.items('?fields=id,name&omit=name')[0]), {'id'})
+        self.assertEqual(set(self.items('?omit=product_features,images')[0]), everything - {'product_features', 'images'})
+
+    def test_only_rendered_relations_are_loaded(self):
+        queryset = self.optimized('?fields=id,brand')
+        self.assertEqual(queryset.query.select_related, {'brand': {}})
+        self.assertEqual(queryset._prefetch_related_lookups, ())
+
+        queryset = self.optimized('?omit=product_features,images')
+        self.assertEqual(set(queryset.query.select_related), {'brand', 'cafe_category', 'shop_category'})
+        self.assertEqual(queryset._prefetch_related_lookups, ())
+
+        queryset = self.optimized('?fields=images')
+        self.assertFalse(queryset.query.select_related)
+        self.assertEqual(queryset._prefetch_related_lookups, ('image',))
+
+    def test_list_queries_follow_the_fieldset(self):
+        sparse = self.queries('?fields=id,name')
+        self.assertFalse([sql for sql in sparse if 'productfeature' in sql or 'productbrand' in sql])
+        full = self.queries('')
+        self.assertTrue([sql for sql in full if 'productfeature' in sql])
+
+        # a fixed number of queries, whatever the page holds
+        self.create_products(3)
+        self.assertEqual(len(self.queries('')), len(full))
+        self.assertEqual(len(self.queries('?fields=id,name')), len(sparse))
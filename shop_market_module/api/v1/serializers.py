@@ -5,7 +5,7 @@ from shop_market_module.models import ShopMarketBanner
 
 
 class ProductSerializer(serializers.ModelSerializer):
-    category_url_title = serializers.ReadOnlyField(source='category.url_title')
+    category_url_title = serializers.ReadOnlyField(source='shop_category.url_title', default=None)
     image_url = serializers.SerializerMethodField()
     product_type = serializers.SerializerMethodField()
 
@@ -4,7 +4,9 @@ from rest_framework import viewsets
 from rest_framework.generics import ListCreateAPIView, DestroyAPIView
 from rest_framework.response import Response
 
+from product_module.api.v1.filters import ProductSearchFilter
 from product_module.models import Product
+from utils_module.mixins import ConditionalGetMixin
 from .pagination import ProductPagination
 from .permissions import IsAdminOrSuperuserOrReadOnly
 from .serializers import ProductSerializer, ShopBannerSerializer
@@ -14,9 +16,8 @@ from ...models import ShopMarketBanner
 class ShopMarketIndexViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     serializer_class = ProductSerializer
     pagination_class = ProductPagination
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['category__url_title']  # Example field, add more if needed
-    search_fields = ['name']
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, filters.OrderingFilter]
+    filterset_fields = ['shop_category__url_title']  # Example field, add more if needed
     ordering_fields = ['created_date', 'last_price']
 
     def get_queryset(self):
@@ -32,7 +33,7 @@ class ShopMarketIndexViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
         # Base filter
         base_filter = {
             'is_active': True,
-            'is_delete': False,
+            'is_deleted': False,
             'is_wholesale': is_wholesale,
             'product_type': 'shop'
         }
@@ -66,11 +67,19 @@ class ShopMarketIndexViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
         return queryset
 
 
-class ShopBannerList(ListCreateAPIView):
+class ShopBannerList(ConditionalGetMixin, ListCreateAPIView):
     """getting a list of Cafe Banners and creating an article"""
     permission_classes = [IsAdminOrSuperuserOrReadOnly]
     serializer_class = ShopBannerSerializer
     queryset = ShopMarketBanner.objects.filter(is_active=True)
+    conditional_models = [ShopMarketBanner]
+
+    def list(self, request, *args, **kwargs):
+        not_modified = self.not_modified_response(request)
+        if not_modified:
+            return not_modified
+
+        return super().list(request, *args, **kwargs)
 
 
 class ShopBannerDetail(DestroyAPIView):
@@ -8,6 +8,7 @@ class ShopMarketBanner(models.Model):
     title = models.CharField(max_length=100, null=True, blank=True, verbose_name='عنوان بنر فروشگاه ها')
     image = models.ImageField(upload_to='marketplace/shops/banners', verbose_name='تصویر بنر فروشگاه ها')
     created_date = models.DateTimeField(auto_now_add=True, editable=False, verbose_name='تاریخ ثبت')
+    updated_date = models.DateTimeField(auto_now=True, verbose_name='تاریخ بروز رسانی')
     is_active = models.BooleanField(default=True, null=True, verbose_name='فعال / غیرفعال')
 
     def __str__(self):
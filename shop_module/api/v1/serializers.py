@@ -1,11 +1,13 @@
 from collections.abc import Iterable
 
+from django.db import transaction
 from rest_framework import serializers
 
 from accounts_module.models import User, UserMediaFiles
 from shop_module.models import CafeTableQrCodes, ShopMediaFiles
 from shop_module.models import Shop, ShopProfile
 from shop_module.models import ShopOpenDays, ShopOpenHours
+from utils_module.serializers import SparseFieldsetsMixin, attach_prefetched, sync_nested
 
 
 # serializers.py
@@ -445,6 +447,7 @@ class ShopPanelReadSerializer(serializers.ModelSerializer):
     logo = ShopMediaFilesForPanelSerializer(read_only=True)
     banner = ShopMediaFilesForPanelSerializer(many=True, read_only=True)
     shop_qr_code_url = serializers.SerializerMethodField()
+    product_counters = serializers.SerializerMethodField()
 
     class Meta:
         model = Shop
@@ -465,9 +468,18 @@ class ShopPanelReadSerializer(serializers.ModelSerializer):
             'free_delivery',
             'pickup',
             'phone_number',
+            'product_counters',
         ]
         read_only_fields = fields
 
+    COUNTER_FIELDS = ['products_count', 'active_products_count', 'special_products_count',
+                      'verified_products_count', 'active_bundles_count']
+
+    def get_product_counters(self, obj):
+        # denormalized counts kept by product_module.counters, no row yet means no products
+        counters = getattr(obj, 'product_counters', None)
+        return {field: getattr(counters, field, 0) for field in self.COUNTER_FIELDS}
+
     def get_shop_qr_code_url(self, obj):
         request = self.context.get('request')
         if obj.shop_qr_code and hasattr(obj.shop_qr_code, 'url'):
@@ -623,8 +635,59 @@ class ShopOpenHoursSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
 
+class ShopWeeklyPlanHoursSerializer(ShopOpenHoursSerializer):
+    # the id of an existing interval is sent back to update it in place
+    id = serializers.IntegerField(required=False)
+
+    class Meta(ShopOpenHoursSerializer.Meta):
+        read_only_fields = []
+
+
+@transaction.atomic
+def save_open_days(shop, days_data, create_days=True):
+    """
+    Writes the given days of the shop's weekly plan as one diff: the missing days with
+    one bulk_create, the hours of all days with sync_nested (one DELETE, one bulk_create,
+    one bulk_update). Hours without an id keep the row of an identical interval.
+    Days left out of days_data are not touched. Returns the saved days, hours attached.
+    """
+    days = {day.open_day: day for day in shop.open_days.prefetch_related('open_hours')}
+    new_days = []
+    if create_days:
+        new_days = [ShopOpenDays(shop=shop, open_day=data['open_day'])
+                    for data in days_data if data['open_day'] not in days]
+    if new_days:
+        ShopOpenDays.objects.bulk_create(new_days)
+        if new_days[0].pk is None:  # no RETURNING on this backend (MySQL)
+            new_days = list(shop.open_days.filter(open_day__in=[day.open_day for day in new_days]))
+        days.update((day.open_day, day) for day in new_days)
+    new_day_ids = {day.pk for day in new_days}
+
+    saved, existing, incoming = [], [], []
+    for data in days_data:
+        day = days.get(data['open_day'])
+        if day is None:
+            continue
+        saved.append(day)
+        if day.pk not in new_day_ids:
+            existing.extend(day.open_hours.all())
+        incoming.extend(ShopOpenHours(day=day, **hour) for hour in data.get('open_hours', []))
+
+    sync_nested(
+        ShopOpenHours, existing=existing, incoming=incoming,
+        fields=['day_id', 'open_time', 'close_time'],
+        natural_key=lambda hour: (hour.day_id, hour.open_time, hour.close_time),
+    )
+    if any(hour.pk is None for hour in incoming):  # created without RETURNING (MySQL)
+        incoming = list(ShopOpenHours.objects.filter(day__in=saved))
+    for day in saved:
+        hours = sorted((hour for hour in incoming if hour.day_id == day.pk), key=lambda hour: (hour.open_time, hour.pk))
+        attach_prefetched(day, 'open_hours', hours)
+    return saved
+
+
 class ShopOpenDaysSerializer(serializers.ModelSerializer):
-    open_hours = ShopOpenHoursSerializer(many=True)
+    open_hours = ShopWeeklyPlanHoursSerializer(many=True)
 
     # Do not allow users to send an id when creating a day – make it read-only.
     class Meta:
@@ -633,67 +696,15 @@ class ShopOpenDaysSerializer(serializers.ModelSerializer):
         read_only_fields = ['id']
 
     def create(self, validated_data):
-        open_hours_data = validated_data.pop('open_hours', [])
-        shop = self.context.get('shop')
-        open_day = validated_data.get('open_day')
-
-        # Check if the day already exists for the shop
-        existing_day = ShopOpenDays.objects.filter(shop=shop, open_day=open_day).first()
-
-        if existing_day:
-            # If the day exists, update its open hours
-            current_hours = {str(hour.id): hour for hour in existing_day.open_hours.all()}
-            payload_ids = []
-            for hour_data in open_hours_data:
-                hour_id = hour_data.get('id', None)
-                if hour_id and str(hour_id) in current_hours:
-                    hour_instance = current_hours[str(hour_id)]
-                    hour_instance.open_time = hour_data.get('open_time', hour_instance.open_time)
-                    hour_instance.close_time = hour_data.get('close_time', hour_instance.close_time)
-                    hour_instance.save()
-                    payload_ids.append(str(hour_id))
-                else:
-                    new_hour = ShopOpenHours.objects.create(day=existing_day, **hour_data)
-                    payload_ids.append(str(new_hour.id))
-
-            # Optionally delete open hours that are not included in the payload
-            for existing_id in current_hours.keys():
-                if existing_id not in payload_ids:
-                    current_hours[existing_id].delete()
-
-            return existing_day
-
-        # If the day does not exist, create a new day
-        day_instance = ShopOpenDays.objects.create(shop=shop, **validated_data)
-        for hour_data in open_hours_data:
-            ShopOpenHours.objects.create(day=day_instance, **hour_data)
-        return day_instance
+        # an existing day of the shop is updated instead
+        return save_open_days(self.context.get('shop'), [validated_data])[0]
 
     def update(self, instance, validated_data):
-        # Optionally, you could update the open_day field if that's desired,
-        # but if you want it to remain untouched, just call:
-        instance.save()
-
-        open_hours_data = validated_data.pop('open_hours', None)
-        if open_hours_data is not None:
-            current_hours = {str(hour.id): hour for hour in instance.open_hours.all()}
-            payload_ids = []
-            for hour_data in open_hours_data:
-                hour_id = hour_data.get('id', None)
-                if hour_id and str(hour_id) in current_hours:
-                    hour_instance = current_hours[str(hour_id)]
-                    hour_instance.open_time = hour_data.get('open_time', hour_instance.open_time)
-                    hour_instance.close_time = hour_data.get('close_time', hour_instance.close_time)
-                    hour_instance.save()
-                    payload_ids.append(str(hour_id))
-                else:
-                    new_hour = ShopOpenHours.objects.create(day=instance, **hour_data)
-                    payload_ids.append(str(new_hour.id))
-            # Optionally delete any open hours not included in the payload.
-            for existing_id in current_hours.keys():
-                if existing_id not in payload_ids:
-                    current_hours[existing_id].delete()
-        return instance
+        # the day itself stays, only its open hours are replaced
+        if validated_data.get('open_hours') is None:
+            return instance
+        data = {'open_day': instance.open_day, 'open_hours': validated_data['open_hours']}
+        return save_open_days(self.context.get('shop') or instance.shop, [data], create_days=False)[0]
 
 
 class ShopWeeklyPlanSerializer(serializers.Serializer):
@@ -708,40 +719,22 @@ class ShopWeeklyPlanSerializer(serializers.Serializer):
             days = instance
         return {"open_days": ShopOpenDaysSerializer(days, many=True).data}
 
+    def validate_open_days(self, value):
+        seen = set()
+        for day_data in value:
+            if day_data['open_day'] in seen:
+                raise serializers.ValidationError(f"روز {day_data['open_day']} بیش از یک بار ارسال شده است.")
+            seen.add(day_data['open_day'])
+        return value
+
     def create(self, validated_data):
         shop = self.context.get('shop')
-        open_days_data = validated_data.get('open_days', [])
-        updated_days = []
-
-        for day_data in open_days_data:
-            # Delegate creation or update of each day to the nested serializer
-            day_serializer = ShopOpenDaysSerializer(data=day_data, context={'shop': shop})
-            day_serializer.is_valid(raise_exception=True)
-            day_instance = day_serializer.save()
-            updated_days.append(day_instance)
-
-        return {"open_days": updated_days}
+        return {"open_days": save_open_days(shop, validated_data.get('open_days', []))}
 
     def update(self, instance, validated_data):
+        # In update mode, we skip creating new days.
         shop = self.context.get('shop')
-        current_days = {str(day.id): day for day in shop.open_days.all()}
-        updated_days = []
-        open_days_data = validated_data.get("open_days", [])
-        for day_data in open_days_data:
-            day_id = day_data.get("id", None)
-            if day_id and str(day_id) in current_days:
-                day_instance = current_days[str(day_id)]
-                day_serializer = ShopOpenDaysSerializer(
-                    day_instance,
-                    data=day_data,
-                    partial=True,
-                    context={'shop': shop}
-                )
-                day_serializer.is_valid(raise_exception=True)
-                updated_day = day_serializer.save()
-                updated_days.append(updated_day)
-            # In update mode, we skip creating new days.
-        return {"open_days": updated_days}
+        return {"open_days": save_open_days(shop, validated_data.get('open_days', []), create_days=False)}
 
 # ++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
@@ -779,7 +772,7 @@ class ClearProfileAttributeSerializer(serializers.Serializer):
 
 # File manager
 # -----------------------------------------------
-class ShopMediaFilesSerializer(serializers.ModelSerializer):
+class ShopMediaFilesSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     file_url = serializers.SerializerMethodField()
     file = serializers.FileField(write_only=True)  # Add this field for file upload input
     is_active = serializers.BooleanField(default=True)  # Add default=True here
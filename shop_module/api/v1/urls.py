@@ -22,6 +22,9 @@ urlpatterns = [
     # shop dashboard
     path('shop-dashboard/', views.ShopDashboardView.as_view(), name='shop_dashboard'),
 
+    # menu views (counted into the dashboard stats)
+    path('shop/<uuid:shop_id>/menu-view/', views.ShopMenuViewApiView.as_view(), name='shop_menu_view'),
+
     # shop profile
     path('shop-profile/', views.ShopProfileApiView.as_view(), name='shop_profile'),
 
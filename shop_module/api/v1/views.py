@@ -1,5 +1,5 @@
 # from django.core.exceptions import ValidationError
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.shortcuts import get_object_or_404, Http404
@@ -23,7 +23,12 @@ from .serializers import ShopWeeklyPlanSerializer, ShopOpenHoursSerializer, \
     ShopPanelReadSerializer, ShopPanelWriteSerializer
 from shop_module.models import Shop, ShopOpenHours, ShopMediaFiles
 from shop_module.models import ShopProfile  # adjust imports as necessary
+from shop_module import panel_cache
+from order_module import stats
 from .permissions import IsShopOwnerOrAdmin
+from utils_module.mixins import ConditionalGetMixin, MediaLibraryListMixin, MEDIA_LIBRARY_PARAMETERS
+from utils_module.cache import shared_cache
+from utils_module.throttling import SharedScopedRateThrottle
 
 
 # -----------------------------------------------------------
@@ -44,11 +49,15 @@ class ShopProfileApiView(generics.RetrieveUpdateAPIView):
         return get_object_or_404(ShopProfile, owner=self.request.user)
 
     def get(self, request, *args, **kwargs):
-        instance = self.get_object()
-        serializer = self.get_serializer(instance, context={'request': request})
+        # served from the owner's cached read model when warm (shop_module.panel_cache)
+        key, data = panel_cache.lookup(request, 'profile')
+        if data is None:
+            instance = self.get_object()
+            data = self.get_serializer(instance, context={'request': request}).data
+            panel_cache.store(request, key, data)
         return Response({
             "success": True,
-            "data": serializer.data,
+            "data": data,
             "message": "اطلاعات پروفایل با موفقیت فراخوانی شد."
         }, status=status.HTTP_200_OK)
 
@@ -94,6 +103,7 @@ def complete_profile(sender, instance, **kwargs):
     if instance.is_complete != is_complete:
         # print(f"Updating is_complete for ShopProfile ID {instance.id} from {instance.is_complete} to {is_complete}")
         ShopProfile.objects.filter(pk=instance.pk).update(is_complete=is_complete)
+        panel_cache.invalidate_owner(instance.owner_id)
         # This prevents triggering `post_save` again by avoiding a full `save()`
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
@@ -148,7 +158,7 @@ class ShopPanelApiView(generics.RetrieveUpdateAPIView):
 
     def get_queryset(self):
         return Shop.objects.select_related(
-            'profile', 'profile__owner', 'logo'
+            'profile', 'profile__owner', 'logo', 'product_counters'
         ).prefetch_related('banner').filter(profile__owner=self.request.user)
 
     def get_serializer_class(self):
@@ -178,13 +188,17 @@ class ShopPanelApiView(generics.RetrieveUpdateAPIView):
         return context
 
     def retrieve(self, request, *args, **kwargs):
-        shop_or_response = self.get_object()
-        if isinstance(shop_or_response, Response):
-            return shop_or_response
-        serializer = self.get_serializer(shop_or_response)
+        # served from the owner's cached read model when warm (shop_module.panel_cache)
+        key, data = panel_cache.lookup(request, 'panel')
+        if data is None:
+            shop_or_response = self.get_object()
+            if isinstance(shop_or_response, Response):
+                return shop_or_response
+            data = self.get_serializer(shop_or_response).data
+            panel_cache.store(request, key, data, shop_id=shop_or_response.pk)
         return Response({
             "success": True,
-            "data": serializer.data,
+            "data": data,
             "message": "Shop panel retrieved successfully."
         }, status=status.HTTP_200_OK)
 
@@ -292,9 +306,15 @@ class ShopPanelApiView(generics.RetrieveUpdateAPIView):
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
 # shop type and monetary unit choices
-class ShopChoicesView(APIView):
+class ShopChoicesView(ConditionalGetMixin, APIView):
     permission_classes = [IsAuthenticated]
+    conditional_version = (Shop.SHOP_TYPE_CHOICES, Shop.MONETARY_UNIT_CHOICES)
+
     def get(self, request, format=None):
+        not_modified = self.not_modified_response(request)
+        if not_modified:
+            return not_modified
+
         shop_type_choices = [
             {"value": key, "label": label} for key, label in Shop.SHOP_TYPE_CHOICES
         ]
@@ -325,7 +345,8 @@ class ShopWeeklyPlanAPIView(APIView):
     def get(self, request, format=None):
         try:
             shop = request.user.shopprofile.shop
-            data = {"open_days": shop.open_days.all()}
+            data = {"open_days": shop.open_days.prefetch_related(
+                Prefetch('open_hours', queryset=ShopOpenHours.objects.order_by('open_time', 'pk')))}
             serializer = ShopWeeklyPlanSerializer(instance=data, context={'shop': shop})
             return Response({
                 "success": True,
@@ -494,7 +515,7 @@ class ClearProfileAttributeView(generics.GenericAPIView):
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
 
 # File manager
-class ShopMediaFilesViewSet(viewsets.ModelViewSet):
+class ShopMediaFilesViewSet(MediaLibraryListMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows shop media files to be viewed, uploaded, edited and deleted.
     For list, create, retrieve, and update:
@@ -531,19 +552,6 @@ class ShopMediaFilesViewSet(viewsets.ModelViewSet):
             permission_classes = [IsShopOwnerOrAdmin]
         return [permission() for permission in permission_classes]
 
-    def _group_by_media_type(self, serialized_files):
-        """
-        Helper function that groups file objects by media_type.
-        Returns a dictionary with the media_type as keys and lists of file data as values.
-        """
-        grouped = {}
-        for file in serialized_files:
-            media_type = file.get("media_type")
-            if media_type not in grouped:
-                grouped[media_type] = []
-            grouped[media_type].append(file)
-        return grouped
-
     @swagger_auto_schema(
         manual_parameters=[
             openapi.Parameter(
@@ -564,33 +572,13 @@ class ShopMediaFilesViewSet(viewsets.ModelViewSet):
                 description='Filter files by global flag (true/false)',
                 type=openapi.TYPE_BOOLEAN
             ),
-        ]
+        ] + MEDIA_LIBRARY_PARAMETERS
     )
     def list(self, request, *args, **kwargs):
         """
-        Override list() to return files in the envelope.
+        Override list() to return files grouped into global and shop files in the envelope.
         """
-        # Apply filtering / search.
-        queryset = self.filter_queryset(self.get_queryset())
-        # queryset = self.get_queryset()
-
-        # Split the queryset.
-        global_files_qs = queryset.filter(is_global=True)
-        local_files_qs = queryset.exclude(is_global=True)
-
-        # Serialize them.
-        global_serialized = self.get_serializer(global_files_qs, many=True).data
-        shop_serialized = self.get_serializer(local_files_qs, many=True).data
-
-        # Group the serialized data by media_type.
-        grouped_global_files = self._group_by_media_type(global_serialized)
-        grouped_local_files = self._group_by_media_type(shop_serialized)
-
-        response_data = {
-            "global_files": grouped_global_files,
-            "local_files": grouped_local_files,
-        }
-        response = Response(response_data, status=status.HTTP_200_OK)
+        response = Response(self.get_media_library_data(), status=status.HTTP_200_OK)
         response.message = "فایل‌ها با موفقیت فراخوانی شدند."
         return response
 
@@ -700,34 +688,56 @@ class ShopMediaTypeChoicesView(APIView):
 
 # shop dashboard view
 class ShopDashboardView(APIView):
-    # permission_classes = [IsShopOwnerOrAdmin]
-    #
-    # def get_object(self):
-    #     shop = get_object_or_404(Shop, profile__owner=self.request.user)
-    #     # Enforce profile verification:
-    #     if not shop.profile.is_complete:
-    #         data = {"is_complete": shop.profile.is_complete}
-    #         # raise PermissionDenied("ابتدا باید پروفایل خود را تکمیل و تأیید کنید.")
-    #         return Response({
-    #             "success": False,
-    #             "is_complete": shop.profile.is_complete,
-    #             # "data": data,
-    #             "error": "ابتدا باید پروفایل خود را تکمیل و تأیید کنید."
-    #         }, status=status.HTTP_403_FORBIDDEN)  # Use appropriate HTTP status code for permission issues
-    #     return shop
-    #
-    # def get(self, request, *args, **kwargs):
-    #     shop_response = self.get_object()
-    #     if isinstance(shop_response, Response):  # Check if `get_object` returned a Response
-    #         return shop_response
-    #
-    #     serializer = ShopDashboardSerializer(shop_response, context={"request": request})
-    #     return Response({
-    #         "success": True,
-    #         "data": serializer.data,
-    #         "message": "داشبورد فروشگاه با موفقیت دریافت شد."
-    #     }, status=status.HTTP_200_OK)
-    pass
+    """
+    Sales figures of the owner's shop for the last 7, 30 and 90 days, read from the
+    pre-aggregated daily rows (order_module.stats), plus the product counters.
+    """
+    permission_classes = [IsShopOwnerOrAdmin]
+
+    def get(self, request, *args, **kwargs):
+        shop = get_object_or_404(Shop.objects.select_related('profile', 'product_counters'),
+                                 profile__owner=request.user)
+        if not shop.profile.is_complete:
+            return Response({
+                "success": False,
+                "is_complete": False,
+                "message": "ابتدا باید پروفایل خود را تکمیل کنید."
+            }, status=status.HTTP_200_OK)
+
+        data = stats.dashboard_data(shop)
+        data["product_counters"] = ShopPanelReadSerializer().get_product_counters(shop)
+        return Response({
+            "success": True,
+            "data": data,
+            "message": "داشبورد فروشگاه با موفقیت دریافت شد."
+        }, status=status.HTTP_200_OK)
+
+
+# menu views of a shop, sent by the menu page
+class ShopMenuViewApiView(APIView):
+    """
+    Counts a view of the shop's menu. A client address (see NUM_PROXIES) is
+    counted once per shop in MENU_VIEW_WINDOW seconds, repeated calls are answered
+    without counting; the calls of an address are throttled ('menu_view' rate).
+    """
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    throttle_classes = [SharedScopedRateThrottle]
+    throttle_scope = 'menu_view'
+    MENU_VIEW_WINDOW = 30 * 60
+
+    def post(self, request, shop_id, *args, **kwargs):
+        if not Shop.objects.filter(pk=shop_id).exists():
+            raise Http404("رکورد مورد نظر یافت نشد.")
+        ident = SharedScopedRateThrottle().get_ident(request)
+        # the shared cache, so a client is counted once whichever worker it reaches
+        if shared_cache.add(f'menu_view:{shop_id}:{ident}', 1, self.MENU_VIEW_WINDOW):
+            stats.record_menu_view(shop_id)
+        return Response({
+            "success": True,
+            "data": {},
+            "message": "بازدید منو ثبت شد."
+        }, status=status.HTTP_200_OK)
 
 
 # +++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++++
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.20 on 2026-10-19 14:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from shop_module.search import name_trigrams
+from utils_module.normalizers import normalize_text
+
+
+def build_name_index(apps, schema_editor):
+    Shop = apps.get_model('shop_module', 'Shop')
+    ShopNameTrigram = apps.get_model('shop_module', 'ShopNameTrigram')
+
+    for shop in Shop.objects.only('id', 'name').iterator(chunk_size=500):
+        Shop.objects.filter(pk=shop.pk).update(normalized_name=normalize_text(shop.name)[:100])
+        ShopNameTrigram.objects.bulk_create(
+            [ShopNameTrigram(shop_id=shop.pk, trigram=trigram) for trigram in name_trigrams(shop.name)]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop_module', '0011_alter_shopprofile_latitude_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='normalized_name',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=100, verbose_name='نام فروشگاه (نرمال شده)'),
+        ),
+        migrations.CreateModel(
+            name='ShopNameTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(db_index=True, max_length=3, verbose_name='سه حرفی')),
+                ('shop', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='name_trigrams', to='shop_module.shop')),
+            ],
+            options={
+                'verbose_name': 'سه حرفی نام فروشگاه',
+                'verbose_name_plural': 'سه حرفی های نام فروشگاه ها',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shopnametrigram',
+            constraint=models.UniqueConstraint(fields=('shop', 'trigram'), name='unique_shop_name_trigram'),
+        ),
+        migrations.RunPython(build_name_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.20 on 2026-10-19 14:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop_module', '0012_shop_normalized_name_shopnametrigram'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='shopmediafiles',
+            index=models.Index(fields=['shop', 'media_type', 'is_global'], name='shop_media_shop_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='shopmediafiles',
+            index=models.Index(fields=['is_global', 'media_type'], name='shop_media_global_idx'),
+        ),
+    ]
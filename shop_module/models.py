@@ -10,14 +10,19 @@ from django.core.files import File
 # from qrcode import QRCode
 from django.db import models, transaction
 from django.db.models import F, ExpressionWrapper, IntegerField
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from django.apps import apps
+from rest_framework import status
 
-from accounts_module.models import User
+from accounts_module.models import User, UserMediaFiles
 from core.settings import BASE_DIR
 
+from shop_module import panel_cache
+from shop_module.search import name_index_state, reindex_shop_name, sync_cafe_name, cafe_name_index
 from site_module.models import SiteSetting
+from utils_module.geocoding import get_location
+from utils_module.normalizers import normalize_text
 
 
 # Create your models here.
@@ -53,6 +58,32 @@ class ShopProfile(models.Model):
         verbose_name_plural = 'پروفایل کافه ها/فروشگاه ها'
 
 
+def enrich_shop_profile(profile_id):
+    """
+    Fills the empty state, city and address fields of a shop profile from its
+    coordinates. Saved with update_fields so profile completeness is recomputed.
+    """
+    profile = ShopProfile.objects.filter(pk=profile_id).first()
+    if not profile or profile.latitude is None or profile.longitude is None:
+        return False
+
+    # province and city alone are resolved offline, Neshan is needed only for a missing address
+    data, state, city, detailed_address, status_code = get_location(
+        profile.latitude, profile.longitude, need_address=not profile.address)
+    if status_code != status.HTTP_200_OK:
+        return False
+
+    update_fields = []
+    for field, value in (('state', state), ('city', city), ('address', (detailed_address or '')[:255])):
+        if value and not getattr(profile, field):
+            setattr(profile, field, value)
+            update_fields.append(field)
+
+    if update_fields:
+        profile.save(update_fields=update_fields + ['updated_date'])
+    return bool(update_fields)
+
+
 # ------------------------------------------------------------------------------
 # shop media files collection
 def shop_media_files_upload_path(instance, filename):
@@ -97,6 +128,10 @@ class ShopMediaFiles(models.Model):
     class Meta:
         verbose_name = 'فایل مربوط به کافه/فروشگاه'
         verbose_name_plural = 'فایلهای مربوط به کافه/فروشگاه'
+        indexes = [
+            models.Index(fields=['shop', 'media_type', 'is_global'], name='shop_media_shop_type_idx'),
+            models.Index(fields=['is_global', 'media_type'], name='shop_media_global_idx'),
+        ]
 
 
 # ------------------------------------------------------------------
@@ -129,6 +164,8 @@ class Shop(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     profile = models.OneToOneField(ShopProfile, on_delete=models.CASCADE, default=None, related_name='shop')
     name = models.CharField(default='کافه/فروشگاه بی نام', max_length=100, verbose_name='نام فروشگاه')
+    normalized_name = models.CharField(max_length=100, blank=True, db_index=True, editable=False,
+                                       verbose_name='نام فروشگاه (نرمال شده)')
     manager_name = models.CharField(max_length=100, null=True, blank=True, verbose_name='نام مدیر داخلی')
     manager_mobile = models.CharField(max_length=20, null=True, blank=True, verbose_name='موبایل مدیر داخلی')
     description = models.TextField(verbose_name='توضیحات')
@@ -165,6 +202,13 @@ class Shop(models.Model):
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # typeahead state as loaded, see shop_module.search.sync_cafe_name
+        instance._name_index_state = name_index_state(instance)
+        return instance
+
     @transaction.atomic
     def save(self, *args, **kwargs):
         # Determine if this instance exists (and its table count) so we can detect changes.
@@ -181,6 +225,12 @@ class Shop(models.Model):
             except Shop.DoesNotExist:
                 pass
 
+        # search key of the name, see shop_module.search
+        self.normalized_name = normalize_text(self.name)[:100]
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'normalized_name'}
+
         # First, let the base model save itself.
         super().save(*args, **kwargs)
 
@@ -221,7 +271,7 @@ class Shop(models.Model):
         table_no = f'table-no/{table_no}/'
         url = f'/cafe-menu/{self.id}/'
         # url = reverse('cafe_menu', kwargs={'shop_id': self.id}) # this should be change to right url of cafe menu
-        main_setting = SiteSetting.objects.filter(is_main_setting=True).first()
+        main_setting = SiteSetting.get_main_setting()
         base_url = main_setting.site_url if main_setting else "http://localhost"
 
         self.shop_url = f'{base_url}{url}'
@@ -334,6 +384,23 @@ class Shop(models.Model):
         verbose_name_plural = 'کافه ها/فروشگاه ها'
 
 
+# -------------------------------------------------------------------------
+# Shop name search index
+class ShopNameTrigram(models.Model):
+    """
+    Trigrams of Shop.normalized_name, maintained by shop_module.search.
+    """
+    shop = models.ForeignKey(Shop, on_delete=models.CASCADE, related_name='name_trigrams')
+    trigram = models.CharField(max_length=3, db_index=True, verbose_name='سه حرفی')
+
+    class Meta:
+        verbose_name = 'سه حرفی نام فروشگاه'
+        verbose_name_plural = 'سه حرفی های نام فروشگاه ها'
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'trigram'], name='unique_shop_name_trigram'),
+        ]
+
+
 # -------------------------------------------------------------------------
 # Table QR Codes
 class CafeTableQrCodes(models.Model):
@@ -403,6 +470,76 @@ def save_shop(sender, instance, created, **kwargs):
     if created and not Shop.objects.filter(profile=instance).exists():
         Shop.objects.create(profile=instance)
 
+
+@receiver(post_save, sender=Shop)
+def update_shop_name_trigrams(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'name' not in update_fields):
+        return
+    reindex_shop_name(instance)
+
+
+@receiver(post_save, sender=Shop)
+def update_cafe_name_index(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sync_cafe_name(instance)
+
+
+@receiver(post_delete, sender=Shop)
+def remove_from_cafe_name_index(sender, instance, **kwargs):
+    cafe_name_index.discard(instance.pk)
+    cafe_name_index.changed()
+
+
+# cached panel / profile payloads (shop_module.panel_cache)
+@receiver([post_save, post_delete], sender=Shop)
+def invalidate_panel_of_shop(sender, instance, raw=False, **kwargs):
+    if not raw:
+        panel_cache.invalidate_shop(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=ShopProfile)
+def invalidate_panel_of_profile(sender, instance, raw=False, **kwargs):
+    if not raw:
+        panel_cache.invalidate_owner(instance.owner_id)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_panel_of_owner(sender, instance, raw=False, **kwargs):
+    if not raw and instance.user_type == 'seller':
+        panel_cache.invalidate_owner(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=ShopMediaFiles)
+def invalidate_panel_of_shop_media(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.shop_id is not None:
+        panel_cache.invalidate_shop(instance.shop_id)
+    else:
+        panel_cache.invalidate_all()
+
+
+@receiver([post_save, post_delete], sender=UserMediaFiles)
+def invalidate_panel_of_user_media(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if instance.user_id is not None:
+        panel_cache.invalidate_owner(instance.user_id)
+    else:
+        panel_cache.invalidate_all()
+
+
+@receiver(m2m_changed, sender=Shop.banner.through)
+@receiver(m2m_changed, sender=Shop.certificate.through)
+def invalidate_panel_of_shop_files(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        panel_cache.invalidate_shop(instance.pk)
+    else:
+        for shop_id in pk_set or ():
+            panel_cache.invalidate_shop(shop_id)
+
 # @receiver(post_save, sender=Shop)
 # def save_shop_id_card(sender, instance, created, **kwargs):
 #     if created:
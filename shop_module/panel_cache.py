@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.core.cache import cache
+
+# ----------------------------------------------------------------------------
+# Cached read model of the shop owner's panel (ShopPanelReadSerializer) and
+# profile (ShopProfileReadSerializer) payloads, keyed by the owner's user id.
+# Invalidation bumps a version instead of deleting keys: the payloads hold
+# absolute urls, so one owner has a key per host / scheme, and none of them
+# has to be known. A global version covers the shared (global) media files.
+#
+# The versions are rows of utils_module.CacheVersion, moved on in the
+# transaction of the change, so a warm hit costs one query and a change made by
+# any process (another worker, cron, a management command) reaches every worker,
+# whatever cache backend holds the payloads.
+
+GLOBAL_VERSION = 'shop_panel:global'
+
+
+def _owner_version(owner_id):
+    return f'shop_panel:{owner_id}'
+
+
+def _shop_owner_key(shop_id):
+    return f'shop_panel:shop:{shop_id}:owner'
+
+
+def payload_key(request, kind, owner_id, versions):
+    owner_version, global_version = versions
+    return f'shop_panel:{owner_id}:{kind}:{owner_version}.{global_version}:{request.scheme}://{request.get_host()}'
+
+
+def lookup(request, kind):
+    """
+    Returns (key, cached payload or None) of `kind` for request.user.
+    On a miss the payload is stored under this key: an invalidation committed
+    while it is built moves the version on and leaves the stale payload behind.
+    """
+    from utils_module.models import CacheVersion
+
+    owner_id = request.user.pk
+    names = [_owner_version(owner_id), GLOBAL_VERSION]
+    found = dict(CacheVersion.objects.filter(name__in=names).values_list('name', 'version'))
+    key = payload_key(request, kind, owner_id, [found.get(name, 0) for name in names])
+    return key, cache.get(key)
+
+
+def store(request, key, payload, shop_id=None):
+    cache.set(key, payload, settings.SHOP_PANEL_CACHE_TTL)
+    if shop_id is not None:
+        cache.set(_shop_owner_key(shop_id), request.user.pk, None)
+
+
+def _bump(names):
+    from utils_module.models import CacheVersion
+
+    CacheVersion.bump(names)
+
+
+def invalidate_owner(owner_id):
+    if owner_id is not None:
+        _bump([_owner_version(owner_id)])
+
+
+def invalidate_shop(shop_id):
+    invalidate_shops([shop_id])
+
+
+def invalidate_shops(shop_ids):
+    from shop_module.models import Shop
+
+    shop_ids = set(shop_ids)
+    owners = cache.get_many([_shop_owner_key(shop_id) for shop_id in shop_ids])
+    owner_ids = set(owners.values())
+    unknown = {shop_id for shop_id in shop_ids if _shop_owner_key(shop_id) not in owners}
+    if unknown:
+        owner_ids.update(Shop.objects.filter(pk__in=unknown).values_list('profile__owner_id', flat=True))
+    owner_ids.discard(None)
+    if owner_ids:
+        _bump([_owner_version(owner_id) for owner_id in owner_ids])
+
+
+def invalidate_all():
+    _bump([GLOBAL_VERSION])
@@ -0,0 +1,118 @@
+from django.db import transaction
+from django.db.models import Count
+
+from utils_module.normalizers import normalize_text
+from utils_module.prefix_index import PrefixIndex
+
+# ----------------------------------------------------------------------------
+# Shop name search: the normalized name of every shop is split into trigrams
+# kept in ShopNameTrigram. A query is scored by the share of its trigrams a name
+# contains, so partial words and small typos still find the shop, and the result
+# is a short list of candidate ids the (expensive) geo ranking then runs on.
+
+# minimum share of the query trigrams a name must contain
+SIMILARITY_THRESHOLD = 0.4
+MAX_CANDIDATES = 200
+
+
+def _word_trigrams(word, complete=True):
+    # two leading blanks: the first letters of a word count the most, as in pg_trgm
+    padded = f'  {word} ' if complete else f'  {word}'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def name_trigrams(name):
+    """
+    Trigrams stored for a shop name (every word padded on both sides).
+    """
+    trigrams = set()
+    for word in normalize_text(name).split():
+        trigrams |= _word_trigrams(word)
+    return trigrams
+
+
+def query_trigrams(term):
+    """
+    Trigrams of a search term, the last word may be unfinished so it gets no trailing pad.
+    """
+    words = normalize_text(term).split()
+    trigrams = set()
+    for i, word in enumerate(words):
+        trigrams |= _word_trigrams(word, complete=i < len(words) - 1)
+    return trigrams
+
+
+def reindex_shop_name(shop):
+    from shop_module.models import ShopNameTrigram
+
+    trigrams = name_trigrams(shop.name)
+    current = dict(ShopNameTrigram.objects.filter(shop_id=shop.pk).values_list('trigram', 'pk'))
+
+    removed = [pk for trigram, pk in current.items() if trigram not in trigrams]
+    added = [ShopNameTrigram(shop_id=shop.pk, trigram=trigram) for trigram in trigrams - current.keys()]
+    if not (removed or added):
+        return
+    with transaction.atomic():
+        if removed:
+            ShopNameTrigram.objects.filter(pk__in=removed).delete()
+        if added:
+            ShopNameTrigram.objects.bulk_create(added, ignore_conflicts=True)
+
+
+def search_shop_ids(term, limit=MAX_CANDIDATES):
+    """
+    Ids of the shops whose name matches the term, most similar first.
+    """
+    from shop_module.models import ShopNameTrigram
+
+    trigrams = query_trigrams(term)
+    if not trigrams:
+        return []
+
+    min_hits = max(1, round(len(trigrams) * SIMILARITY_THRESHOLD))
+    return list(
+        ShopNameTrigram.objects.filter(trigram__in=trigrams)
+        .values('shop_id')
+        .annotate(hits=Count('pk'))
+        .filter(hits__gte=min_hits)
+        .order_by('-hits')
+        .values_list('shop_id', flat=True)[:limit]
+    )
+
+
+# ----------------------------------------------------------------------------
+# Typeahead over cafe names, see utils_module.prefix_index.
+
+CAFE_TYPES = ('cafe', 'both')
+
+
+def _load_cafe_names():
+    from shop_module.models import Shop
+
+    for shop_id, name in Shop.objects.filter(shop_type__in=CAFE_TYPES).values_list('id', 'name').iterator():
+        yield shop_id, name, ('',), {'id': str(shop_id), 'name': name}
+
+
+cafe_name_index = PrefixIndex('cafe_names', _load_cafe_names)
+
+NAME_INDEX_FIELDS = ('name', 'shop_type')
+
+
+def name_index_state(shop):
+    # what the typeahead holds of the shop, a deferred field reads as None
+    return tuple(shop.__dict__.get(field) for field in NAME_INDEX_FIELDS)
+
+
+def sync_cafe_name(shop):
+    """
+    Updates the typeahead after a save that changed the name or the type of the shop.
+    """
+    state = name_index_state(shop)
+    if state == getattr(shop, '_name_index_state', None):
+        return
+    shop._name_index_state = state
+    if shop.shop_type in CAFE_TYPES:
+        cafe_name_index.upsert(shop.pk, shop.name, ('',), {'id': str(shop.pk), 'name': shop.name})
+    else:
+        cafe_name_index.discard(shop.pk)
+    cafe_name_index.changed()
@@ -1,6 +1,24 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
 from accounts_module.models import User
-from .models import ShopProfile, Shop
+from product_module.models import ShopProductCounters
+from .models import ShopProfile, Shop, ShopOpenHours
+from .search import search_shop_ids
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
 
 # Create your tests here.
 
@@ -11,3 +29,116 @@ class ShopTestCase(TestCase):
         profile = ShopProfile.objects.get(owner=user)
         shop = Shop.objects.get(profile=profile)
         self.assertEqual(shop.profile, profile)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, GEOCODING_OFFLINE_ONLY=True)
+class ShopNameSearchTestCase(TestCase):
+    def create_shop(self, mobile, name):
+        shop = User.objects.create(mobile=mobile, user_type='seller').shopprofile.shop
+        shop.name = name
+        shop.save()
+        return shop
+
+    def test_partial_typo_and_variants(self):
+        nadery = self.create_shop('09120000011', 'كافه نادري')  # Arabic yeh/kaf
+        lamiz = self.create_shop('09120000012', 'کافه لمیز')
+
+        self.assertEqual(search_shop_ids('نادری'), [nadery.pk])
+        self.assertEqual(search_shop_ids('ناد'), [nadery.pk])  # unfinished word
+        self.assertEqual(search_shop_ids('کافع نادری')[0], nadery.pk)  # typo
+        self.assertCountEqual(search_shop_ids('کافه'), [nadery.pk, lamiz.pk])
+        self.assertEqual(search_shop_ids('رستوران'), [])
+
+    def test_index_follows_renames(self):
+        shop = self.create_shop('09120000013', 'کافه لمیز')
+        shop.name = 'کافه پارک'
+        shop.save(update_fields=['name'])
+
+        shop.refresh_from_db()
+        self.assertEqual(shop.normalized_name, 'کافه پارک')
+        self.assertEqual(search_shop_ids('لمیز'), [])
+        self.assertEqual(search_shop_ids('پارک'), [shop.pk])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, GEOCODING_OFFLINE_ONLY=True)
+class ShopPanelCacheTestCase(TestCase):
+    url = '/shops/api/v1/shop-profile/'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(mobile='09120000010', user_type='seller')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_warm_hit_reads_only_the_versions_and_saves_invalidate(self):
+        self.assertEqual(self.client.get(self.url).json()['data']['city'], None)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        queries = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT') and 'silk_' not in q['sql']]
+        self.assertEqual(len(queries), 1)
+        self.assertIn('utils_module_cacheversion', queries[0])
+
+        profile = ShopProfile.objects.get(owner=self.user)
+        profile.city = 'تهران'
+        profile.save()
+        self.assertEqual(self.client.get(self.url).json()['data']['city'], 'تهران')
+
+    def test_changes_of_other_processes_are_seen(self):
+        self.client.get(self.url)
+        # e.g. reconcile_product_counters in a cron process: the payload cache of
+        # this process is not touched, only the version row moves
+        shop = self.user.shopprofile.shop
+        ShopProductCounters.objects.filter(shop=shop).update(products_count=5)
+        call_command('reconcile_product_counters', stdout=io.StringIO())
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url)
+        self.assertGreater(len([q for q in ctx.captured_queries
+                                if q['sql'].startswith('SELECT') and 'silk_' not in q['sql']]), 1)
+
+    def test_payloads_are_kept_per_host(self):
+        self.client.get(self.url, HTTP_HOST='a.example.com')
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(self.url, HTTP_HOST='b.example.com')
+        self.assertTrue([q for q in ctx.captured_queries if 'silk_' not in q['sql']])
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, GEOCODING_OFFLINE_ONLY=True)
+class ShopWeeklyPlanTestCase(TestCase):
+    url = '/shops/api/v1/shop/weekly-plan/'
+    days = ['saturday', 'sunday', 'monday', 'tuesday', 'wednesday', 'thursday', 'friday']
+
+    def setUp(self):
+        self.user = User.objects.create(mobile='09120000021', user_type='seller')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def plan(self, evening='17:00'):
+        return {"open_days": [
+            {"open_day": day, "open_hours": [{"open_time": "08:00", "close_time": "12:00"},
+                                             {"open_time": evening, "close_time": "23:00"}]}
+            for day in self.days
+        ]}
+
+    def test_week_is_saved_in_a_few_statements(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, self.plan(), format='json')
+        self.assertEqual(response.status_code, 201)
+        writes = [q for q in ctx.captured_queries if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+                  and 'silk_' not in q['sql']]
+        self.assertEqual(len(writes), 2)
+        saturday = response.json()['data']['open_days'][0]
+        self.assertEqual([h['open_time'] for h in saturday['open_hours']], ['08:00:00', '17:00:00'])
+        morning_id = saturday['open_hours'][0]['id']
+
+        # unchanged intervals keep their rows (matched without ids), the rest are replaced
+        response = self.client.post(self.url, self.plan(evening='18:00'), format='json')
+        saturday = response.json()['data']['open_days'][0]
+        self.assertEqual(saturday['open_hours'][0]['id'], morning_id)
+        self.assertEqual(saturday['open_hours'][1]['open_time'], '18:00:00')
+        self.assertEqual(ShopOpenHours.objects.filter(day__shop=self.user.shopprofile.shop).count(), 14)
+
+    def test_duplicate_days_are_rejected(self):
+        plan = {"open_days": [{"open_day": "saturday", "open_hours": []}] * 2}
+        self.assertEqual(self.client.post(self.url, plan, format='json').status_code, 400)
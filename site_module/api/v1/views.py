@@ -3,16 +3,22 @@ from rest_framework.exceptions import PermissionDenied, NotAuthenticated
 from rest_framework.response import Response
 
 from site_module.models import SiteSetting
+from utils_module.mixins import ConditionalGetMixin
 from .permissions import IsAdminOrSuperuserOrReadOnly  # Import the custom permission class
 from .serializers import SiteSettingsSerializer
 
 
-class SiteSettingsApiViewSet(viewsets.ModelViewSet):
+class SiteSettingsApiViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = SiteSettingsSerializer
     queryset = SiteSetting.objects.all()
     permission_classes = [IsAdminOrSuperuserOrReadOnly]  # Apply the custom permission class
+    conditional_models = [SiteSetting]
 
     def list(self, request, *args, **kwargs):
+        not_modified = self.not_modified_response(request)
+        if not_modified:
+            return not_modified
+
         queryset = self.filter_queryset(self.get_queryset())
         serializer = self.get_serializer(queryset, many=True)
         return Response({
@@ -22,6 +28,10 @@ class SiteSettingsApiViewSet(viewsets.ModelViewSet):
         }, status=status.HTTP_200_OK)
 
     def retrieve(self, request, *args, **kwargs):
+        not_modified = self.not_modified_response(request)
+        if not_modified:
+            return not_modified
+
         instance = self.get_object()
         serializer = self.get_serializer(instance)
         return Response({
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.20 on 2026-10-19 14:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('site_module', '0003_sitesetting_old_token_deletion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sitesetting',
+            name='updated_date',
+            field=models.DateTimeField(auto_now=True, verbose_name='تاریخ بروز رسانی'),
+        ),
+    ]
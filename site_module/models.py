@@ -1,4 +1,10 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 
 
 # Create your models here.
@@ -22,6 +28,7 @@ class SiteSetting(models.Model):
     facebook_link = models.URLField(null=True, verbose_name='لینک فیسبوک')
     is_main_setting = models.BooleanField(verbose_name='تنظیمات اصلی')
     created_date = models.DateTimeField(auto_now_add=True, editable=False, verbose_name='تاریخ ثبت')
+    updated_date = models.DateTimeField(auto_now=True, verbose_name='تاریخ بروز رسانی')
     old_token_deletion = models.PositiveIntegerField(default=15, verbose_name='اعتبار توکن های اعضاء')
 
     class Meta:
@@ -30,3 +37,40 @@ class SiteSetting(models.Model):
 
     def __str__(self):
         return self.site_name
+
+    # ---------------------------------------------------------------
+    # main setting accessor, cached in-process and in the cache
+    CACHE_KEY = 'site_module:main_setting'
+    _local_cache = None  # (expires_at, setting or None)
+
+    @classmethod
+    def get_main_setting(cls):
+        """
+        The row with is_main_setting=True (or None). Kept in-process and in the
+        cache for SITE_SETTING_LOCAL_CACHE_TTL seconds each; a save or delete clears
+        both in the saving process, other processes see it within twice that time
+        (the cache may be per process, so their copies have to expire).
+        """
+        local = cls._local_cache
+        if local is not None and local[0] > time.monotonic():
+            return local[1]
+
+        cached = cache.get(cls.CACHE_KEY)
+        if cached is None:
+            # wrapped in a tuple so "no main setting" is cached too
+            cached = (cls.objects.filter(is_main_setting=True).first(),)
+            cache.set(cls.CACHE_KEY, cached, settings.SITE_SETTING_LOCAL_CACHE_TTL)
+
+        cls._local_cache = (time.monotonic() + settings.SITE_SETTING_LOCAL_CACHE_TTL, cached[0])
+        return cached[0]
+
+    @classmethod
+    def clear_main_setting_cache(cls):
+        cls._local_cache = None
+        cache.delete(cls.CACHE_KEY)
+
+
+@receiver(post_save, sender=SiteSetting)
+@receiver(post_delete, sender=SiteSetting)
+def invalidate_main_setting(sender, **kwargs):
+    SiteSetting.clear_main_setting_cache()
@@ -1,3 +1,57 @@
-from django.test import TestCase
+import time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from site_module.models import SiteSetting
+
 
 # Create your tests here.
+
+class SiteSettingsConditionalGetTestCase(TestCase):
+    url = '/site-info/api/v1/site_settings/'
+
+    def test_unchanged_settings_answer_not_modified(self):
+        client = APIClient()
+        etag = client.get(self.url)['ETag']
+
+        self.assertEqual(client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        SiteSetting.objects.create(site_name='FeeCoffee', site_url='https://feecoffee.ir', copy_right_text='-',
+                                   about_us_text='-', is_main_setting=True, site_logo='logo.png')
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class MainSiteSettingCacheTestCase(TestCase):
+    def test_main_setting_is_cached_until_saved(self):
+        SiteSetting.clear_main_setting_cache()
+        setting = SiteSetting.objects.create(site_name='FeeCoffee', site_url='https://feecoffee.ir',
+                                             copy_right_text='-', about_us_text='-', is_main_setting=True,
+                                             site_logo='logo.png')
+        SiteSetting.get_main_setting()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(SiteSetting.get_main_setting().site_name, 'FeeCoffee')
+
+        setting.site_name = 'FeeCoffee Cafe'
+        setting.save()
+        self.assertEqual(SiteSetting.get_main_setting().site_name, 'FeeCoffee Cafe')
+
+    @override_settings(SITE_SETTING_LOCAL_CACHE_TTL=60)
+    def test_other_workers_copies_expire(self):
+        SiteSetting.clear_main_setting_cache()
+        setting = SiteSetting.objects.create(site_name='FeeCoffee', site_url='https://feecoffee.ir',
+                                             copy_right_text='-', about_us_text='-', is_main_setting=True,
+                                             site_logo='logo.png')
+        SiteSetting.get_main_setting()
+        # saved by another process: no signal reaches this one
+        SiteSetting.objects.filter(pk=setting.pk).update(site_name='FeeCoffee Cafe')
+        self.assertEqual(SiteSetting.get_main_setting().site_name, 'FeeCoffee')
+
+        later = time.time() + 61
+        with mock.patch('time.monotonic', return_value=time.monotonic() + 61), \
+                mock.patch('time.time', return_value=later):
+            self.assertEqual(SiteSetting.get_main_setting().site_name, 'FeeCoffee Cafe')
@@ -8,6 +8,7 @@ from rest_framework import status
 
 from accounts_module.models import User
 from utils_module.api.v1.views import NeshanReverseGeocodingAPIView
+from utils_module.background import run_in_background
 
 
 # Create your models here.
@@ -35,23 +36,39 @@ class StoredLocation(models.Model):
 logger = logging.getLogger(__name__)
 
 
+def enrich_stored_location(location_id):
+    """
+    Fills state and city of a stored location from its coordinates, resolved
+    offline when possible; the address only when Neshan was asked.
+    """
+    location = StoredLocation.objects.filter(pk=location_id).values('lat', 'long').first()
+    if not location or not location['lat'] or not location['long']:
+        return False
+
+    data, state, city, detailed_address, status_code = NeshanReverseGeocodingAPIView.get_location_data(
+        location['lat'], location['long'], need_address=False)
+
+    if status_code != status.HTTP_200_OK:
+        # Handle the error response accordingly
+        logger.error(
+            f"Failed to update location data for StoredLocation {location_id}: status_code {status_code}")
+        return False
+
+    # queryset update: no second save() and no post_save round trip
+    values = {'state': state, 'city': city}
+    if detailed_address:
+        values['address'] = detailed_address[:256]
+    StoredLocation.objects.filter(pk=location_id).update(**values)
+    return True
+
+
 # Define the signal handler outside the class
 @receiver(post_save, sender=StoredLocation)
 def update_location_data(sender, instance, created, **kwargs):
-    if created:
-        if instance.lat and instance.long:
-            data, state, city, detailed_address, status_code = NeshanReverseGeocodingAPIView.get_location_data(
-                instance.lat, instance.long)
-
-            if status_code == status.HTTP_200_OK:
-                instance.address = detailed_address
-                instance.state = state
-                instance.city = city
-                instance.save()
-            else:
-                # Handle the error response accordingly
-                logger.error(
-                    f"Failed to update location data for StoredLocation {instance.id}: status_code {status_code}")
+    if created and instance.lat and instance.long:
+        # enrichment happens after the response, the location is returned right away
+        run_in_background(enrich_stored_location, instance.pk)
+
 
 # ---------------------------------------------------------------------------
 class UserProfile(models.Model):
@@ -1,7 +1,7 @@
 # urls.py
 from django.urls import path
 
-from .views import NeshanSearchAPIView, NeshanReverseGeocodingAPIView
+from .views import NeshanSearchAPIView, NeshanReverseGeocodingAPIView, SuggestAPIView
 
 app = 'api-v1'
 
@@ -21,4 +21,7 @@ urlpatterns = [
 
     # Get Address from lat ang long from neshan
     path('neshan-reverse-geocoding/', NeshanReverseGeocodingAPIView.as_view(), name='neshan_reverse_geocoding'),
+
+    # typeahead for product and cafe names
+    path('suggest/', SuggestAPIView.as_view(), name='suggest'),
 ]
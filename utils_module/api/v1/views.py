@@ -1,59 +1,96 @@
-import requests
+from django.conf import settings
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from product_module.search import product_name_index
+from shop_module.search import cafe_name_index
+from utils_module.geocoding import get_location
+from utils_module.location_search import search_locations
+
 
 # Search the locations with search bar
 class NeshanSearchAPIView(APIView):
     @swagger_auto_schema(
         manual_parameters=[
             openapi.Parameter('term', openapi.IN_QUERY, description="Search Term", type=openapi.TYPE_STRING),
+            openapi.Parameter('lat', openapi.IN_QUERY, description="Latitude", type=openapi.TYPE_NUMBER),
+            openapi.Parameter('lng', openapi.IN_QUERY, description="Longitude", type=openapi.TYPE_NUMBER),
         ]
     )
     def get(self, request):
-        api_key = 'service.375767c29a45472eb62ca4dbaa108882'
+        term = request.GET.get('term', '')
+        lat = request.GET.get('lat')
+        long = request.GET.get('lng')
 
-        term = request.GET.get('term')
-        # lat = request.GET.get('lat')
-        # long = request.GET.get('lng')
+        if not term.strip():
+            return Response({
+                'status': False,
+                'error': 'Search term is a required parameter.'},
+                status=status.HTTP_400_BAD_REQUEST)
 
-        # term = 'تهران'
-        lat = 35.699756
-        long = 51.338076
+        try:
+            lat = float(lat) if lat else None
+            long = float(long) if long else None
+        except ValueError:
+            return Response({
+                'status': False,
+                'error': 'Latitude and longitude must be numbers.'},
+                status=status.HTTP_400_BAD_REQUEST)
 
-        url = f'https://api.neshan.org/v1/search?term={term}&lat={lat}&lng={long}'
-        headers = {'Api-Key': api_key}
-        response = requests.get(url, headers=headers)
+        # typeahead requests are mostly answered from the search cache
+        data, status_code = search_locations(term, lat, long)
+        return Response(data, status=status_code)
 
-        if response.status_code == 200:
-            return Response(response.json(), status=status.HTTP_200_OK)
-        else:
-            return Response(response.json(), status=response.status_code)
 
+# Typeahead for product and cafe names, answered from the in-process prefix indexes
+class SuggestAPIView(APIView):
+    TYPES = ('all', 'product', 'cafe')
 
-# Get address by the lat and long
-class NeshanReverseGeocodingAPIView(APIView):
-    @staticmethod
-    def get_location_data(lat, long):
-        api_key = 'service.ae1bf0d288834331a00f2b92d2378621'
-        url = f'https://api.neshan.org/v2/reverse?lat={lat}&lng={long}'
-        headers = {'Api-Key': api_key}
-        response = requests.get(url, headers=headers)
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, description="Typed text", type=openapi.TYPE_STRING),
+            openapi.Parameter('type', openapi.IN_QUERY, description="all, product or cafe", type=openapi.TYPE_STRING),
+            openapi.Parameter('shop', openapi.IN_QUERY, description="Only this shop's products",
+                              type=openapi.TYPE_STRING),
+            openapi.Parameter('limit', openapi.IN_QUERY, description="Completions per type",
+                              type=openapi.TYPE_INTEGER),
+        ]
+    )
+    def get(self, request):
+        term = request.GET.get('q', '')
+        suggest_type = request.GET.get('type', 'all')
+        shop = request.GET.get('shop', '')
+
+        if suggest_type not in self.TYPES:
+            return Response({
+                'status': False,
+                'error': 'type must be one of all, product or cafe.'},
+                status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(int(request.GET.get('limit', 10)), settings.SUGGEST_MAX_LIMIT)
+        except ValueError:
+            return Response({
+                'status': False,
+                'error': 'limit must be a number.'},
+                status=status.HTTP_400_BAD_REQUEST)
 
-        if response.status_code == 200:
-            data = response.json()
+        data = {}
+        if suggest_type in ('all', 'product'):
+            data['products'] = product_name_index.search(term, scope=shop, limit=limit)
+        if suggest_type in ('all', 'cafe') and not shop:
+            data['cafes'] = cafe_name_index.search(term, limit=limit)
+        return Response(data, status=status.HTTP_200_OK)
 
-            state = data.get('state', '')
-            city = data.get('city', '')
-            addresses = data.get('addresses', [])
-            detailed_address = addresses[0].get('formatted', '') if addresses else ''
 
-            return data, state, city, detailed_address, status.HTTP_200_OK
-        else:
-            return None, None, None, response.status_code
+# Get address by the lat and long
+class NeshanReverseGeocodingAPIView(APIView):
+    @staticmethod
+    def get_location_data(lat, long, need_address=True):
+        # offline geocoder for province/city only, else the reverse geocoding cache (Neshan on a miss)
+        return get_location(lat, long, need_address=need_address)
 
     @swagger_auto_schema(
         manual_parameters=[
@@ -77,6 +114,14 @@ class NeshanReverseGeocodingAPIView(APIView):
                 'error': 'Latitude and longitude are required parameters.'},
                 status=status.HTTP_400_BAD_REQUEST)
 
+        try:
+            lat, long = float(lat), float(long)
+        except ValueError:
+            return Response({
+                'status': False,
+                'error': 'Latitude and longitude must be numbers.'},
+                status=status.HTTP_400_BAD_REQUEST)
+
         data, state, city, detailed_address, status_code = self.get_location_data(lat, long)
         data = {
             'data': data,
@@ -0,0 +1,39 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+# one small pool per process, shared by every background job
+_executor = ThreadPoolExecutor(max_workers=getattr(settings, 'BACKGROUND_WORKERS', 2),
+                               thread_name_prefix='background')
+
+
+def _run(fn, args, kwargs):
+    try:
+        fn(*args, **kwargs)
+    except Exception:
+        logger.exception(f"Background job {fn.__name__} failed")
+    finally:
+        # worker threads open their own db connections, don't leak them
+        connections.close_all()
+
+
+def run_in_background(fn, *args, **kwargs):
+    """
+    Runs fn(*args, **kwargs) on the background pool once the current transaction
+    commits, so the job always sees the rows it was scheduled for.
+    Jobs are in-process only, anything lost on a restart is picked up by the
+    `enrich_locations` backfill command.
+    """
+    transaction.on_commit(lambda: _executor.submit(_run, fn, args, kwargs))
+
+
+def submit(fn, *args, **kwargs):
+    """
+    Runs fn(*args, **kwargs) on the background pool right away, for jobs that
+    don't depend on the current transaction.
+    """
+    _executor.submit(_run, fn, args, kwargs)
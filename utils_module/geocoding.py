@@ -0,0 +1,133 @@
+import logging
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+import requests
+from django.conf import settings
+from django.db import IntegrityError
+from django.utils import timezone
+from rest_framework import status
+
+from utils_module.cache import LRUCache, SingleFlight
+from utils_module.offline_geocoder import offline_reverse_geocode
+
+logger = logging.getLogger(__name__)
+
+NESHAN_REVERSE_URL = 'https://api.neshan.org/v2/reverse'
+
+# ----------------------------------------------------------------------------
+# Two tier reverse geocoding cache:
+#   1. process local LRU keyed by the quantized point
+#   2. ReverseGeocodeCache table shared by every worker
+# concurrent misses for the same point are coalesced into a single Neshan call.
+
+_memory_cache = LRUCache(maxsize=getattr(settings, 'GEOCODING_MEMORY_CACHE_SIZE', 2048))
+_in_flight = SingleFlight()
+
+
+def quantize_point(lat, long):
+    """
+    Rounds a coordinate pair to GEOCODING_CACHE_PRECISION decimals, so nearby
+    points (4 decimals ~ 11 meters) share one cache entry.
+    """
+    exp = Decimal(1).scaleb(-settings.GEOCODING_CACHE_PRECISION)
+    return (
+        Decimal(str(lat)).quantize(exp, rounding=ROUND_HALF_UP),
+        Decimal(str(long)).quantize(exp, rounding=ROUND_HALF_UP),
+    )
+
+
+def fetch_reverse_geocode(lat, long):
+    """
+    Calls Neshan directly; returns (data, state, city, address, status_code).
+    """
+    headers = {'Api-Key': settings.NESHAN_REVERSE_API_KEY}
+    try:
+        response = requests.get(NESHAN_REVERSE_URL, params={'lat': lat, 'lng': long}, headers=headers,
+                                timeout=settings.NESHAN_TIMEOUT)
+    except requests.RequestException as e:
+        logger.error(f"Neshan reverse geocoding failed for ({lat}, {long}): {e}")
+        return None, None, None, None, status.HTTP_503_SERVICE_UNAVAILABLE
+
+    if response.status_code != 200:
+        return None, None, None, None, response.status_code
+
+    data = response.json()
+    addresses = data.get('addresses', [])
+    detailed_address = addresses[0].get('formatted', '') if addresses else ''
+    return data, data.get('state', ''), data.get('city', ''), detailed_address, status.HTTP_200_OK
+
+
+def _entry_is_fresh(entry):
+    max_age = settings.GEOCODING_CACHE_MAX_AGE_DAYS
+    return not max_age or entry.updated_date >= timezone.now() - timedelta(days=max_age)
+
+
+def _load_or_fetch(key):
+    from utils_module.models import ReverseGeocodeCache
+
+    entry = ReverseGeocodeCache.objects.filter(lat=key[0], long=key[1]).first()
+    if entry is not None and _entry_is_fresh(entry):
+        return entry.data, entry.state, entry.city, entry.address, status.HTTP_200_OK
+
+    result = fetch_reverse_geocode(*key)
+    data, state, city, address, status_code = result
+    if status_code != status.HTTP_200_OK:
+        return result
+
+    values = {'state': state, 'city': city, 'address': (address or '')[:256], 'data': data}
+    if entry is not None:
+        ReverseGeocodeCache.objects.filter(pk=entry.pk).update(updated_date=timezone.now(), **values)
+    else:
+        try:
+            ReverseGeocodeCache.objects.create(lat=key[0], long=key[1], **values)
+        except IntegrityError:
+            # another worker stored the same point meanwhile
+            pass
+    return result
+
+
+def reverse_geocode(lat, long):
+    """
+    Cached replacement for a direct Neshan reverse call.
+    Returns (data, state, city, address, status_code); failures are never cached.
+    """
+    key = quantize_point(lat, long)
+    cached = _memory_cache.get(key)
+    if cached is not None:
+        return cached
+
+    result = _in_flight.do(key, _load_or_fetch, key)
+    if result[-1] == status.HTTP_200_OK:
+        _memory_cache.set(key, result)
+    return result
+
+
+def _offline_location(lat, long):
+    state, city = offline_reverse_geocode(lat, long)
+    if not city:
+        return None
+    return {'source': 'offline', 'state': state, 'city': city}, state, city, '', status.HTTP_200_OK
+
+
+def get_location(lat, long, need_address=True):
+    """
+    Without need_address (province and city only) the offline geocoder answers
+    first and Neshan (through the cache above) is asked only for points it cannot
+    place in a city. A street address always comes from Neshan; while the service
+    fails the offline province and city are still returned. With
+    GEOCODING_OFFLINE_ONLY the network is never used, e.g. in tests.
+    Returns (data, state, city, address, status_code).
+    """
+    if settings.GEOCODING_OFFLINE_ONLY:
+        return _offline_location(lat, long) or (None, None, None, None, status.HTTP_404_NOT_FOUND)
+    if not need_address:
+        offline = _offline_location(lat, long)
+        if offline is not None:
+            return offline
+
+    result = reverse_geocode(lat, long)
+    if result[-1] != status.HTTP_200_OK:
+        # service is down, province and city are still worth keeping
+        return _offline_location(lat, long) or result
+    return result
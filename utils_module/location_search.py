@@ -0,0 +1,95 @@
+import logging
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+
+from utils_module.cache import SingleFlight
+from utils_module.normalizers import normalize_text
+
+logger = logging.getLogger(__name__)
+
+NESHAN_SEARCH_URL = 'https://api.neshan.org/v1/search'
+
+# default search origin (Tehran), used when the client sends no location
+DEFAULT_LAT = 35.699756
+DEFAULT_LONG = 51.338076
+
+_in_flight = SingleFlight()
+
+
+# ----------------------------------------------------------------------------
+def _cache_key(term, lat, long):
+    precision = settings.NESHAN_SEARCH_LOCATION_PRECISION
+    return f'neshan_search:{round(float(lat), precision)}:{round(float(long), precision)}:{term}'
+
+
+def _item_matches(item, tokens):
+    haystack = normalize_text(' '.join(
+        str(item.get(field) or '') for field in ('title', 'address', 'region', 'neighbourhood')))
+    return all(token in haystack for token in tokens)
+
+
+def _derive_from_prefix(term, lat, long):
+    """
+    Answers a longer term from a cached shorter prefix. Only complete results
+    (fewer items than Neshan returns at most) can be narrowed down safely.
+    """
+    min_length = settings.NESHAN_SEARCH_MIN_PREFIX
+    prefixes = [term[:i].rstrip() for i in range(len(term) - 1, min_length - 1, -1)]
+    keys = [_cache_key(prefix, lat, long) for prefix in dict.fromkeys(p for p in prefixes if p)]
+    if not keys:
+        return None
+
+    cached = cache.get_many(keys)
+    tokens = term.split()
+    for key in keys:  # longest prefix first
+        result = cached.get(key)
+        if result is not None and result.get('count', 0) < settings.NESHAN_SEARCH_RESULT_LIMIT:
+            items = [item for item in result.get('items', []) if _item_matches(item, tokens)]
+            return {'count': len(items), 'items': items}
+    return None
+
+
+def _fetch(term, lat, long, key):
+    headers = {'Api-Key': settings.NESHAN_SEARCH_API_KEY}
+    try:
+        response = requests.get(NESHAN_SEARCH_URL, params={'term': term, 'lat': lat, 'lng': long},
+                                headers=headers, timeout=settings.NESHAN_TIMEOUT)
+    except requests.RequestException as e:
+        logger.error(f"Neshan search failed for '{term}': {e}")
+        return {'message': 'Location search is not available right now.'}, status.HTTP_503_SERVICE_UNAVAILABLE
+
+    try:
+        data = response.json()
+    except ValueError:
+        data = {}
+
+    if response.status_code == 200:
+        cache.set(key, data, settings.NESHAN_SEARCH_CACHE_TTL)
+    return data, response.status_code
+
+
+def search_locations(term, lat=None, long=None):
+    """
+    Neshan search behind a shared cache keyed by the normalized term and a
+    coarse location. Returns (data, status_code).
+    """
+    term = normalize_text(term)
+    lat = DEFAULT_LAT if lat is None else lat
+    long = DEFAULT_LONG if long is None else long
+
+    key = _cache_key(term, lat, long)
+    data = cache.get(key)
+    if data is not None:
+        return data, status.HTTP_200_OK
+
+    data = _derive_from_prefix(term, lat, long)
+    if data is not None:
+        cache.set(key, data, settings.NESHAN_SEARCH_CACHE_TTL)
+        return data, status.HTTP_200_OK
+
+    # coarse location keeps the search origin close to what the client sent
+    precision = settings.NESHAN_SEARCH_LOCATION_PRECISION
+    return _in_flight.do(key, _fetch, term, round(float(lat), precision), round(float(long), precision), key)
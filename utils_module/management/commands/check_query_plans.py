@@ -0,0 +1,93 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from accounts_module.models import UserMediaFiles
+from article_module.models import ArticleMediaFiles
+from product_module.models import Product, CafeProductCategory, ProductMediaFiles
+from shop_module.models import ShopMediaFiles
+
+
+def hot_queries():
+    """
+    (title, queryset) of the filters the hot paths run, with placeholder values:
+    the plan depends on the shape of the query, not on the values.
+    """
+    shop_id = user_id = 0
+    return [
+        ("shop products (AliveProductManager / ProductViewSet)",
+         Product.objects.filter(shop_id=shop_id, is_active=True, product_type=Product.CAFE)),
+        ("shop market listing (ShopMarketIndexViewSet)",
+         Product.objects.filter(is_active=True, is_deleted=False, is_wholesale=False,
+                                product_type=Product.SHOP).order_by('created_date')),
+        ("cafe menu categories",
+         CafeProductCategory.objects.filter(shop_id=shop_id, is_deleted=False).order_by('ordering_number')),
+        ("product media of a shop",
+         ProductMediaFiles.objects.filter(shop_id=shop_id, media_type=ProductMediaFiles.PRODUCT, is_global=False)),
+        ("global product media", ProductMediaFiles.objects.filter(is_global=True, media_type=ProductMediaFiles.PRODUCT)),
+        ("shop media of a shop",
+         ShopMediaFiles.objects.filter(shop_id=shop_id, media_type=ShopMediaFiles.LOGO, is_global=False)),
+        ("global shop media", ShopMediaFiles.objects.filter(is_global=True, media_type=ShopMediaFiles.LOGO)),
+        ("user media", UserMediaFiles.objects.filter(user_id=user_id, media_type=UserMediaFiles.AVATAR)),
+        ("article media", ArticleMediaFiles.objects.filter(user_id=user_id, media_type=ArticleMediaFiles.ARTICLE)),
+        ("expired auth tokens (cron_commands)", Token.objects.filter(created__lt=timezone.now())),
+    ]
+
+
+def explain(queryset):
+    """
+    Returns (plan lines, full scan lines) of a queryset on the current database.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            lines = [row[-1] for row in cursor.fetchall()]
+            return lines, [line for line in lines if line.startswith('SCAN ')]
+        if connection.vendor == 'postgresql':
+            # on small tables a sequential scan is cheaper, ask whether an index can be used at all
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}', params)
+            lines = [row[0] for row in cursor.fetchall()]
+            return lines, [line for line in lines if 'Seq Scan' in line]
+        cursor.execute(f'EXPLAIN {sql}', params)
+        columns = [column[0] for column in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        lines = [f"{row.get('table')}: type={row.get('type')} key={row.get('key')}" for row in rows]
+        return lines, [line for line, row in zip(lines, rows) if row.get('type') == 'ALL']
+
+
+class Command(BaseCommand):
+    help = (
+        "EXPLAINs the hot path queries and fails when one of them falls back to a full table scan. "
+        "MySQL may still prefer a scan on near empty tables, run it against production sized data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help="Print the plan of every query.")
+        parser.add_argument('--strict', action='store_true', help="Fail on SQLite too.")
+
+    def handle(self, *args, **options):
+        # Django writes `is_active = true` as a bare `"is_active"` condition on SQLite, which SQLite
+        # cannot look up in an index: there a scan is reported, not failed (MySQL compares to 1).
+        lenient = connection.vendor == 'sqlite' and not options['strict']
+        failed = []
+        for title, queryset in hot_queries():
+            lines, full_scans = explain(queryset)
+            if full_scans:
+                failed.append(title)
+                self.stdout.write(self.style.ERROR(f"FULL SCAN  {title}: {'; '.join(full_scans)}"))
+            else:
+                self.stdout.write(f"ok         {title}")
+            if options['verbose_plans']:
+                for line in lines:
+                    self.stdout.write(f"    {line}")
+
+        if failed and lenient:
+            self.stdout.write(self.style.WARNING(
+                f"{len(failed)} hot queries scan on SQLite, check them on MySQL / PostgreSQL."))
+            return
+        if failed:
+            raise CommandError(f"{len(failed)} hot queries fall back to a full scan.")
+        self.stdout.write(self.style.SUCCESS("Every hot query uses an index."))
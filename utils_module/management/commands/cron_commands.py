@@ -50,7 +50,7 @@ class Command(BaseCommand):
     def handle(self, *args, **kwargs):
         # -----------------------------------------------------------------------------------
         # --- Part 1: Delete Old Tokens ---
-        site_setting = SiteSetting.objects.filter(is_main_setting=True).first()
+        site_setting = SiteSetting.get_main_setting()
         token_validity_days = site_setting.old_token_deletion if site_setting else 15
         threshold_date = timezone.now() - timedelta(days=token_validity_days)
         deleted_count, _ = Token.objects.filter(created__lt=threshold_date).delete()
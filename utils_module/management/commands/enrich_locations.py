@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Q
+
+from shop_module.models import ShopProfile, enrich_shop_profile
+from user_module.models import StoredLocation, enrich_stored_location
+
+
+def _enrich(fn, pk):
+    try:
+        return fn(pk)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfills state and city of stored locations and state, city and address of shop profiles "
+        "from their coordinates, using a bounded pool of worker threads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Number of concurrent lookups.")
+        parser.add_argument('--only', choices=['locations', 'shops'], help="Enrich only one kind of record.")
+
+    def handle(self, *args, **options):
+        missing_place = Q(state__isnull=True) | Q(state='') | Q(city__isnull=True) | Q(city='')
+        missing = missing_place | Q(address__isnull=True) | Q(address='')
+
+        jobs = []
+        if options['only'] in (None, 'locations'):
+            # stored locations need province and city only, see enrich_stored_location
+            ids = StoredLocation.objects.filter(missing_place).values_list('pk', flat=True)
+            jobs.append(("stored locations", enrich_stored_location, list(ids)))
+        if options['only'] in (None, 'shops'):
+            ids = ShopProfile.objects.filter(missing, latitude__isnull=False, longitude__isnull=False) \
+                .values_list('pk', flat=True)
+            jobs.append(("shop profiles", enrich_shop_profile, list(ids)))
+
+        workers = max(1, options['workers'])
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for title, fn, ids in jobs:
+                self.stdout.write(f"Enriching {len(ids)} {title}...")
+                enriched = failed = 0
+                pending = set()
+                for pk in ids:
+                    # keep at most two batches queued so memory stays flat on large tables
+                    if len(pending) >= workers * 2:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            if future.exception() is None and future.result():
+                                enriched += 1
+                            else:
+                                failed += 1
+                    pending.add(executor.submit(_enrich, fn, pk))
+
+                for future in wait(pending).done:
+                    if future.exception() is None and future.result():
+                        enriched += 1
+                    else:
+                        failed += 1
+
+                self.stdout.write(self.style.SUCCESS(f"Enriched {enriched} {title}, {failed} skipped or failed."))
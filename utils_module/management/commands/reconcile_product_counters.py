@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from product_module.counters import reconcile_counters
+
+
+class Command(BaseCommand):
+    help = (
+        "Recounts the denormalized product / bundle counters of shops and cafe menu categories "
+        "and repairs the rows that drifted. Saves running meanwhile can still be off by their own change, "
+        "run it in quiet hours."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shop', action='append', dest='shops', help="Only this shop id (repeatable).")
+
+    def handle(self, *args, **options):
+        repaired = reconcile_counters(shop_ids=options['shops'])
+        self.stdout.write(self.style.SUCCESS(f"Repaired {repaired} counter rows."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from order_module.stats import rollup_shop_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Aggregates the orders of the shops into their daily stats rows (the shop dashboard). "
+        "Only the days whose orders changed since the previous run are recomputed; "
+        "--days N recomputes every day of the last N days, e.g. after orders were deleted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Recompute every day of the last N days.")
+
+    def handle(self, *args, **options):
+        written = rollup_shop_stats(days=options['days'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} daily stats rows."))
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.20 on 2026-10-19 14:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReverseGeocodeCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lat', models.DecimalField(decimal_places=6, max_digits=9, verbose_name='عرض جغرافیایی')),
+                ('long', models.DecimalField(decimal_places=6, max_digits=9, verbose_name='طول جغرافیایی')),
+                ('state', models.CharField(blank=True, max_length=100, null=True, verbose_name='استان')),
+                ('city', models.CharField(blank=True, max_length=100, null=True, verbose_name='شهر')),
+                ('address', models.CharField(blank=True, max_length=256, null=True, verbose_name='آدرس')),
+                ('data', models.JSONField(blank=True, null=True, verbose_name='پاسخ سرویس')),
+                ('created_date', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')),
+                ('updated_date', models.DateTimeField(auto_now=True, verbose_name='تاریخ بروز رسانی')),
+            ],
+            options={
+                'verbose_name': 'آدرس ذخیره شده مختصات',
+                'verbose_name_plural': 'آدرس های ذخیره شده مختصات',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reversegeocodecache',
+            constraint=models.UniqueConstraint(fields=('lat', 'long'), name='unique_reverse_geocode_point'),
+        ),
+    ]
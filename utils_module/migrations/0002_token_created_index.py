@@ -0,0 +1,25 @@
+from django.db import migrations, models
+
+# rest_framework.authtoken.Token is a third party model, its purge by `created`
+# (cron_commands) gets the index from here instead of from Token.Meta.
+TOKEN_CREATED_INDEX = models.Index(fields=['created'], name='authtoken_token_created_idx')
+
+
+def add_token_created_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model('authtoken', 'Token'), TOKEN_CREATED_INDEX)
+
+
+def remove_token_created_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('authtoken', 'Token'), TOKEN_CREATED_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authtoken', '0004_alter_tokenproxy_options'),
+        ('utils_module', '0001_reversegeocodecache'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_token_created_index, remove_token_created_index),
+    ]
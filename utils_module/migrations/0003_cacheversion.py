@@ -0,0 +1,24 @@
+# Generated by Django 4.2.20 on 2026-10-19 15:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('utils_module', '0002_token_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheVersion',
+            fields=[
+                ('name', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='نام')),
+                ('version', models.BigIntegerField(default=0, verbose_name='نسخه')),
+            ],
+            options={
+                'verbose_name': 'نسخه کش',
+                'verbose_name_plural': 'نسخه های کش',
+            },
+        ),
+    ]
@@ -0,0 +1,169 @@
+import hashlib
+
+from django.db.models import Count, F, Max, Window
+from django.db.models.functions import RowNumber
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from utils_module import ordering
+
+
+# ----------------------------------------------------------------------------
+# Conditional GET
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified for read heavy endpoints. The validators are computed
+    before any serialization, from:
+      - conditional_models: max(updated_date) and row count of each model
+        (the count catches hard deletes)
+      - conditional_version: a static string, e.g. the choices a view returns
+    Handlers start with `return self.not_modified_response(request) or ...`.
+    """
+    conditional_models = ()
+    conditional_version = ''
+
+    def get_conditional_state(self):
+        parts = [str(self.conditional_version)]
+        last_modified = None
+        for model in self.conditional_models:
+            state = model._default_manager.aggregate(last=Max('updated_date'), count=Count('pk'))
+            parts.append(f"{model._meta.label}:{state['count']}:{state['last']}")
+            if state['last'] and (last_modified is None or state['last'] > last_modified):
+                last_modified = state['last']
+        return parts, last_modified
+
+    def not_modified_response(self, request):
+        parts, last_modified = self.get_conditional_state()
+        # the same resource renders differently per url and negotiated format
+        parts += [request.get_full_path(), request.accepted_media_type or '']
+        etag = '"%s"' % hashlib.md5('|'.join(parts).encode()).hexdigest()
+        last_modified = int(last_modified.timestamp()) if last_modified else None
+
+        self._conditional_headers = etag, last_modified
+        return get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        headers = getattr(self, '_conditional_headers', None)
+        if headers and response.status_code in (200, 304):
+            etag, last_modified = headers
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ('Accept',))
+        return response
+
+
+# ----------------------------------------------------------------------------
+# Display order
+class OrderableMixin:
+    """
+    Drag and drop ordering for a viewset whose model has an ordering field:
+      - POST reorder/  {"ids": [...]}            the given items in this order, one UPDATE
+      - POST {pk}/move/ {"after": id} or {"before": id}  one item, usually one row
+    The items are limited to get_ordering_scope(), by default get_queryset().
+    """
+    ordering_field = 'ordering_number'
+
+    def get_ordering_scope(self, instance=None):
+        return self.get_queryset()
+
+    @swagger_auto_schema(request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT, required=['ids'],
+        properties={'ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING))},
+    ))
+    @action(detail=False, methods=['post'], url_path='reorder')
+    def reorder(self, request, *args, **kwargs):
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not ids:
+            raise serializers.ValidationError({'ids': "لیست شناسه ها الزامی است."})
+        updated = ordering.reorder(self.get_ordering_scope(), ids, self.ordering_field)
+        return Response({
+            "success": True,
+            "data": {"updated": updated},
+            "message": "ترتیب نمایش با موفقیت ذخیره شد."
+        }, status=status.HTTP_200_OK)
+
+    @swagger_auto_schema(request_body=openapi.Schema(type=openapi.TYPE_OBJECT, properties={
+        'after': openapi.Schema(type=openapi.TYPE_STRING, description="شناسه موردی که باید قبل از این مورد باشد"),
+        'before': openapi.Schema(type=openapi.TYPE_STRING, description="شناسه موردی که باید بعد از این مورد باشد"),
+    }))
+    @action(detail=True, methods=['post'], url_path='move')
+    def move(self, request, *args, **kwargs):
+        instance = self.get_object()
+        key = ordering.move(self.get_ordering_scope(instance), instance, after=request.data.get('after'),
+                            before=request.data.get('before'), field=self.ordering_field)
+        return Response({
+            "success": True,
+            "data": {"id": str(instance.pk), self.ordering_field: key},
+            "message": "ترتیب نمایش با موفقیت ذخیره شد."
+        }, status=status.HTTP_200_OK)
+
+
+# ----------------------------------------------------------------------------
+# Media library
+MEDIA_LIBRARY_PARAMETERS = [
+    openapi.Parameter('group_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                      description='Files per (global / local, media_type) group, all files when omitted'),
+    openapi.Parameter('group_page', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                      description='Page of every group when group_size is given (1 based)'),
+]
+
+
+class MediaLibraryListMixin:
+    """
+    list() data of the media file managers: {"global_files": {media_type: [...]},
+    "local_files": {media_type: [...]}} from one query ordered by (is_global, media_type),
+    serialized once and grouped in a single pass.
+    With ?group_size=N&group_page=P every group returns its P-th page of N files
+    (a row_number window per group) and "groups" tells each group's total.
+    """
+    media_ordering = ('-created_date', '-pk')
+    max_group_size = 100
+
+    def _query_int(self, name, default=None):
+        value = self.request.query_params.get(name)
+        if value in (None, ''):
+            return default
+        try:
+            value = int(value)
+        except ValueError:
+            value = 0
+        if value < 1:
+            raise serializers.ValidationError({name: "باید عدد صحیح مثبت باشد."})
+        return value
+
+    def get_media_library_data(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = [F(field[1:]).desc() if field.startswith('-') else F(field).asc() for field in self.media_ordering]
+        queryset = queryset.order_by('is_global', 'media_type', *ordering)
+
+        group_size = self._query_int('group_size')
+        group_page = self._query_int('group_page', 1)
+        if group_size:
+            group_size = min(group_size, self.max_group_size)
+            partition = [F('is_global'), F('media_type')]
+            queryset = queryset.annotate(
+                group_row=Window(RowNumber(), partition_by=partition, order_by=ordering),
+                group_total=Window(Count('pk'), partition_by=partition),
+            ).filter(group_row__gt=(group_page - 1) * group_size, group_row__lte=group_page * group_size)
+
+        files = list(queryset)
+        data = {"global_files": {}, "local_files": {}}
+        groups = {"global_files": {}, "local_files": {}}
+        for file, item in zip(files, self.get_serializer(files, many=True).data):
+            key = "global_files" if file.is_global else "local_files"
+            data[key].setdefault(file.media_type, []).append(item)
+            if group_size:
+                groups[key][file.media_type] = {
+                    "count": file.group_total, "page": group_page,
+                    "has_next": group_page * group_size < file.group_total,
+                }
+        if group_size:
+            data["groups"] = groups
+        return data
@@ -1,3 +1,58 @@
 from django.db import models
+from django.db.models import F
+
 
 # Create your models here.
+
+class ReverseGeocodeCache(models.Model):
+    # coordinates rounded to settings.GEOCODING_CACHE_PRECISION decimals
+    lat = models.DecimalField(max_digits=9, decimal_places=6, verbose_name='عرض جغرافیایی')
+    long = models.DecimalField(max_digits=9, decimal_places=6, verbose_name='طول جغرافیایی')
+    state = models.CharField(max_length=100, null=True, blank=True, verbose_name='استان')
+    city = models.CharField(max_length=100, null=True, blank=True, verbose_name='شهر')
+    address = models.CharField(max_length=256, null=True, blank=True, verbose_name='آدرس')
+    data = models.JSONField(null=True, blank=True, verbose_name='پاسخ سرویس')
+
+    created_date = models.DateTimeField(auto_now_add=True, editable=False, verbose_name='تاریخ ایجاد')
+    updated_date = models.DateTimeField(auto_now=True, verbose_name='تاریخ بروز رسانی')
+
+    class Meta:
+        verbose_name = 'آدرس ذخیره شده مختصات'
+        verbose_name_plural = 'آدرس های ذخیره شده مختصات'
+        constraints = [
+            models.UniqueConstraint(fields=['lat', 'long'], name='unique_reverse_geocode_point'),
+        ]
+
+    def __str__(self):
+        return f'{self.lat}, {self.long}'
+
+
+class CacheVersion(models.Model):
+    # version of a group of cached payloads, moved on in the transaction that changed
+    # their rows; kept in the database so every process sees the same one
+    name = models.CharField(max_length=100, primary_key=True, verbose_name='نام')
+    version = models.BigIntegerField(default=0, verbose_name='نسخه')
+
+    class Meta:
+        verbose_name = 'نسخه کش'
+        verbose_name_plural = 'نسخه های کش'
+
+    def __str__(self):
+        return f'{self.name}: {self.version}'
+
+    @classmethod
+    def bump(cls, names):
+        """
+        Moves the versions on in the current transaction, missing rows are created first.
+        """
+        names = set(names)
+        rows = cls.objects.filter(name__in=names)
+        if rows.update(version=F('version') + 1) == len(names):
+            return
+        cls.objects.bulk_create([cls(name=name) for name in names], ignore_conflicts=True)
+        # the existing rows move twice, only a change of the value matters
+        rows.update(version=F('version') + 1)
+
+    @classmethod
+    def current(cls, name):
+        return cls.objects.filter(name=name).values_list('version', flat=True).first() or 0
@@ -0,0 +1,35 @@
+import re
+
+# Arabic code points that Persian keyboards and old data mix in, folded to the Persian form
+_CHAR_MAP = str.maketrans({
+    'ي': 'ی',
+    'ى': 'ی',
+    'ئ': 'ی',
+    'ك': 'ک',
+    'ة': 'ه',
+    'ۀ': 'ه',
+    'أ': 'ا',
+    'إ': 'ا',
+    'آ': 'ا',
+    'ؤ': 'و',
+    '\u200c': ' ',  # zero width non-joiner (half space)
+    '\u200f': None,  # rtl mark
+    '\u0640': None,  # tatweel
+    **{chr(0x06F0 + i): str(i) for i in range(10)},  # Persian digits
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # Arabic digits
+})
+
+# harakat, tanvin, shadda, sukun and superscript alef
+_DIACRITICS = re.compile('[\u064b-\u065f\u0670]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(value):
+    """
+    Folds a Persian/Arabic string to a canonical search form: unified letters
+    and digits, no diacritics, lower case and single spaced.
+    """
+    if not value:
+        return ''
+    value = _DIACRITICS.sub('', str(value).translate(_CHAR_MAP))
+    return _WHITESPACE.sub(' ', value).strip().lower()
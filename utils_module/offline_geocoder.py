@@ -0,0 +1,193 @@
+import json
+import math
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+# ----------------------------------------------------------------------------
+# Local province/city resolution: GeoJSON features bucketed into a lat/long grid,
+# a lookup tests only the places whose bounding box touches the point's cell.
+#
+# Feature properties: level ("province" or "city"), name and, for cities,
+# province. Polygons are matched by containment (the smallest area wins); city
+# Points by distance, within a radius growing with their population, since no
+# municipal boundaries are published for most Iranian cities.
+#
+# The bundled data/iran_places.geojson (OFFLINE_GEOCODER_DATASET) holds:
+# - the 31 province boundaries of echarts-countries-pypkg (MIT, Natural Earth
+#   based, simplified), named the way Neshan names provinces;
+# - the Iranian cities of GeoNames cities5000 (CC BY 4.0) with their Persian
+#   names and population, the province taken from the GeoNames admin1 code.
+
+
+def _point_in_ring(x, y, ring):
+    inside = False
+    j = len(ring) - 1
+    for i in range(len(ring)):
+        xi, yi = ring[i][0], ring[i][1]
+        xj, yj = ring[j][0], ring[j][1]
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def _ring_area(ring):
+    return abs(sum(ring[i][0] * ring[i - 1][1] - ring[i - 1][0] * ring[i][1] for i in range(len(ring)))) / 2
+
+
+class _Place:
+    __slots__ = ('level', 'name', 'province', 'polygons', 'bbox', 'area')
+
+    def __init__(self, properties, polygons):
+        self.level = properties.get('level', 'city')
+        self.name = properties.get('name', '')
+        self.province = properties.get('province', '')
+        self.polygons = polygons  # [[outer ring, *holes], ...] as (long, lat) pairs
+        xs = [p[0] for polygon in polygons for p in polygon[0]]
+        ys = [p[1] for polygon in polygons for p in polygon[0]]
+        self.bbox = (min(xs), min(ys), max(xs), max(ys))
+        self.area = sum(_ring_area(polygon[0]) for polygon in polygons)
+
+    def contains(self, x, y):
+        min_x, min_y, max_x, max_y = self.bbox
+        if not (min_x <= x <= max_x and min_y <= y <= max_y):
+            return False
+        for outer, *holes in self.polygons:
+            if _point_in_ring(x, y, outer) and not any(_point_in_ring(x, y, hole) for hole in holes):
+                return True
+        return False
+
+
+# a city Point covers CITY_RADIUS_PER_PERSON * sqrt(population) km, at least CITY_MIN_RADIUS
+CITY_MIN_RADIUS = 3
+CITY_RADIUS_PER_PERSON = 0.008
+KM_PER_DEGREE = 111.32
+
+
+class _CityPoint:
+    __slots__ = ('name', 'province', 'x', 'y', 'population', 'radius')
+
+    def __init__(self, properties, x, y):
+        self.name = properties.get('name', '')
+        self.province = properties.get('province', '')
+        self.x, self.y = x, y
+        self.population = properties.get('population') or 0
+        self.radius = max(CITY_MIN_RADIUS, CITY_RADIUS_PER_PERSON * math.sqrt(self.population))
+
+    def distance(self, x, y):
+        """
+        Kilometers to the point, equirectangular (plenty for tens of kilometers).
+        """
+        dx = (x - self.x) * math.cos(math.radians((y + self.y) / 2))
+        return math.hypot(dx, y - self.y) * KM_PER_DEGREE
+
+
+class OfflineGeocoder:
+    def __init__(self, features, cell_size=0.5):
+        self.cell_size = cell_size
+        self._grid = defaultdict(list)
+        points = []
+        for feature in features:
+            geometry = feature.get('geometry') or {}
+            if geometry.get('type') == 'Point':
+                points.append(_CityPoint(feature.get('properties') or {}, *geometry['coordinates'][:2]))
+                continue
+            if geometry.get('type') == 'Polygon':
+                polygons = [geometry['coordinates']]
+            elif geometry.get('type') == 'MultiPolygon':
+                polygons = geometry['coordinates']
+            else:
+                continue
+            place = _Place(feature.get('properties') or {}, polygons)
+            min_x, min_y, max_x, max_y = place.bbox
+            for cx in range(self._cell(min_x), self._cell(max_x) + 1):
+                for cy in range(self._cell(min_y), self._cell(max_y) + 1):
+                    self._grid[(cx, cy)].append(place)
+
+        self._points = defaultdict(list)
+        for point in points:
+            self._points[(self._cell(point.x), self._cell(point.y))].append(point)
+        quarters = {id(point) for point in points if self._is_quarter(point)}
+        for cell_points in self._points.values():
+            cell_points[:] = [point for point in cell_points if id(point) not in quarters]
+
+    def _nearby_points(self, x, y):
+        cx, cy = self._cell(x), self._cell(y)
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                yield from self._points.get((cx + dx, cy + dy), ())
+
+    def _is_quarter(self, point):
+        """
+        True for a place lying well inside a city ten times its size: GeoNames
+        lists some quarters of the big cities (e.g. Tajrish in Tehran) as places.
+        """
+        return any(other.population >= 10 * point.population and other.distance(point.x, point.y) < 0.8 * other.radius
+                   for other in self._nearby_points(point.x, point.y))
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f).get('features', []))
+
+    def _cell(self, value):
+        return math.floor(value / self.cell_size)
+
+    def lookup(self, lat, long):
+        """
+        Returns (state, city) for the point: the smallest matching area, else the
+        city Point the point is relatively closest to within its radius; the
+        province alone outside every city, (None, None) outside the dataset.
+        """
+        x, y = float(long), float(lat)
+        city = province = None
+        for place in self._grid.get((self._cell(x), self._cell(y)), ()):
+            if not place.contains(x, y):
+                continue
+            if place.level == 'province':
+                if province is None or place.area < province.area:
+                    province = place
+            elif city is None or place.area < city.area:
+                city = place
+
+        if city is None:
+            best = None
+            for point in self._nearby_points(x, y):
+                score = point.distance(x, y) / point.radius
+                if score <= 1 and (best is None or score < best[0]):
+                    best = score, point
+            city = best and best[1]
+
+        if city is not None:
+            return city.province or (province.name if province else None), city.name
+        if province is not None:
+            return province.name, None
+        return None, None
+
+
+_geocoders = {}
+_lock = threading.Lock()
+
+
+def get_offline_geocoder():
+    """
+    Process wide geocoder of the configured dataset, loaded on first use; None when
+    OFFLINE_GEOCODER_DATASET is empty.
+    """
+    path = settings.OFFLINE_GEOCODER_DATASET
+    if not path:
+        return None
+    if path not in _geocoders:
+        with _lock:
+            if path not in _geocoders:
+                _geocoders[path] = OfflineGeocoder.from_file(path)
+    return _geocoders[path]
+
+
+def offline_reverse_geocode(lat, long):
+    geocoder = get_offline_geocoder()
+    if geocoder is None:
+        return None, None
+    return geocoder.lookup(lat, long)
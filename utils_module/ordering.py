@@ -0,0 +1,109 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import transaction
+from django.db.models import Case, IntegerField, Max, Min, Value, When
+from rest_framework import serializers
+
+# ----------------------------------------------------------------------------
+# Display order with sparse integer keys: items are spaced GAP apart, so moving
+# one item between two others only rewrites its own key (the midpoint). When two
+# neighbours leave no room the whole scope is respaced in a single UPDATE.
+
+GAP = 1024
+
+
+def _to_pk(model, value, field='ids'):
+    try:
+        return model._meta.pk.to_python(value)
+    except DjangoValidationError:
+        raise serializers.ValidationError({field: f"شناسه {value} معتبر نیست."})
+
+
+def write_keys(model, keys, field='ordering_number'):
+    """
+    Sets {pk: key} with one CASE UPDATE.
+    """
+    if not keys:
+        return 0
+    return model._default_manager.filter(pk__in=keys).update(**{field: Case(
+        *[When(pk=pk, then=Value(key)) for pk, key in keys.items()], output_field=IntegerField(),
+    )})
+
+
+def reorder(queryset, ids, field='ordering_number'):
+    """
+    Puts the given items of the queryset in the order of `ids`. The keys they
+    already hold are handed out again in the new order, so items left out of
+    the list keep their place; when those keys are not distinct, fresh spaced
+    keys are used. Returns the number of changed rows.
+    """
+    model = queryset.model
+    ids = [_to_pk(model, value) for value in ids]
+    if len(set(ids)) != len(ids):
+        raise serializers.ValidationError({'ids': "شناسه تکراری در لیست وجود دارد."})
+
+    current = dict(queryset.filter(pk__in=ids).values_list('pk', field))
+    if len(current) != len(ids):
+        raise serializers.ValidationError({'ids': "برخی از موارد پیدا نشدند."})
+
+    slots = sorted(current.values())
+    if len(set(slots)) != len(slots):
+        slots = [GAP * (i + 1) for i in range(len(ids))]
+    keys = {pk: slot for pk, slot in zip(ids, slots) if current[pk] != slot}
+    with transaction.atomic():
+        return write_keys(model, keys, field)
+
+
+def move(queryset, item, after=None, before=None, field='ordering_number'):
+    """
+    Moves `item` right after the `after` item, right before the `before` item, or
+    to the start when neither is given. Normally only the item's key changes.
+    Returns the item's new key.
+    """
+    model = queryset.model
+    others = queryset.exclude(pk=item.pk)
+
+    anchor_name = 'after' if after is not None else 'before'
+    anchor = after if after is not None else before
+    anchor_pk = _to_pk(model, anchor, anchor_name) if anchor is not None else None
+    if anchor_pk is not None:
+        anchor_key = others.filter(pk=anchor_pk).values_list(field, flat=True).first()
+        if anchor_key is None:
+            raise serializers.ValidationError({anchor_name: "مورد پیدا نشد."})
+        ties = others.filter(**{field: anchor_key}).exclude(pk=anchor_pk).exists()
+    else:
+        anchor_key, ties = None, False
+
+    if after is not None:
+        low, high = anchor_key, others.filter(**{f'{field}__gt': anchor_key}).aggregate(key=Min(field))['key']
+    elif before is not None:
+        low, high = others.filter(**{f'{field}__lt': anchor_key}).aggregate(key=Max(field))['key'], anchor_key
+    else:
+        low, high = None, others.aggregate(key=Min(field))['key']
+
+    if high is None:
+        key = (low or 0) + GAP
+    elif high - (low if low is not None else -1) >= 2 and not ties:
+        key = ((low if low is not None else 0) + high) // 2
+    else:
+        return _respace(others, item, anchor_pk, after is not None, field)
+
+    if getattr(item, field) != key:
+        model._default_manager.filter(pk=item.pk).update(**{field: key})
+        setattr(item, field, key)
+    return key
+
+
+def _respace(others, item, anchor_pk, place_after, field):
+    ordered = list(others.order_by(field, 'pk').values_list('pk', flat=True))
+    position = 0
+    if anchor_pk is not None:
+        position = ordered.index(anchor_pk) + (1 if place_after else 0)
+    ordered.insert(position, item.pk)
+
+    current = dict(others.values_list('pk', field))
+    current[item.pk] = getattr(item, field)
+    keys = {pk: GAP * (i + 1) for i, pk in enumerate(ordered) if current[pk] != GAP * (i + 1)}
+    with transaction.atomic():
+        write_keys(others.model, keys, field)
+    setattr(item, field, GAP * (position + 1))
+    return GAP * (position + 1)
@@ -0,0 +1,180 @@
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+
+from utils_module.background import submit
+from utils_module.normalizers import normalize_text
+
+# ----------------------------------------------------------------------------
+# In-process typeahead index: a sorted array of (scope, key, item id) searched
+# with bisect, so a completion never leaves the process.
+#
+# Every word start of a label is a key ("قهوه اسپرسو" is found by "قه" and "اسپ").
+# Entries live under one or more scopes, e.g. '' for the whole market and the
+# shop id for a single shop.
+#
+# Signals update the index of the process that saved the row and, when a label
+# or its visibility changed, move a version row (utils_module.CacheVersion) on in
+# the transaction of the change. Every SUGGEST_SYNC_INTERVAL seconds a process
+# compares that version with the one of its last build on the background pool and
+# rebuilds there when it moved, meanwhile searches keep using the old index. Only
+# the first build of a process runs on the request.
+
+MAX_SCAN = 500
+
+
+def _label_keys(label):
+    words = normalize_text(label).split()
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+class PrefixIndex:
+    """
+    `loader` yields (item_id, label, scopes, payload) for every indexed row;
+    it runs on first use and whenever another process reported a change.
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.version_name = f'prefix_index:{name}'
+        self._entries = []  # sorted (scope, key, item_id)
+        self._items = {}  # item_id -> (label, normalized label, entries, payload)
+        self._built = False
+        self._generation = None
+        self._next_check = 0
+        self._refreshing = False
+        self._lock = threading.RLock()
+
+    def _stored_version(self):
+        from utils_module.models import CacheVersion
+
+        return CacheVersion.current(self.version_name)
+
+    def _build(self):
+        # the version is read before the rows, a change committed in between only costs another build
+        generation = self._stored_version()
+        entries, items = [], {}
+        for item_id, label, scopes, payload in self.loader():
+            items[item_id] = self._make_item(item_id, label, scopes, payload)
+            entries += items[item_id][2]
+        entries.sort()
+        with self._lock:
+            self._entries, self._items = entries, items
+            self._generation = generation
+            self._built = True
+
+    @staticmethod
+    def _make_item(item_id, label, scopes, payload):
+        entries = [(scope, key, item_id) for scope in scopes for key in _label_keys(label)]
+        return label, normalize_text(label), entries, payload
+
+    def _ensure_current(self):
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    self._build()
+                    self._next_check = time.monotonic() + settings.SUGGEST_SYNC_INTERVAL
+            return
+        now = time.monotonic()
+        if now < self._next_check or self._refreshing:
+            return
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+            self._next_check = now + settings.SUGGEST_SYNC_INTERVAL
+        submit(self._refresh)
+
+    def _refresh(self):
+        try:
+            if self._stored_version() != self._generation:
+                self._build()
+        finally:
+            self._refreshing = False
+
+    def reset(self):
+        with self._lock:
+            self._entries, self._items = [], {}
+            self._built = False
+            self._generation = None
+
+    # ------------------------------------------------------------------
+    # incremental updates, called from post_save / post_delete receivers
+
+    def changed(self):
+        """
+        Tells the other processes that labels changed; runs in the transaction of the change,
+        after the local index was updated.
+        """
+        from utils_module.models import CacheVersion
+
+        CacheVersion.bump([self.version_name])
+        version = self._stored_version()
+        with self._lock:
+            # nobody else moved it since our build, so our index already holds every change
+            if self._built and version == self._generation + 1:
+                self._generation = version
+
+    def upsert(self, item_id, label, scopes, payload=None):
+        with self._lock:
+            if self._built:
+                self._discard(item_id)
+                item = self._items[item_id] = self._make_item(item_id, label, scopes, payload)
+                for entry in item[2]:
+                    insort(self._entries, entry)
+
+    def upsert_many(self, rows):
+        """
+        Bulk version of upsert for (item_id, label, scopes, payload) rows.
+        """
+        with self._lock:
+            if self._built:
+                for item_id, label, scopes, payload in rows:
+                    self._discard(item_id)
+                    item = self._items[item_id] = self._make_item(item_id, label, scopes, payload)
+                    for entry in item[2]:
+                        insort(self._entries, entry)
+
+    def discard(self, item_id):
+        with self._lock:
+            if self._built:
+                self._discard(item_id)
+
+    def _discard(self, item_id):
+        item = self._items.pop(item_id, None)
+        if item is None:
+            return
+        for entry in item[2]:
+            i = bisect_left(self._entries, entry)
+            if i < len(self._entries) and self._entries[i] == entry:
+                del self._entries[i]
+
+    # ------------------------------------------------------------------
+
+    def search(self, prefix, scope='', limit=10):
+        """
+        Returns up to `limit` payloads whose label has a word starting with the prefix;
+        labels starting with it come first, then the shorter ones.
+        """
+        prefix = normalize_text(prefix)
+        if not prefix or limit <= 0:
+            return []
+        self._ensure_current()
+
+        matches = {}
+        with self._lock:
+            entries = self._entries
+            i = bisect_left(entries, (scope, prefix))
+            while i < len(entries) and len(matches) < MAX_SCAN:
+                entry_scope, key, item_id = entries[i]
+                if entry_scope != scope or not key.startswith(prefix):
+                    break
+                label, normalized, _, payload = self._items[item_id]
+                rank = (0 if normalized == key else 1, len(label), label)
+                if item_id not in matches or rank < matches[item_id][0]:
+                    matches[item_id] = (rank, payload)
+                i += 1
+        return [payload for rank, payload in sorted(matches.values(), key=lambda match: match[0])[:limit]]
@@ -1,33 +1,82 @@
-from rest_framework.renderers import JSONRenderer
+import msgpack
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to the stdlib encoder
+    orjson = None
+
+
+def build_envelope(data, renderer_context):
+    """
+    Wraps the payload in our success/data/message (or error) envelope.
+    The payload itself is referenced, never copied.
+    """
+    # If the response data is already wrapped, don't double wrap.
+    if isinstance(data, dict) and 'success' in data:
+        return data
+
+    response = (renderer_context or {}).get('response')
+    # Retrieve any message attached to the response
+    message = getattr(response, "message", "")
+
+    if response is not None and response.exception:
+        # If error data has a "detail" field, use that; otherwise use the error data as is.
+        error_data = data.get("detail") if isinstance(data, dict) and "detail" in data else data
+        return {
+            "success": False,
+            # "status": status_code,
+            "data": {},
+            "error": error_data,
+        }
+    return {
+        "success": True,
+        # "status": status_code,
+        "data": data,
+        "message": message,
+    }
+
+
+# orjson handles str/int/float/dict/list (and their subclasses) and UUID natively.
+# Decimal, datetime, lazy strings, querysets etc. go through DRF's own encoder
+# so the output stays byte for byte what JSONRenderer produced.
+_drf_default = JSONEncoder().default
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
 
 
 # Response format
 class CustomJSONRenderer(JSONRenderer):
     def render(self, data, accepted_media_type=None, renderer_context=None):
-        # If the response data is already wrapped, don't double wrap.
-        if isinstance(data, dict) and 'success' in data:
-            return super().render(data, accepted_media_type, renderer_context)
-
-        response = renderer_context.get('response')
-        # Retrieve any message attached to the response
-        message = getattr(response, "message", "")
-        status_code = response.status_code if response else None
-
-        if response is not None and response.exception:
-            # If error data has a "detail" field, use that; otherwise use the error data as is.
-            error_data = data.get("detail") if isinstance(data, dict) and "detail" in data else data
-            formatted_data = {
-                "success": False,
-                # "status": status_code,
-                "data": {},
-                "error": error_data,
-            }
-        else:
-            formatted_data = {
-                "success": True,
-                # "status": status_code,
-                "data": data,
-                "message": message,
-            }
-        return super().render(formatted_data, accepted_media_type, renderer_context)
+        envelope = build_envelope(data, renderer_context)
+
+        # pretty printed output (?indent / browsable api) stays on the stdlib path
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}) is not None:
+            return super().render(envelope, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(envelope, default=_drf_default, option=_ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits
+            return super().render(envelope, accepted_media_type, renderer_context)
+
+        # same escaping as JSONRenderer, these break javascript string literals
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class CustomMessagePackRenderer(BaseRenderer):
+    """
+    Same envelope as CustomJSONRenderer, encoded as MessagePack for the app clients.
+    Selected with `Accept: application/msgpack` or `?format=msgpack`.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # values msgpack has no type for (Decimal, datetime, UUID, ...) are encoded as in JSON
+        return msgpack.packb(build_envelope(data, renderer_context), default=_drf_default, use_bin_type=True)
@@ -0,0 +1,134 @@
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def get_sparse_fieldset(request):
+    """
+    Parses ?fields=a,b and ?omit=c from a read request.
+    Returns (only, omit): `only` is None when every field is wanted.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, set()
+    params = request.query_params
+    only = {name.strip() for name in params.get('fields', '').split(',') if name.strip()} or None
+    omit = {name.strip() for name in params.get('omit', '').split(',') if name.strip()}
+    return only, omit
+
+
+# ----------------------------------------------------------------------------
+# Sparse fieldsets
+class SparseFieldsetsMixin:
+    """
+    ModelSerializer mixin honoring ?fields= and ?omit= on read requests.
+    Dropped fields are removed before representation, so their method fields
+    and nested serializers never run. Only the top level serializer (or the
+    child of a top level many=True list) is trimmed, nested ones stay intact.
+
+    Meta.select_related_fields / Meta.prefetch_related_fields map a field name to
+    the lookups it needs; `optimize_queryset` applies only those of the fields
+    actually rendered, so omitted relations are not fetched either.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        parent = self.parent
+        is_root = parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+        if not is_root:
+            return fields
+
+        only, omit = get_sparse_fieldset(self.context.get('request'))
+        for name in list(fields):
+            if (only is not None and name not in only) or name in omit:
+                fields.pop(name)
+        return fields
+
+    @classmethod
+    def get_rendered_field_names(cls, request=None):
+        only, omit = get_sparse_fieldset(request)
+        return [name for name in cls.Meta.fields if (only is None or name in only) and name not in omit]
+
+    @classmethod
+    def optimize_queryset(cls, queryset, request=None):
+        select_map = getattr(cls.Meta, 'select_related_fields', {})
+        prefetch_map = getattr(cls.Meta, 'prefetch_related_fields', {})
+
+        select_related, prefetch_related = {}, {}
+        for name in cls.get_rendered_field_names(request):
+            for lookup in select_map.get(name, ()):
+                select_related[lookup] = lookup
+            for lookup in prefetch_map.get(name, ()):
+                key = lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup
+                prefetch_related.setdefault(key, lookup)
+
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related.values())
+        return queryset
+
+
+# ----------------------------------------------------------------------------
+# Nested writes
+def sync_nested(model, existing, incoming, fields, natural_key=None):
+    """
+    Brings a set of child rows in line with a payload using at most one DELETE,
+    one bulk_create and one bulk_update.
+      existing:    the current children
+      incoming:    unsaved instances built from the payload, pk set when the client sent an id
+      fields:      the compared / updated fields (attnames for foreign keys)
+      natural_key: pairs id-less incoming rows with existing rows, so clients that
+                   never send ids do not recreate unchanged children
+    Incoming rows paired with an existing row take its pk.
+    Returns {'created': n, 'updated': n, 'deleted': n}.
+    """
+    by_pk = {obj.pk: obj for obj in existing}
+    free = {}
+    if natural_key is not None:
+        claimed = {obj.pk for obj in incoming if obj.pk is not None}
+        for obj in existing:
+            if obj.pk not in claimed:
+                free.setdefault(natural_key(obj), []).append(obj)
+
+    kept, to_create, to_update = set(), [], []
+    for obj in incoming:
+        if obj.pk is not None:
+            current = by_pk.get(obj.pk)
+            if current is None or current.pk in kept:
+                raise serializers.ValidationError({'id': f"ردیف با شناسه {obj.pk} پیدا نشد."})
+        else:
+            candidates = free.get(natural_key(obj)) if natural_key is not None else None
+            current = candidates.pop() if candidates else None
+        if current is None:
+            to_create.append(obj)
+            continue
+
+        kept.add(current.pk)
+        obj.pk = current.pk
+        changed = [f for f in fields if getattr(current, f) != getattr(obj, f)]
+        if changed:
+            for f in fields:
+                setattr(current, f, getattr(obj, f))
+            to_update.append(current)
+
+    deleted = [pk for pk in by_pk if pk not in kept]
+    if deleted:
+        model.objects.filter(pk__in=deleted).delete()
+    if to_create:
+        model.objects.bulk_create(to_create)
+    if to_update:
+        model.objects.bulk_update(to_update, fields)
+    return {'created': len(to_create), 'updated': len(to_update), 'deleted': len(deleted)}
+
+
+def attach_prefetched(instance, related_name, objects):
+    """
+    Stores freshly written children as the prefetched `related_name` of instance,
+    so a response serializer renders them without reading them back.
+    """
+    queryset = getattr(instance, related_name).all()
+    queryset._result_cache = list(objects)
+    queryset._prefetch_done = True
+    if not hasattr(instance, '_prefetched_objects_cache'):
+        instance._prefetched_objects_cache = {}
+    instance._prefetched_objects_cache[related_name] = queryset
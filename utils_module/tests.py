@@ -1,3 +1,385 @@
-from django.test import TestCase
+import gzip
+import io
+import shutil
+import tempfile
+import threading
+import uuid
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from accounts_module.models import User
+from core.middleware import CompressionMiddleware
+from shop_module.models import ShopProfile, enrich_shop_profile
+from user_module.models import StoredLocation, enrich_stored_location
+from utils_module import geocoding, location_search
+from utils_module.api.v1.views import NeshanReverseGeocodingAPIView
+from utils_module.models import CacheVersion, ReverseGeocodeCache
+from utils_module.offline_geocoder import OfflineGeocoder, offline_reverse_geocode
+from utils_module.parsers import MessagePackParser
+from utils_module.prefix_index import PrefixIndex
+from utils_module.background import run_in_background
+from utils_module.renderers import CustomJSONRenderer, CustomMessagePackRenderer, build_envelope
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def tearDownModule():
+    shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
 
 # Create your tests here.
+
+class ReverseGeocodeCacheTestCase(TestCase):
+    def setUp(self):
+        geocoding._memory_cache.clear()
+
+    @mock.patch('utils_module.geocoding.fetch_reverse_geocode')
+    def test_nearby_points_share_one_lookup(self, fetch):
+        fetch.return_value = ({'city': 'تهران'}, 'استان تهران', 'تهران', 'خیابان آزادی', status.HTTP_200_OK)
+
+        first = geocoding.reverse_geocode(35.699756, 51.338076)
+        second = geocoding.reverse_geocode(35.699761, 51.338079)
+
+        self.assertEqual(first, second)
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(ReverseGeocodeCache.objects.count(), 1)
+
+        # a cold process still avoids the network thanks to the table
+        geocoding._memory_cache.clear()
+        geocoding.reverse_geocode(35.699756, 51.338076)
+        self.assertEqual(fetch.call_count, 1)
+
+    @mock.patch('utils_module.geocoding.fetch_reverse_geocode')
+    def test_failures_are_not_cached(self, fetch):
+        fetch.return_value = (None, None, None, None, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        geocoding.reverse_geocode(35.7, 51.4)
+        geocoding.reverse_geocode(35.7, 51.4)
+
+        self.assertEqual(fetch.call_count, 2)
+        self.assertFalse(ReverseGeocodeCache.objects.exists())
+
+
+class LocationSearchCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    @mock.patch('utils_module.location_search._fetch')
+    def test_longer_prefix_is_served_from_cache(self, fetch):
+        items = [{'title': 'کافه لمیز', 'address': 'تهران'}, {'title': 'کتابخانه ملی', 'address': 'تهران'}]
+
+        def fake_fetch(term, lat, long, key):
+            cache.set(key, {'count': len(items), 'items': items})
+            return {'count': len(items), 'items': items}, status.HTTP_200_OK
+
+        fetch.side_effect = fake_fetch
+
+        location_search.search_locations('ک')
+        location_search.search_locations('كا')  # arabic kaf folds to the same key prefix
+        data, status_code = location_search.search_locations('کافه')
+
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual(status_code, status.HTTP_200_OK)
+        self.assertEqual([item['title'] for item in data['items']], ['کافه لمیز'])
+
+
+def _square(level, name, lat, long, half, province=None):
+    ring = [[long - half, lat - half], [long + half, lat - half], [long + half, lat + half],
+            [long - half, lat + half], [long - half, lat - half]]
+    properties = {'level': level, 'name': name}
+    if province:
+        properties['province'] = province
+    return {'type': 'Feature', 'properties': properties, 'geometry': {'type': 'Polygon', 'coordinates': [ring]}}
+
+
+class OfflineGeocoderTestCase(TestCase):
+    def setUp(self):
+        geocoding._memory_cache.clear()
+
+    @mock.patch('utils_module.geocoding.fetch_reverse_geocode')
+    def test_bundled_dataset_places_real_towns(self, fetch):
+        places = [
+            ((35.6997, 51.3380), ('استان تهران', 'تهران')),
+            ((35.8040, 51.4270), ('استان تهران', 'تهران')),  # Tajrish, a quarter of Tehran in GeoNames
+            ((35.8230, 51.6300), ('استان تهران', 'لواسان')),
+            ((35.7150, 51.1000), ('استان تهران', 'قدس')),
+            ((32.4900, 51.7700), ('استان اصفهان', 'بهارستان')),
+            ((35.8200, 50.9700), ('استان البرز', 'کرج')),
+            ((36.3100, 59.5600), ('استان خراسان رضوی', 'مشهد')),
+            ((33.5000, 55.5000), ('استان خراسان جنوبی', None)),  # desert: the province alone
+            ((0, 0), (None, None)),
+        ]
+        for (lat, long), expected in places:
+            self.assertEqual(offline_reverse_geocode(lat, long), expected)
+
+        with override_settings(GEOCODING_OFFLINE_ONLY=True):
+            data, state, city, address, status_code = NeshanReverseGeocodingAPIView.get_location_data(35.82, 50.97)
+            self.assertEqual((data['source'], city, status_code), ('offline', 'کرج', status.HTTP_200_OK))
+            self.assertEqual(geocoding.get_location(0, 0)[-1], status.HTTP_404_NOT_FOUND)
+        fetch.assert_not_called()
+
+    def test_polygons_smallest_area_wins(self):
+        geocoder = OfflineGeocoder([
+            _square('province', 'استان تهران', 35.6, 51.4, 1),
+            _square('city', 'تهران', 35.7, 51.4, 0.2, province='استان تهران'),
+            _square('city', 'اسلامشهر', 35.55, 51.23, 0.05, province='استان تهران'),
+        ])
+        self.assertEqual(geocoder.lookup(35.72, 51.33), ('استان تهران', 'تهران'))
+        self.assertEqual(geocoder.lookup(35.55, 51.23), ('استان تهران', 'اسلامشهر'))
+        self.assertEqual(geocoder.lookup(35.0, 51.9), ('استان تهران', None))
+
+    @mock.patch('utils_module.geocoding.fetch_reverse_geocode')
+    def test_offline_first_unless_an_address_is_needed(self, fetch):
+        fetch.return_value = ({'city': 'تهران'}, 'استان تهران', 'تهران', 'خیابان آزادی', status.HTTP_200_OK)
+        data, state, city, address, status_code = geocoding.get_location(35.7, 51.4, need_address=False)
+        self.assertEqual((data['source'], state, city), ('offline', 'استان تهران', 'تهران'))
+        fetch.assert_not_called()
+
+        self.assertEqual(geocoding.get_location(35.7, 51.4)[3], 'خیابان آزادی')
+        self.assertEqual(fetch.call_count, 1)
+
+        # service is down: province and city are still answered
+        fetch.return_value = (None, None, None, None, status.HTTP_503_SERVICE_UNAVAILABLE)
+        data, state, city, address, status_code = geocoding.get_location(35.55, 51.235)
+        self.assertEqual((data['source'], city, address, status_code), ('offline', 'اسلامشهر', '', status.HTTP_200_OK))
+
+        with override_settings(OFFLINE_GEOCODER_DATASET=''):
+            self.assertEqual(geocoding.get_location(35.55, 51.235, need_address=False)[-1],
+                             status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class CustomJSONRendererTestCase(TestCase):
+    def test_output_matches_drf_json_renderer(self):
+        class FakeResponse:
+            exception = False
+            message = 'محصول با موفقیت ایجاد شد'
+
+        context = {'response': FakeResponse()}
+        payload = [{
+            'id': uuid.uuid4(), 'name': 'کافه\u2028لاته', 'price': Decimal('120000.50'), 'distance': 2.5,
+            'created_date': timezone.now(), 'tags': ('hot', 'coffee'), 'brand': None, 'is_active': True,
+        }]
+
+        expected = JSONRenderer().render(build_envelope(payload, context), None, context)
+        self.assertEqual(CustomJSONRenderer().render(payload, None, context), expected)
+
+
+class MessagePackTestCase(TestCase):
+    def test_round_trip_keeps_the_envelope(self):
+        class FakeResponse:
+            exception = False
+            message = ''
+
+        payload = {'id': uuid.uuid4(), 'price': Decimal('10.5'), 'title': 'اسپرسو'}
+        body = CustomMessagePackRenderer().render(payload, None, {'response': FakeResponse()})
+        parsed = MessagePackParser().parse(io.BytesIO(body))
+
+        self.assertEqual(parsed, {
+            'success': True,
+            'data': {'id': str(payload['id']), 'price': 10.5, 'title': 'اسپرسو'},
+            'message': '',
+        })
+
+    def test_selected_by_accept_header(self):
+        response = APIClient().get('/site-info/api/v1/site_settings/', HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertTrue(MessagePackParser().parse(io.BytesIO(response.content))['success'])
+
+
+class PrefixIndexTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        rows = [
+            (1, 'قهوه اسپرسو', ('', 'shop-a'), {'id': 1}),
+            (2, 'قهوه ترک', ('', 'shop-b'), {'id': 2}),
+            (3, 'كيك قهوه', ('', 'shop-a'), {'id': 3}),
+        ]
+        self.rows = rows
+        self.builds = 0
+        self.index = PrefixIndex('test_names', self.load)
+
+    def load(self):
+        self.builds += 1
+        return iter(self.rows)
+
+    def test_completions(self):
+        # names starting with the prefix first, shorter ones before longer ones
+        self.assertEqual(self.index.search('قه'), [{'id': 2}, {'id': 1}, {'id': 3}])
+        self.assertEqual(self.index.search('کیک'), [{'id': 3}])  # Arabic kaf/yeh in the data
+        self.assertEqual(self.index.search('اسپ'), [{'id': 1}])
+        self.assertEqual(self.index.search('قهوه', scope='shop-b'), [{'id': 2}])
+        self.assertEqual(self.index.search('قهوه', limit=1), [{'id': 2}])
+
+    @override_settings(SUGGEST_SYNC_INTERVAL=0)
+    @mock.patch('utils_module.prefix_index.submit')
+    def test_incremental_updates(self, submit):
+        self.index.search('قه')
+        self.index.upsert(4, 'قند', ('',), {'id': 4})
+        self.index.discard(2)
+        self.index.changed()
+        self.assertEqual(self.index.search('ق'), [{'id': 4}, {'id': 1}, {'id': 3}])
+        submit.assert_called_once_with(self.index._refresh)
+        # the version moved by our own change needs no rebuild
+        self.index._refresh()
+        self.assertEqual(self.builds, 1)
+
+        # another worker changed the data: searches keep the old index until the background refresh
+        self.rows = self.rows + [(5, 'قهوه ترک دمی', ('',), {'id': 5})]
+        CacheVersion.bump([self.index.version_name])
+        self.assertEqual(self.index.search('قهوه ت'), [])
+        self.index._refresh()
+        self.assertEqual(self.builds, 2)
+        self.assertEqual(self.index.search('قهوه ت'), [{'id': 2}, {'id': 5}])
+
+
+
+class CheckQueryPlansTestCase(TestCase):
+    def test_hot_queries_use_indexes(self):
+        out = io.StringIO()
+        call_command('check_query_plans', stdout=out)
+        # the hot queries without boolean filters are checkable on SQLite too
+        for title in ("user media", "article media", "expired auth tokens (cron_commands)"):
+            self.assertIn(f"ok         {title}", out.getvalue())
+
+
+LOCATION = ({}, 'استان تهران', 'تهران', 'خیابان آزادی', status.HTTP_200_OK)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, GEOCODING_OFFLINE_ONLY=True)
+class BackgroundEnrichmentTestCase(TestCase):
+    def setUp(self):
+        user = User.objects.create(mobile='09120000024', user_type='customer')
+        self.user_profile = user.userprofile
+
+    def create_location(self, **kwargs):
+        return StoredLocation.objects.create(user_profile=self.user_profile, title='خانه', lat=35.7, long=51.4,
+                                             **kwargs)
+
+    def test_jobs_run_after_commit_only(self):
+        done = threading.Event()
+        with self.captureOnCommitCallbacks() as callbacks:
+            try:
+                with transaction.atomic():
+                    run_in_background(done.set)
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual(callbacks, [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            run_in_background(done.set)
+            self.assertFalse(done.is_set())
+        self.assertTrue(done.wait(5))
+
+    def test_new_location_schedules_its_enrichment(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.create_location()
+        self.assertEqual(len(callbacks), 1)
+
+    @mock.patch('utils_module.api.v1.views.get_location', return_value=LOCATION)
+    def test_enrichment_writes_only_the_address_fields(self, get_location):
+        with self.captureOnCommitCallbacks():
+            location = self.create_location()
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(enrich_stored_location(location.pk))
+        update = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(update), 1)
+        self.assertNotIn('title', update[0])
+        location.refresh_from_db()
+        self.assertEqual((location.title, location.state, location.city, location.address),
+                         ('خانه', 'استان تهران', 'تهران', 'خیابان آزادی'))
+
+    @mock.patch('shop_module.models.get_location', return_value=LOCATION)
+    def test_shop_enrichment_keeps_filled_fields(self, get_location):
+        profile = User.objects.create(mobile='09120000025', user_type='seller').shopprofile
+        ShopProfile.objects.filter(pk=profile.pk).update(latitude=35.7, longitude=51.4, city='کرج', address='')
+
+        self.assertTrue(enrich_shop_profile(profile.pk))
+        profile.refresh_from_db()
+        self.assertEqual((profile.state, profile.city, profile.address), ('استان تهران', 'کرج', 'خیابان آزادی'))
+
+    @mock.patch('utils_module.management.commands.enrich_locations.enrich_shop_profile', return_value=True)
+    @mock.patch('utils_module.management.commands.enrich_locations.enrich_stored_location', return_value=True)
+    def test_backfill_only_takes_rows_missing_data(self, enrich_location, enrich_shop):
+        with self.captureOnCommitCallbacks():
+            self.create_location(state='تهران', city='تهران', address='خیابان آزادی')
+            # the address is left to Neshan-backed callers, province and city are enough
+            self.create_location(state='تهران', city='تهران')
+            missing = self.create_location(state='تهران')
+        profile = User.objects.create(mobile='09120000026', user_type='seller').shopprofile
+        ShopProfile.objects.filter(pk=profile.pk).update(latitude=35.7, longitude=51.4)
+        # no coordinates, nothing to resolve
+        User.objects.create(mobile='09120000027', user_type='seller')
+
+        out = io.StringIO()
+        call_command('enrich_locations', workers=2, stdout=out)
+        self.assertEqual([c.args[0] for c in enrich_location.call_args_list], [missing.pk])
+        self.assertEqual([c.args[0] for c in enrich_shop.call_args_list], [profile.pk])
+        self.assertIn("Enriched 1 stored locations", out.getvalue())
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class CompressionMiddlewareTestCase(TestCase):
+    body = b'{"success": true, "data": "' + 'قهوه '.encode() * 200 + b'"}'
+
+    def respond(self, accept_encoding, body=None, content_type='application/json', etag=None, middleware=None):
+        def get_response(request):
+            response = HttpResponse(self.body if body is None else body, content_type=content_type)
+            if etag:
+                response['ETag'] = etag
+            return response
+
+        middleware = middleware or CompressionMiddleware(get_response)
+        middleware.get_response = get_response
+        return middleware(RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept_encoding))
+
+    def test_negotiation(self):
+        self.assertEqual(self.respond('gzip, deflate, br')['Content-Encoding'], 'br')
+        self.assertEqual(self.respond('gzip')['Content-Encoding'], 'gzip')
+        self.assertEqual(self.respond('br;q=0, gzip;q=0.5')['Content-Encoding'], 'gzip')
+        self.assertEqual(self.respond('*')['Content-Encoding'], 'br')
+        self.assertEqual(self.respond('br;q=0, *')['Content-Encoding'], 'gzip')
+        for header in ('gzip;q=0', 'identity', '*;q=0', ''):
+            self.assertFalse(self.respond(header).has_header('Content-Encoding'), header)
+
+        response = self.respond('gzip')
+        self.assertEqual(gzip.decompress(response.content), self.body)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_small_bodies_other_types_and_streams_are_left_alone(self):
+        self.assertFalse(self.respond('br', body=b'{"success": true}').has_header('Content-Encoding'))
+        self.assertFalse(self.respond('br', content_type='image/png').has_header('Content-Encoding'))
+        # pages with CSRF tokens
+        self.assertFalse(self.respond('gzip', content_type='text/html; charset=utf-8').has_header('Content-Encoding'))
+
+        streaming = StreamingHttpResponse(iter([self.body]), content_type='application/json')
+        response = CompressionMiddleware(lambda request: streaming)(
+            RequestFactory().get('/', HTTP_ACCEPT_ENCODING='br'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), self.body)
+
+    def test_strong_etag_becomes_weak(self):
+        self.assertEqual(self.respond('gzip', etag='"abc"')['ETag'], 'W/"abc"')
+        self.assertEqual(self.respond('gzip', etag='W/"abc"')['ETag'], 'W/"abc"')
+        self.assertEqual(self.respond('', etag='"abc"')['ETag'], '"abc"')
+
+    def test_identical_bodies_are_compressed_once(self):
+        compression = CompressionMiddleware(None)
+        with mock.patch('core.middleware.gzip.compress', wraps=gzip.compress) as compress:
+            first = self.respond('gzip', middleware=compression)
+            second = self.respond('gzip', middleware=compression)
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(first.content, second.content)
@@ -0,0 +1,11 @@
+from rest_framework.throttling import ScopedRateThrottle
+
+from utils_module.cache import shared_cache
+
+
+class SharedScopedRateThrottle(ScopedRateThrottle):
+    """
+    ScopedRateThrottle keeping its history in the shared cache, so a rate holds
+    for a client across every worker instead of once per process.
+    """
+    cache = shared_cache